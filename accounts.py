@@ -0,0 +1,83 @@
+import tomllib
+
+DEFAULT_SECRETS_PATH = ".streamlit/secrets.toml"
+
+
+def load_secrets(path=DEFAULT_SECRETS_PATH):
+    with open(path, "rb") as f:
+        return tomllib.load(f)
+
+
+def accounts_from_secrets(secrets):
+    secret_accounts = secrets.get("mt5_account", [])
+    secret_passwords = secrets.get("mt5_password", [])
+    secret_servers = secrets.get("mt5_server", [])
+    secret_names = secrets.get("mt5_name", [])
+    secret_paths = secrets.get("mt5_path", [])
+    secret_hosts = secrets.get("mt5_host", [])
+    secret_ports = secrets.get("mt5_port", [])
+    if isinstance(secret_accounts, str):
+        secret_accounts = [secret_accounts]
+    if isinstance(secret_passwords, str):
+        secret_passwords = [secret_passwords]
+    if isinstance(secret_servers, str):
+        secret_servers = [secret_servers]
+    if isinstance(secret_names, str):
+        secret_names = [secret_names]
+    if isinstance(secret_paths, str):
+        global_path_from_secrets = secret_paths.strip()
+        secret_paths = [global_path_from_secrets] * len(secret_accounts)
+    elif (
+        isinstance(secret_paths, list)
+        and len(secret_paths) == 1
+        and len(secret_accounts) > 1
+    ):
+        global_path_from_secrets = secret_paths[0].strip()
+        secret_paths = [global_path_from_secrets] * len(secret_accounts)
+    if isinstance(secret_hosts, str):
+        secret_hosts = [secret_hosts.strip()] * len(secret_accounts)
+    if isinstance(secret_ports, (str, int)):
+        secret_ports = [secret_ports] * len(secret_accounts)
+    if not (len(secret_accounts) == len(secret_passwords) == len(secret_servers)):
+        raise ValueError(
+            "Las listas 'mt5_account', 'mt5_password', 'mt5_server' en secrets deben tener la misma longitud."
+        )
+    accounts = []
+    errors = []
+    for i in range(len(secret_accounts)):
+        try:
+            login = int(secret_accounts[i])
+            name = (
+                secret_names[i]
+                if i < len(secret_names) and secret_names[i]
+                else f"Cuenta Secreta {login}"
+            )
+            current_path = ""
+            if i < len(secret_paths) and secret_paths[i] and secret_paths[i].strip():
+                current_path = secret_paths[i].strip()
+            current_host = str(secret_hosts[i]).strip() if i < len(secret_hosts) else ""
+            current_port = (
+                int(secret_ports[i])
+                if i < len(secret_ports) and str(secret_ports[i]).strip()
+                else None
+            )
+            accounts.append(
+                {
+                    "name": name,
+                    "login": login,
+                    "password": secret_passwords[i],
+                    "server": secret_servers[i],
+                    "path": current_path,
+                    "host": current_host,
+                    "port": current_port,
+                }
+            )
+        except ValueError:
+            errors.append(
+                f"Error procesando cuenta #{i+1} de secrets: Login '{secret_accounts[i]}' inválido."
+            )
+        except IndexError:
+            errors.append(
+                f"Error de consistencia en listas de secrets para cuenta #{i+1}."
+            )
+    return accounts, errors
@@ -0,0 +1,694 @@
+import numpy as np
+import pandas as pd
+
+import pymt5linux as mt5
+
+TRADE_ENTRIES = [mt5.DEAL_ENTRY_IN, mt5.DEAL_ENTRY_OUT, mt5.DEAL_ENTRY_INOUT]
+TRADE_TYPES = [mt5.DEAL_TYPE_BUY, mt5.DEAL_TYPE_SELL]
+
+
+def build_closed_trades(deals_df):
+    deals_df = deals_df[
+        (deals_df["entry"].isin(TRADE_ENTRIES))
+        & (deals_df["position_id"] > 0)
+        & (deals_df["type"].isin(TRADE_TYPES))
+    ]
+    if deals_df.empty:
+        return pd.DataFrame()
+    deals_df = deals_df.sort_values(by=["position_id", "time_dt"])
+    position_ids = deals_df["position_id"].to_numpy()
+    new_group = np.concatenate(([True], position_ids[1:] != position_ids[:-1]))
+    group_ids = np.cumsum(new_group) - 1
+    group_starts = np.flatnonzero(new_group)
+    group_ends = np.append(group_starts[1:], len(position_ids)) - 1
+    first_deals = deals_df.iloc[group_starts]
+    last_deals = deals_df.iloc[group_ends]
+    profit_raw_sum = np.bincount(group_ids, weights=deals_df["profit"].to_numpy())
+    commission_sum = np.bincount(group_ids, weights=deals_df["commission"].to_numpy())
+    swap_sum = np.bincount(group_ids, weights=deals_df["swap"].to_numpy())
+    closed_trades_df = pd.DataFrame(
+        {
+            "Position ID": position_ids[group_starts],
+            "Symbol": first_deals["symbol"].to_numpy(),
+            "Magic": first_deals["magic"].to_numpy(),
+            "Time Open": first_deals["time_dt"].to_numpy(),
+            "Price Open": first_deals["price"].to_numpy(),
+            "Time Close": last_deals["time_dt"].to_numpy(),
+            "Price Close": last_deals["price"].to_numpy(),
+            "Type": np.where(
+                first_deals["type"].to_numpy() == mt5.DEAL_TYPE_BUY, "BUY", "SELL"
+            ).astype(object),
+            "Volume": first_deals["volume"].to_numpy(),
+            "Profit": profit_raw_sum + commission_sum + swap_sum,
+            "Commission": commission_sum,
+            "Swap": swap_sum,
+            "Order Open": first_deals["order"].to_numpy(),
+            "Profit Raw Sum": profit_raw_sum,
+        }
+    )
+    return closed_trades_df.sort_values(by="Time Close", ascending=False)
+
+
+def empty_kpis():
+    return {
+        "max_dd_percent": 0,
+        "consecutive_wins": 0,
+        "profit_factor": np.nan,
+        "consecutive_losses": 0,
+        "total_profit_period": 0,
+        "num_trades": 0,
+        "gross_profit": 0,
+        "gross_loss": 0,
+        "max_drawdown_value": 0,
+        "win_rate": 0,
+    }
+
+
+def max_streaks(profit_raw):
+    signs = np.sign(profit_raw[(profit_raw > 0) | (profit_raw < 0)])
+    if len(signs) == 0:
+        return 0, 0
+    run_starts = np.flatnonzero(np.concatenate(([True], signs[1:] != signs[:-1])))
+    run_lengths = np.diff(np.append(run_starts, len(signs)))
+    run_signs = signs[run_starts]
+    return (
+        int(run_lengths[run_signs > 0].max(initial=0)),
+        int(run_lengths[run_signs < 0].max(initial=0)),
+    )
+
+
+def kpis_from_totals(
+    num_trades,
+    num_wins,
+    total_profit,
+    gross_profit,
+    gross_loss,
+    max_drawdown,
+    peak_equity,
+    consecutive_wins,
+    consecutive_losses,
+    initial_account_balance_for_period=None,
+):
+    win_rate_calc = (num_wins / num_trades * 100) if num_trades > 0 else 0
+    max_dd_percent_calc = 0.0
+    if max_drawdown > 0:
+        if (
+            initial_account_balance_for_period is not None
+            and initial_account_balance_for_period > 0
+        ):
+            max_dd_percent_calc = (
+                max_drawdown / initial_account_balance_for_period
+            ) * 100
+        elif peak_equity > 0:
+            max_dd_percent_calc = (max_drawdown / peak_equity) * 100
+    profit_factor_calc = np.nan
+    if gross_loss > 0:
+        profit_factor_calc = round(gross_profit / gross_loss, 2)
+    elif gross_profit > 0:
+        profit_factor_calc = np.inf
+    return {
+        "max_dd_percent": round(max_dd_percent_calc, 2),
+        "consecutive_wins": consecutive_wins,
+        "profit_factor": profit_factor_calc,
+        "consecutive_losses": consecutive_losses,
+        "total_profit_period": round(total_profit, 2),
+        "num_trades": num_trades,
+        "gross_profit": round(gross_profit, 2),
+        "gross_loss": round(gross_loss, 2),
+        "max_drawdown_value": round(max_drawdown, 2),
+        "win_rate": round(win_rate_calc, 2),
+    }
+
+
+def calculate_kpis(closed_trades_df, initial_account_balance_for_period=None):
+    if closed_trades_df.empty:
+        return empty_kpis()
+    trades_df_sorted = closed_trades_df.sort_values(by="Time Close", ascending=True)
+    profit_net = trades_df_sorted["Profit"].to_numpy(dtype=float)
+    profit_raw = trades_df_sorted["Profit Raw Sum"].to_numpy(dtype=float)
+    equity_net = np.cumsum(profit_net)
+    peak_equity_net = np.fmax.accumulate(np.fmax(equity_net, 0.0))
+    max_drawdown_net = np.fmax.reduce(peak_equity_net - equity_net, initial=0.0)
+    wins = profit_raw > 0
+    losses = profit_raw < 0
+    consecutive_wins, consecutive_losses = max_streaks(profit_raw)
+    return kpis_from_totals(
+        num_trades=len(trades_df_sorted),
+        num_wins=int(wins.sum()),
+        total_profit=float(trades_df_sorted["Profit"].sum()),
+        gross_profit=float(np.cumsum(np.where(wins, profit_raw, 0.0))[-1]),
+        gross_loss=float(np.cumsum(np.where(losses, -profit_raw, 0.0))[-1]),
+        max_drawdown=float(max_drawdown_net),
+        peak_equity=float(peak_equity_net[-1]),
+        consecutive_wins=consecutive_wins,
+        consecutive_losses=consecutive_losses,
+        initial_account_balance_for_period=initial_account_balance_for_period,
+    )
+
+
+def trade_hashes(trades_df):
+    times = trades_df["Time Close"].to_numpy(dtype="datetime64[ns]").view(np.uint64)
+    profit_net = trades_df["Profit"].to_numpy(dtype=float).view(np.uint64)
+    profit_raw = trades_df["Profit Raw Sum"].to_numpy(dtype=float).view(np.uint64)
+    row_hashes = (
+        times * np.uint64(0x9E3779B97F4A7C15)
+        + profit_net * np.uint64(0xC2B2AE3D27D4EB4F)
+        + profit_raw * np.uint64(0x165667B19E3779F9)
+    )
+    row_hashes ^= row_hashes >> np.uint64(31)
+    row_hashes *= np.uint64(0xBF58476D1CE4E5B9)
+    return row_hashes
+
+
+def trades_digest(row_hashes):
+    return int(row_hashes.sum(dtype=np.uint64))
+
+
+class KpiAccumulator:
+    """Running calculate_kpis state for one stream of closed trades.
+
+    update() folds in only the trades closed after the watermark. If the
+    trades at or before it no longer match what was folded (count or
+    trades_digest of their close time and profits), the history was revised
+    and the state is rebuilt from scratch.
+    """
+
+    def __init__(self):
+        self.rebuilds = 0
+        self.reset()
+
+    def reset(self):
+        self.watermark = None
+        self.num_trades = 0
+        self.num_wins = 0
+        self.gross_profit = 0.0
+        self.gross_loss = 0.0
+        self.equity = 0.0
+        self.peak_equity = 0.0
+        self.max_drawdown = 0.0
+        self.consecutive_wins = 0
+        self.consecutive_losses = 0
+        self.run_sign = 0
+        self.run_length = 0
+        self._profits = np.empty(0)
+        self._digest = 0
+
+    def _fold(self, trades_df_sorted):
+        profit_net = trades_df_sorted["Profit"].to_numpy(dtype=float)
+        profit_raw = trades_df_sorted["Profit Raw Sum"].to_numpy(dtype=float)
+        equity_net = np.cumsum(np.concatenate(([self.equity], profit_net)))[1:]
+        peak_equity_net = np.fmax.accumulate(
+            np.fmax(np.concatenate(([self.peak_equity], equity_net)), 0.0)
+        )[1:]
+        self.max_drawdown = float(
+            np.fmax.reduce(peak_equity_net - equity_net, initial=self.max_drawdown)
+        )
+        self.equity = float(equity_net[-1])
+        self.peak_equity = float(peak_equity_net[-1])
+        wins = profit_raw > 0
+        losses = profit_raw < 0
+        self.num_trades += len(profit_net)
+        self.num_wins += int(wins.sum())
+        self.gross_profit = float(
+            np.cumsum(np.concatenate(([self.gross_profit], profit_raw[wins])))[-1]
+        )
+        self.gross_loss = float(
+            np.cumsum(np.concatenate(([self.gross_loss], -profit_raw[losses])))[-1]
+        )
+        self._profits = np.concatenate((self._profits, profit_net))
+        self._digest = (
+            self._digest + trades_digest(trade_hashes(trades_df_sorted))
+        ) % 2**64
+        signs = np.sign(profit_raw[wins | losses])
+        if len(signs) == 0:
+            return
+        run_starts = np.flatnonzero(np.concatenate(([True], signs[1:] != signs[:-1])))
+        run_lengths = np.diff(np.append(run_starts, len(signs)))
+        run_signs = signs[run_starts]
+        if run_signs[0] == self.run_sign:
+            run_lengths[0] += self.run_length
+        self.consecutive_wins = max(
+            self.consecutive_wins, int(run_lengths[run_signs > 0].max(initial=0))
+        )
+        self.consecutive_losses = max(
+            self.consecutive_losses, int(run_lengths[run_signs < 0].max(initial=0))
+        )
+        self.run_sign = run_signs[-1]
+        self.run_length = int(run_lengths[-1])
+
+    def update(self, closed_trades_df):
+        if closed_trades_df.empty:
+            if self.num_trades:
+                self.reset()
+                self.rebuilds += 1
+            return self
+        is_new = np.ones(len(closed_trades_df), dtype=bool)
+        if self.watermark is not None:
+            is_new = (closed_trades_df["Time Close"] > self.watermark).to_numpy()
+            if len(is_new) - int(is_new.sum()) != self.num_trades or (
+                trades_digest(trade_hashes(closed_trades_df)[~is_new]) != self._digest
+            ):
+                self.reset()
+                self.rebuilds += 1
+                is_new[:] = True
+        new_trades = closed_trades_df[is_new]
+        if not new_trades.empty:
+            self._fold(new_trades.sort_values(by="Time Close", ascending=True))
+            self.watermark = new_trades["Time Close"].max()
+        return self
+
+    def kpis(self, initial_account_balance_for_period=None):
+        if self.num_trades == 0:
+            return empty_kpis()
+        return kpis_from_totals(
+            num_trades=self.num_trades,
+            num_wins=self.num_wins,
+            total_profit=float(self._profits.sum()),
+            gross_profit=self.gross_profit,
+            gross_loss=self.gross_loss,
+            max_drawdown=self.max_drawdown,
+            peak_equity=self.peak_equity,
+            consecutive_wins=self.consecutive_wins,
+            consecutive_losses=self.consecutive_losses,
+            initial_account_balance_for_period=initial_account_balance_for_period,
+        )
+
+
+def calculate_kpis_by_group(
+    closed_trades_df, group_keys="Magic", initial_account_balance_for_period=None
+):
+    keys = [group_keys] if isinstance(group_keys, str) else list(group_keys)
+    if closed_trades_df.empty:
+        return pd.DataFrame(columns=keys + list(empty_kpis())).set_index(keys)
+    trades_df_sorted = closed_trades_df.sort_values(
+        by=keys + ["Time Close"], kind="stable"
+    )
+    key_frame = trades_df_sorted[keys]
+    new_group = key_frame.ne(key_frame.shift()).any(axis=1).to_numpy()
+    new_group[0] = True
+    group_ids = np.cumsum(new_group) - 1
+    group_starts = np.flatnonzero(new_group)
+    group_ends = np.append(group_starts[1:], len(group_ids)) - 1
+    num_groups = len(group_starts)
+
+    profit_net = trades_df_sorted["Profit"].to_numpy(dtype=float)
+    profit_raw = trades_df_sorted["Profit Raw Sum"].to_numpy(dtype=float)
+    equity_net = np.concatenate(
+        [
+            np.cumsum(profit_net[start : end + 1])
+            for start, end in zip(group_starts, group_ends)
+        ]
+    )
+    peak_equity_net = (
+        pd.Series(np.fmax(equity_net, 0.0)).groupby(group_ids).cummax().to_numpy()
+    )
+    max_drawdown_net = np.fmax(
+        np.fmax.reduceat(peak_equity_net - equity_net, group_starts), 0.0
+    )
+
+    wins = profit_raw > 0
+    losses = profit_raw < 0
+    num_trades = np.bincount(group_ids, minlength=num_groups)
+    num_wins = np.bincount(group_ids, weights=wins, minlength=num_groups)
+    total_profit = np.bincount(group_ids, weights=profit_net, minlength=num_groups)
+    gross_profit = np.bincount(
+        group_ids, weights=np.where(wins, profit_raw, 0.0), minlength=num_groups
+    )
+    gross_loss = np.bincount(
+        group_ids, weights=np.where(losses, -profit_raw, 0.0), minlength=num_groups
+    )
+
+    consecutive_wins = np.zeros(num_groups, dtype=int)
+    consecutive_losses = np.zeros(num_groups, dtype=int)
+    decided = wins | losses
+    if decided.any():
+        signs = np.sign(profit_raw[decided])
+        sign_groups = group_ids[decided]
+        run_starts = np.flatnonzero(
+            np.concatenate(
+                (
+                    [True],
+                    (signs[1:] != signs[:-1]) | (sign_groups[1:] != sign_groups[:-1]),
+                )
+            )
+        )
+        run_lengths = np.diff(np.append(run_starts, len(signs)))
+        run_signs = signs[run_starts]
+        run_groups = sign_groups[run_starts]
+        np.maximum.at(
+            consecutive_wins, run_groups[run_signs > 0], run_lengths[run_signs > 0]
+        )
+        np.maximum.at(
+            consecutive_losses, run_groups[run_signs < 0], run_lengths[run_signs < 0]
+        )
+
+    rows = [
+        kpis_from_totals(
+            num_trades=int(num_trades[i]),
+            num_wins=int(num_wins[i]),
+            total_profit=float(total_profit[i]),
+            gross_profit=float(gross_profit[i]),
+            gross_loss=float(gross_loss[i]),
+            max_drawdown=float(max_drawdown_net[i]),
+            peak_equity=float(peak_equity_net[group_ends[i]]),
+            consecutive_wins=int(consecutive_wins[i]),
+            consecutive_losses=int(consecutive_losses[i]),
+            initial_account_balance_for_period=initial_account_balance_for_period,
+        )
+        for i in range(num_groups)
+    ]
+    kpis_df = pd.concat(
+        [key_frame.iloc[group_starts].reset_index(drop=True), pd.DataFrame(rows)],
+        axis=1,
+    )
+    return kpis_df.set_index(keys)
+
+
+def ea_comparison_table(kpis_df, currency):
+    return kpis_df.rename(
+        columns={
+            "num_trades": "Trades",
+            "win_rate": "Win Rate (%)",
+            "profit_factor": "Profit Factor",
+            "max_dd_percent": "Max DD (%)",
+            "max_drawdown_value": f"Max DD ({currency})",
+            "consecutive_wins": "Racha Victorias",
+            "consecutive_losses": "Racha Pérdidas",
+            "total_profit_period": f"Total Profit ({currency})",
+        }
+    )[
+        [
+            "Trades",
+            "Win Rate (%)",
+            "Profit Factor",
+            "Max DD (%)",
+            f"Max DD ({currency})",
+            "Racha Victorias",
+            "Racha Pérdidas",
+            f"Total Profit ({currency})",
+        ]
+    ]
+
+
+def ea_label(magic):
+    return f"EA {magic}" if magic != 0 else "Trades Manuales (Magic 0)"
+
+
+def build_track_record_chart_from_rollups(
+    rollups_df, start, end, freq_code, initial_balance, selected_items
+):
+    chart_periods = pd.date_range(start=start, end=end, freq=freq_code).tz_localize(
+        None
+    )
+    if rollups_df.empty or len(chart_periods) == 0:
+        return pd.DataFrame(columns=["period_start", "value", "type"])
+    trading_net = (
+        rollups_df["trade_profit"] + rollups_df["commission"] + rollups_df["swap"]
+    )
+    period_delta = (
+        (trading_net + rollups_df["deposits"] + rollups_df["withdrawals"])
+        .groupby(rollups_df["period"])
+        .sum()
+        .reindex(chart_periods, fill_value=0.0)
+    )
+    wide = pd.DataFrame(index=chart_periods)
+    if "Balance Cuenta" in selected_items:
+        wide["Balance Cuenta"] = (period_delta.cumsum() / initial_balance) * 100
+
+    trading_rows = rollups_df["deals"] > 0
+    selected_magics = [
+        magic
+        for magic in rollups_df.loc[trading_rows, "magic"].unique()
+        if ea_label(magic) in selected_items
+    ]
+    if selected_magics:
+        ea_selected = trading_rows & rollups_df["magic"].isin(selected_magics)
+        ea_cumulative = (
+            trading_net[ea_selected]
+            .groupby(
+                [rollups_df["period"][ea_selected], rollups_df["magic"][ea_selected]]
+            )
+            .sum()
+            .unstack(fill_value=0.0)
+            .reindex(index=chart_periods, columns=selected_magics, fill_value=0.0)
+            .cumsum()
+        )
+        for magic in selected_magics:
+            wide[ea_label(magic)] = (ea_cumulative[magic] / initial_balance) * 100
+
+    if wide.columns.empty:
+        return pd.DataFrame(columns=["period_start", "value", "type"])
+    df_chart = wide.rename_axis(index="period_start", columns="type").stack()
+    return df_chart.rename("value").reset_index()[["period_start", "value", "type"]]
+
+
+def track_record_summary(daily_rollups_df, balance_peaks_df, initial_balance):
+    commission = daily_rollups_df["commission"].sum()
+    swap = daily_rollups_df["swap"].sum()
+    daily_delta = (
+        daily_rollups_df[
+            ["trade_profit", "commission", "swap", "deposits", "withdrawals"]
+        ]
+        .sum(axis=1)
+        .groupby(daily_rollups_df["period"])
+        .sum()
+    )
+    balance_before_day = initial_balance + daily_delta.cumsum().shift(fill_value=0.0)
+    day_peaks = balance_before_day + balance_peaks_df.set_index("day")[
+        "peak_offset"
+    ].reindex(daily_delta.index, fill_value=0.0)
+    return {
+        "first_day": daily_rollups_df["period"].min(),
+        "profit": daily_rollups_df["trade_profit"].sum() + commission + swap,
+        "deposits": daily_rollups_df["deposits"].sum(),
+        "withdrawals": daily_rollups_df["withdrawals"].sum(),
+        "interest_costs": commission + swap,
+        "highest_balance": (
+            max(initial_balance, day_peaks.max())
+            if not day_peaks.empty
+            else initial_balance
+        ),
+    }
+
+
+def lttb_indices_many(xs, ys, max_points):
+    """LTTB indices for several series at once.
+
+    The bucket loop is inherently sequential (each pick is the anchor of the
+    next bucket), so instead of running it per series it steps through the
+    buckets once for all series, with every bucket's candidate points and
+    next-bucket averages gathered up front.
+    """
+    lengths = np.array([len(x) for x in xs], dtype=np.int64)
+    indices = [np.arange(n_points) for n_points in lengths]
+    if max_points < 3:
+        return indices
+    long_series = np.flatnonzero(lengths > max_points)
+    if len(long_series) == 0:
+        return indices
+    n_points = lengths[long_series]
+    n_series = len(long_series)
+    n_buckets = max_points - 2
+    bucket_size = (n_points - 2) / n_buckets
+    bucket_edges = (np.arange(max_points - 1) * bucket_size[:, None]).astype(
+        np.int64
+    ) + 1
+    bucket_edges[:, -1] = n_points - 1
+
+    flat_x = np.concatenate([xs[i] for i in long_series]).astype(np.float64)
+    flat_y = np.concatenate([ys[i] for i in long_series]).astype(np.float64)
+    offsets = np.concatenate(([0], np.cumsum(n_points)[:-1]))
+    # Segments [0, e0), [e0, e1), ..., [e_last, n): segment b + 2 is the bucket
+    # after bucket b, whose average is the third vertex of its triangles.
+    bounds = np.column_stack([np.zeros(n_series, dtype=np.int64), bucket_edges])
+    segment_counts = np.diff(np.column_stack([bounds, n_points]), axis=1)
+    segment_starts = (offsets[:, None] + bounds).ravel()
+    next_x = (
+        np.add.reduceat(flat_x, segment_starts).reshape(n_series, -1) / segment_counts
+    )[:, 2:]
+    next_y = (
+        np.add.reduceat(flat_y, segment_starts).reshape(n_series, -1) / segment_counts
+    )[:, 2:]
+
+    bucket_starts = bucket_edges[:, :-1]
+    bucket_ends = bucket_edges[:, 1:]
+    candidates = bucket_starts[:, :, None] + np.arange(
+        (bucket_ends - bucket_starts).max()
+    )
+    valid = candidates < bucket_ends[:, :, None]
+    flat_candidates = offsets[:, None, None] + np.minimum(
+        candidates, bucket_ends[:, :, None] - 1
+    )
+    candidate_x = flat_x[flat_candidates]
+    candidate_y = flat_y[flat_candidates]
+
+    selected = np.empty((n_series, max_points), dtype=np.int64)
+    selected[:, 0] = 0
+    selected[:, -1] = n_points - 1
+    anchor = offsets.copy()
+    for bucket in range(n_buckets):
+        anchor_x = flat_x[anchor][:, None]
+        anchor_y = flat_y[anchor][:, None]
+        areas = np.abs(
+            (anchor_x - next_x[:, bucket, None]) * (candidate_y[:, bucket] - anchor_y)
+            - (anchor_x - candidate_x[:, bucket]) * (next_y[:, bucket, None] - anchor_y)
+        )
+        areas[~valid[:, bucket]] = -1.0
+        picked = bucket_starts[:, bucket] + np.argmax(areas, axis=1)
+        selected[:, bucket + 1] = picked
+        anchor = offsets + picked
+    for row, series in enumerate(long_series):
+        indices[series] = selected[row]
+    return indices
+
+
+def lttb_indices(x, y, max_points):
+    return lttb_indices_many([x], [y], max_points)[0]
+
+
+def downsample_chart(df_chart, max_points):
+    if not max_points or df_chart.empty:
+        return df_chart, 0
+    series_list = [
+        series.sort_values("period_start")
+        for _, series in df_chart.groupby("type", sort=False)
+    ]
+    indices = lttb_indices_many(
+        [
+            series["period_start"].to_numpy(dtype="datetime64[ns]").astype(np.float64)
+            for series in series_list
+        ],
+        [series["value"].to_numpy(dtype=np.float64) for series in series_list],
+        max_points,
+    )
+    downsampled = pd.concat(
+        [series.iloc[kept] for series, kept in zip(series_list, indices)],
+        ignore_index=True,
+    )
+    return downsampled, len(df_chart) - len(downsampled)
+
+
+ROLLING_WINDOWS = (30, 90)
+ROLLING_COLUMNS = [
+    "Magic",
+    "window",
+    "date",
+    "trades",
+    "profit",
+    "profit_factor",
+    "win_rate",
+    "max_drawdown_value",
+    "max_dd_percent",
+    "return_percent",
+]
+NS_PER_DAY = 86_400 * 10**9
+
+
+def cumulative(values):
+    return np.concatenate(([0.0], np.cumsum(values, dtype=float)))
+
+
+def rolling_ea_metrics(
+    closed_trades_df, initial_balance=None, windows=ROLLING_WINDOWS, end=None
+):
+    if closed_trades_df.empty:
+        return pd.DataFrame(columns=ROLLING_COLUMNS)
+    trades = closed_trades_df.sort_values(["Magic", "Time Close"], kind="stable")
+    magics, magic_index = np.unique(trades["Magic"].to_numpy(), return_inverse=True)
+    close_ns = trades["Time Close"].to_numpy(dtype="datetime64[ns]").astype(np.int64)
+    days = pd.date_range(
+        trades["Time Close"].min().normalize(),
+        pd.Timestamp(
+            end if end is not None else trades["Time Close"].max()
+        ).normalize(),
+        freq="D",
+    )
+    day_end_ns = days.asi8 + NS_PER_DAY
+    magic_starts = np.flatnonzero(np.diff(magic_index, prepend=-1))
+    magic_ends = np.append(magic_starts[1:], len(close_ns))
+
+    def offsets(bound_ns):
+        # Trades are sorted by close time within each magic's block, so every
+        # (magic, day) window boundary is a searchsorted inside that block.
+        return np.stack(
+            [
+                start + np.searchsorted(close_ns[start:stop], bound_ns, side="left")
+                for start, stop in zip(magic_starts, magic_ends)
+            ]
+        )
+
+    profit_net = trades["Profit"].to_numpy(dtype=float)
+    profit_raw = trades["Profit Raw Sum"].to_numpy(dtype=float)
+    cum_profit = cumulative(profit_net)
+    cum_wins = cumulative(profit_raw > 0)
+    cum_gross_profit = cumulative(np.where(profit_raw > 0, profit_raw, 0.0))
+    cum_gross_loss = cumulative(np.where(profit_raw < 0, -profit_raw, 0.0))
+
+    hi = offsets(day_end_ns)
+    equity = cum_profit[hi] - cum_profit[magic_starts][:, None]
+    active = day_end_ns[None, :] > close_ns[magic_starts][:, None]
+
+    balance_base = np.full(len(days), np.nan)
+    if initial_balance is not None and initial_balance > 0:
+        account_order = np.argsort(close_ns, kind="stable")
+        account_cum_profit = cumulative(profit_net[account_order])
+        account_close_ns = close_ns[account_order]
+
+    frames = []
+    for window in windows:
+        lo = offsets(day_end_ns - window * NS_PER_DAY)
+        num_trades = hi - lo
+        gross_profit = cum_gross_profit[hi] - cum_gross_profit[lo]
+        gross_loss = cum_gross_loss[hi] - cum_gross_loss[lo]
+        window_profit = cum_profit[hi] - cum_profit[lo]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            profit_factor = np.where(
+                gross_loss > 0,
+                gross_profit / gross_loss,
+                np.where(gross_profit > 0, np.inf, np.nan),
+            )
+            win_rate = np.where(
+                num_trades > 0, (cum_wins[hi] - cum_wins[lo]) / num_trades * 100, np.nan
+            )
+        # Drawdown on end-of-day equity, measured from the equity at the start
+        # of each window (the first element of every sliding window). One magic
+        # at a time keeps the days x (window + 1) views bounded.
+        max_drawdown = np.empty(equity.shape)
+        for row, magic_equity in enumerate(equity):
+            window_equity = np.lib.stride_tricks.sliding_window_view(
+                np.concatenate([np.zeros(window), magic_equity]), window + 1
+            )
+            max_drawdown[row] = (
+                np.maximum.accumulate(window_equity, axis=1) - window_equity
+            ).max(axis=1)
+        if initial_balance is not None and initial_balance > 0:
+            balance_base = (
+                initial_balance
+                + account_cum_profit[
+                    np.searchsorted(
+                        account_close_ns, day_end_ns - window * NS_PER_DAY, side="left"
+                    )
+                ]
+            )
+        with np.errstate(divide="ignore", invalid="ignore"):
+            base = np.where(balance_base > 0, balance_base, np.nan)[None, :]
+            max_dd_percent = max_drawdown / base * 100
+            return_percent = window_profit / base * 100
+        mask = active.ravel()
+        frames.append(
+            pd.DataFrame(
+                {
+                    "Magic": np.repeat(magics, len(days))[mask],
+                    "window": window,
+                    "date": np.tile(days.to_numpy(), len(magics))[mask],
+                    "trades": num_trades.ravel()[mask],
+                    "profit": window_profit.ravel()[mask],
+                    "profit_factor": profit_factor.ravel()[mask],
+                    "win_rate": win_rate.ravel()[mask],
+                    "max_drawdown_value": max_drawdown.ravel()[mask],
+                    "max_dd_percent": max_dd_percent.ravel()[mask],
+                    "return_percent": return_percent.ravel()[mask],
+                }
+            )
+        )
+    return pd.concat(frames, ignore_index=True)[ROLLING_COLUMNS]
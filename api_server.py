@@ -0,0 +1,438 @@
+import argparse
+import hashlib
+import json
+import logging
+import math
+import threading
+from collections import OrderedDict
+from datetime import date, datetime, timedelta
+
+import numpy as np
+import pandas as pd
+import tornado.ioloop
+import tornado.web
+
+from accounts import DEFAULT_SECRETS_PATH, accounts_from_secrets, load_secrets
+from analytics import (
+    build_closed_trades,
+    build_track_record_chart_from_rollups,
+    calculate_kpis,
+    calculate_kpis_by_group,
+    ea_label,
+)
+from connection_pool import MT5ConnectionError, MT5ConnectionPool, open_terminal
+from deal_store import ROLLUP_FREQS
+from poller import MT5Poller
+
+logger = logging.getLogger("mt5_api")
+
+
+def json_value(value):
+    if isinstance(value, np.generic):
+        value = value.item()
+    if isinstance(value, float) and not math.isfinite(value):
+        return None
+    if isinstance(value, (datetime, date, pd.Timestamp)):
+        return value.isoformat()
+    return value
+
+
+def frame_records(df):
+    return [
+        {column: json_value(value) for column, value in row.items()}
+        for row in df.to_dict("records")
+    ]
+
+
+def snapshot_meta(snapshot):
+    return {
+        "login": snapshot.login,
+        "deals_version": snapshot.deals_version,
+        "history_synced": snapshot.history_synced_at is not None,
+        "backfill_until": snapshot.backfill_until,
+        "last_error": None if snapshot.last_error is None else str(snapshot.last_error),
+    }
+
+
+def summary_token(snapshot):
+    if snapshot is None:
+        return None
+    return (
+        snapshot.account_info,
+        len(snapshot.positions),
+        len(snapshot.orders),
+        snapshot.deals_version,
+        snapshot.history_synced_at is None,
+        snapshot.backfill_until,
+        snapshot.last_error,
+    )
+
+
+class ResponseCache:
+    """Serialized JSON bodies keyed by endpoint, rebuilt only when their source
+    token changes.
+
+    The token is whatever the payload derives from (the snapshot's positions
+    tuple, the deals version, ...), so an unchanged snapshot costs a comparison
+    and keeps its ETag. Poll timestamps go in headers, not in the bodies.
+    """
+
+    def __init__(self, max_entries=256):
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+
+    def get(self, key, token, build):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] == token:
+                self._entries.move_to_end(key)
+                return entry[1], entry[2]
+        body = json.dumps(build(), default=json_value, allow_nan=False).encode()
+        etag = '"' + hashlib.sha1(body).hexdigest() + '"'
+        with self._lock:
+            self._entries[key] = (token, body, etag)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return body, etag
+
+
+class SnapshotApi:
+    def __init__(self, accounts, poller):
+        self.accounts = {account["login"]: account for account in accounts}
+        self.poller = poller
+        self.cache = ResponseCache()
+
+    def account_summary(self, login):
+        snapshot = self.poller.snapshot(login)
+        row = {"login": login, "name": self.accounts[login]["name"]}
+        if snapshot is None:
+            return row
+        account_info = snapshot.account_info
+        row.update(snapshot_meta(snapshot))
+        if account_info is not None:
+            row.update(
+                {
+                    "currency": account_info.currency,
+                    "balance": account_info.balance,
+                    "equity": account_info.equity,
+                    "profit": account_info.profit,
+                    "positions": len(snapshot.positions),
+                    "orders": len(snapshot.orders),
+                }
+            )
+        return row
+
+    def closed_trades(self, login, start, end):
+        deals_df = self.poller.deal_store(login).load(start, end)
+        return build_closed_trades(deals_df) if not deals_df.empty else pd.DataFrame()
+
+    def kpis(self, snapshot, start, end):
+        closed_trades_df = self.closed_trades(snapshot.login, start, end)
+        initial_balance = snapshot.account_info.balance
+        if not closed_trades_df.empty:
+            initial_balance -= closed_trades_df["Profit"].sum()
+        by_magic = pd.DataFrame()
+        if not closed_trades_df.empty:
+            by_magic = (
+                calculate_kpis_by_group(
+                    closed_trades_df,
+                    "Magic",
+                    initial_account_balance_for_period=initial_balance,
+                )
+                .rename_axis("magic")
+                .reset_index()
+            )
+        return {
+            **snapshot_meta(snapshot),
+            "start": start.isoformat(),
+            "end": end.isoformat(),
+            "initial_balance": json_value(initial_balance),
+            "account": {
+                key: json_value(value)
+                for key, value in calculate_kpis(
+                    closed_trades_df, initial_balance
+                ).items()
+            },
+            "magics": frame_records(by_magic),
+        }
+
+    def track_record(self, snapshot, freq_code, initial_balance):
+        store = self.poller.deal_store(snapshot.login)
+        daily_rollups = store.load_rollups("D")
+        series = pd.DataFrame(columns=["period_start", "value", "type"])
+        if not daily_rollups.empty:
+            items = ["Balance Cuenta"] + [
+                ea_label(magic)
+                for magic in sorted(
+                    daily_rollups.loc[daily_rollups["deals"] > 0, "magic"].unique()
+                )
+            ]
+            series = build_track_record_chart_from_rollups(
+                store.load_rollups(freq_code),
+                daily_rollups["period"].min(),
+                datetime.now(),
+                freq_code,
+                initial_balance,
+                items,
+            )
+        return {
+            **snapshot_meta(snapshot),
+            "freq": freq_code,
+            "initial_balance": initial_balance,
+            "series": {
+                name: frame_records(group[["period_start", "value"]])
+                for name, group in series.groupby("type", sort=False)
+            },
+        }
+
+
+class JsonHandler(tornado.web.RequestHandler):
+    def initialize(self, api):
+        self.api = api
+        self._etag = None
+
+    def compute_etag(self):
+        return self._etag
+
+    def write_error(self, status_code, **kwargs):
+        self.finish({"error": self._reason})
+
+    def snapshot(self, login):
+        login = int(login)
+        if login not in self.api.accounts:
+            raise tornado.web.HTTPError(404, reason=f"Cuenta {login} no configurada")
+        snapshot = self.api.poller.snapshot(login)
+        if snapshot is None or snapshot.account_info is None:
+            raise tornado.web.HTTPError(
+                503, reason=f"Sin datos de cuenta para {login} todavía"
+            )
+        return snapshot
+
+    def synced_snapshot(self, login):
+        snapshot = self.snapshot(login)
+        if snapshot.history_synced_at is None:
+            raise tornado.web.HTTPError(
+                503,
+                reason=f"Sincronizando historial de {snapshot.login}"
+                + (
+                    f" (hasta {snapshot.backfill_until:%Y-%m-%d})"
+                    if snapshot.backfill_until is not None
+                    else ""
+                ),
+            )
+        return snapshot
+
+    def respond(self, key, token, build, snapshot=None):
+        self.write_body(*self.api.cache.get(key, token, build), snapshot)
+
+    async def respond_in_executor(self, key, token, build, snapshot=None):
+        self.write_body(
+            *await tornado.ioloop.IOLoop.current().run_in_executor(
+                None, self.api.cache.get, key, token, build
+            ),
+            snapshot,
+        )
+
+    def write_body(self, body, etag, snapshot):
+        self._etag = etag
+        if snapshot is not None:
+            self.set_header("X-Snapshot-Taken-At", snapshot.taken_at.isoformat())
+            if snapshot.history_synced_at is not None:
+                self.set_header(
+                    "X-History-Synced-At", snapshot.history_synced_at.isoformat()
+                )
+        self.set_header("Content-Type", "application/json; charset=UTF-8")
+        self.set_header("Cache-Control", "no-cache")
+        self.write(body)
+
+    def date_argument(self, name, default):
+        value = self.get_argument(name, None)
+        if value is None:
+            return default
+        try:
+            return datetime.strptime(value, "%Y-%m-%d")
+        except ValueError:
+            raise tornado.web.HTTPError(400, reason=f"{name} debe ser YYYY-MM-DD")
+
+
+class AccountsHandler(JsonHandler):
+    def get(self):
+        self.respond(
+            "accounts",
+            tuple(
+                summary_token(self.api.poller.snapshot(login))
+                for login in self.api.accounts
+            ),
+            lambda: [self.api.account_summary(login) for login in self.api.accounts],
+        )
+
+
+class AccountHandler(JsonHandler):
+    def get(self, login):
+        snapshot = self.snapshot(login)
+        self.respond(
+            ("account", snapshot.login),
+            (
+                snapshot.account_info,
+                snapshot.deals_version,
+                snapshot.history_synced_at is None,
+                snapshot.backfill_until,
+                snapshot.last_error,
+            ),
+            lambda: {
+                **snapshot_meta(snapshot),
+                "account_info": snapshot.account_info._asdict(),
+            },
+            snapshot,
+        )
+
+
+class PositionsHandler(JsonHandler):
+    def get(self, login):
+        snapshot = self.snapshot(login)
+        self.respond(
+            ("positions", snapshot.login),
+            snapshot.positions,
+            lambda: {
+                "login": snapshot.login,
+                "positions": [position._asdict() for position in snapshot.positions],
+            },
+            snapshot,
+        )
+
+
+class OrdersHandler(JsonHandler):
+    def get(self, login):
+        snapshot = self.snapshot(login)
+        self.respond(
+            ("orders", snapshot.login),
+            snapshot.orders,
+            lambda: {
+                "login": snapshot.login,
+                "orders": [order._asdict() for order in snapshot.orders],
+            },
+            snapshot,
+        )
+
+
+class KpisHandler(JsonHandler):
+    async def get(self, login):
+        snapshot = self.synced_snapshot(login)
+        end = self.date_argument("end", datetime.now()).replace(
+            hour=23, minute=59, second=59, microsecond=999999
+        )
+        start = self.date_argument("start", end - timedelta(days=30)).replace(
+            hour=0, minute=0, second=0, microsecond=0
+        )
+        await self.respond_in_executor(
+            ("kpis", snapshot.login, start, end),
+            (snapshot.deals_version, snapshot.account_info.balance),
+            lambda: self.api.kpis(snapshot, start, end),
+            snapshot,
+        )
+
+
+class TrackRecordHandler(JsonHandler):
+    async def get(self, login):
+        snapshot = self.synced_snapshot(login)
+        freq_code = self.get_argument("freq", "D")
+        if freq_code not in ROLLUP_FREQS:
+            raise tornado.web.HTTPError(
+                400, reason=f"freq debe ser uno de {', '.join(ROLLUP_FREQS)}"
+            )
+        try:
+            initial_balance = float(self.get_argument("initial_balance", "10000"))
+        except ValueError:
+            raise tornado.web.HTTPError(400, reason="initial_balance debe ser numérico")
+        if initial_balance <= 0:
+            raise tornado.web.HTTPError(400, reason="initial_balance debe ser positivo")
+        await self.respond_in_executor(
+            ("track_record", snapshot.login, freq_code, initial_balance),
+            (snapshot.deals_version, datetime.now().date()),
+            lambda: self.api.track_record(snapshot, freq_code, initial_balance),
+            snapshot,
+        )
+
+
+def make_app(api):
+    login = r"/api/accounts/(\d+)"
+    return tornado.web.Application(
+        [
+            (r"/api/accounts", AccountsHandler, {"api": api}),
+            (login, AccountHandler, {"api": api}),
+            (login + "/positions", PositionsHandler, {"api": api}),
+            (login + "/orders", OrdersHandler, {"api": api}),
+            (login + "/kpis", KpisHandler, {"api": api}),
+            (login + "/track-record", TrackRecordHandler, {"api": api}),
+        ]
+    )
+
+
+def start_poller(accounts, deal_store_dir, interval):
+    pool = MT5ConnectionPool(open_terminal)
+    poller = MT5Poller(
+        pool, deal_store_dir, interval=interval, idle_timeout=float("inf")
+    )
+    for account in accounts:
+        try:
+            pool.connect(account)
+        except MT5ConnectionError as e:
+            logger.warning("%s", e)
+        poller.watch(account["login"])
+    return poller.start()
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="API JSON de solo lectura sobre los snapshots del poller MT5.",
+        epilog="Solo se sirven las cuentas con mt5_host/mt5_port en secrets: el "
+        "poller de la API cambia el login de los terminales que usa, así que no "
+        "deben ser los del dashboard ni los de otra instancia de la API.",
+    )
+    parser.add_argument("--secrets", default=DEFAULT_SECRETS_PATH)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8600)
+    parser.add_argument("--interval", type=float, default=2.0)
+    parser.add_argument("--deal-store-dir")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+
+    try:
+        secrets = load_secrets(args.secrets)
+        accounts, errors = accounts_from_secrets(secrets)
+    except OSError as e:
+        parser.error(f"No se pudo leer {args.secrets}: {e}")
+    except ValueError as e:
+        parser.error(str(e))
+    for error in errors:
+        logger.warning("%s", error)
+    for account in accounts:
+        if not account["host"]:
+            logger.warning(
+                "Cuenta %s omitida: sin mt5_host propio compartiría el terminal "
+                "por defecto con el dashboard.",
+                account["login"],
+            )
+    accounts = [account for account in accounts if account["host"]]
+    if not accounts:
+        parser.error(
+            f"No hay cuentas con mt5_host/mt5_port configurados en {args.secrets}."
+        )
+
+    poller = start_poller(
+        accounts,
+        args.deal_store_dir or secrets.get("deal_store_dir", ".deal_store"),
+        args.interval,
+    )
+    make_app(SnapshotApi(accounts, poller)).listen(args.port, address=args.host)
+    logger.info("API escuchando en http://%s:%d/api/accounts", args.host, args.port)
+    try:
+        tornado.ioloop.IOLoop.current().start()
+    finally:
+        poller.stop()
+
+
+if __name__ == "__main__":
+    main()
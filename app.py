@@ -6,96 +6,138 @@ from datetime import datetime, timedelta, date
 import time
 import altair as alt
 import numpy as np
+from functools import wraps
+from streamlit.runtime.scriptrunner import get_script_run_ctx
+from deal_store import DealSnapshot
+from poller import MT5Poller
+from accounts import accounts_from_secrets
+from connection_pool import MT5ConnectionError, MT5ConnectionPool, open_terminal
+from instrumentation import InstrumentedTerminal, Metrics
+from portfolio import load_portfolio, portfolio_totals
+from mt5_frames import ORDER_SCHEMA, POSITION_SCHEMA, LiveTable, zero_to_nan
+from analytics import (
+    build_closed_trades,
+    build_track_record_chart_from_rollups,
+    KpiAccumulator,
+    calculate_kpis_by_group,
+    downsample_chart,
+    ea_comparison_table,
+    ea_label,
+    rolling_ea_metrics,
+    track_record_summary,
+)
 
 st.set_page_config(page_title="Dashboard MT5 Multi-Cuenta Pro", layout="wide")
 
 
-def initialize_mt5(account_details):
-    login = account_details["login"]
-    password = account_details["password"]
-    server = account_details["server"]
-    mt5_path = account_details.get("path", None)
-    init_params = {}
-    if mt5_path and mt5_path.strip():
-        init_params["path"] = mt5_path
-    current_mt5_account_info = mt5.account_info()
-    if current_mt5_account_info and current_mt5_account_info.login == login:
-        st.session_state.connected_account_login = login
-        st.session_state.current_account_currency = current_mt5_account_info.currency
-        st.session_state.mt5_initialized_globally = True
-        return True
-    if (
-        st.session_state.get("connected_account_login")
-        and st.session_state.connected_account_login != login
-    ):
-        mt5.shutdown()
-        st.session_state.connected_account_login = None
-        st.session_state.current_account_currency = None
-        st.session_state.mt5_initialized_globally = False
-        time.sleep(0.5)
-    if not st.session_state.get("mt5_initialized_globally", False):
-        if not mt5.initialize(**init_params):
-            st.error(
-                f"initialize() falló para {login}, error code = {mt5.last_error()}"
-            )
-            st.session_state.mt5_initialized_globally = False
-            return False
-        st.session_state.mt5_initialized_globally = True
-    authorized = mt5.login(login, password=password, server=server)
-    if authorized:
-        account_info = mt5.account_info()
-        if account_info:
-            st.success(
-                f"Conectado a la cuenta #{account_info.login} ({account_info.name}) en {account_info.server}"
-            )
-            st.session_state.connected_account_login = account_info.login
-            st.session_state.current_account_currency = account_info.currency
-            return True
-        else:
-            st.error(
-                f"Fallo al obtener información de la cuenta {login} después del login, error code = {mt5.last_error()}"
-            )
-            mt5.shutdown()
-            st.session_state.connected_account_login = None
-            st.session_state.current_account_currency = None
-            st.session_state.mt5_initialized_globally = False
-            return False
-    else:
-        st.error(
-            f"Fallo al conectar a la cuenta #{login}, error code = {mt5.last_error()}"
+@st.cache_resource
+def get_metrics():
+    return Metrics()
+
+
+run_metrics = Metrics(parent=get_metrics())
+
+
+def stage(name, kind="compute"):
+    return run_metrics.timer(kind, name)
+
+
+def fragment(func, run_every=None):
+    @wraps(func)
+    def run(*args, **kwargs):
+        global run_metrics
+        ctx = get_script_run_ctx()
+        if ctx is not None and ctx.fragment_ids_this_run:
+            run_metrics = Metrics(parent=get_metrics(), tag="fragment")
+            st.session_state.setdefault("fragment_metrics", {})[
+                func.__name__
+            ] = run_metrics
+        return func(*args, **kwargs)
+
+    return st.fragment(run, run_every=run_every)
+
+
+POLLER_INTERVAL = 2.0
+POLLER_ORDERS_INTERVAL = 10.0
+
+
+@st.cache_resource
+def get_connection_pool():
+    metrics = get_metrics()
+    return MT5ConnectionPool(
+        lambda account_details: InstrumentedTerminal(
+            open_terminal(account_details), metrics
         )
-        mt5.shutdown()
+    )
+
+
+def initialize_mt5(account_details):
+    try:
+        connection = get_connection_pool().connect(account_details)
+    except MT5ConnectionError as e:
+        st.error(str(e))
         st.session_state.connected_account_login = None
         st.session_state.current_account_currency = None
-        st.session_state.mt5_initialized_globally = False
         return False
+    account_info = connection.account_info
+    st.success(
+        f"Conectado a la cuenta #{account_info.login} ({account_info.name}) en {account_info.server}"
+    )
+    st.session_state.connected_account_login = account_info.login
+    st.session_state.current_account_currency = account_info.currency
+    return True
 
 
-def get_open_orders():
-    if not st.session_state.get("connected_account_login"):
-        return pd.DataFrame()
-    account_info_current = mt5.account_info()
-    if (
-        not account_info_current
-        or account_info_current.login != st.session_state.connected_account_login
-    ):
-        return pd.DataFrame()
-    orders = mt5.orders_get()
-    if orders is None or len(orders) == 0:
+ORDER_COLUMNS = {
+    "ticket": "Ticket",
+    "time_setup_msc": "Time Setup",
+    "type": "Type",
+    "magic": "Magic",
+    "symbol": "Symbol",
+    "volume_current": "Volume",
+    "price_open": "Price Open",
+    "sl": "SL",
+    "tp": "TP",
+}
+POSITION_COLUMNS = {
+    "ticket": "Ticket",
+    "time_msc": "Time Open",
+    "type": "Type",
+    "magic": "Magic",
+    "symbol": "Symbol",
+    "volume": "Volume",
+    "price_open": "Price Open",
+    "sl": "SL",
+    "tp": "TP",
+    "price_current": "Price Current",
+    "profit": "Profit",
+}
+TRADE_PAGE_SIZES = [25, 50, 100, 250]
+ROLLING_METRICS = {
+    "Profit Factor": "profit_factor",
+    "Win Rate (%)": "win_rate",
+    "Max DD (%)": "max_dd_percent",
+    "Retorno (%)": "return_percent",
+    "Profit": "profit",
+    "Trades": "trades",
+}
+ROLLING_MAX_POINTS = 300
+DATETIME_COLUMN = st.column_config.DatetimeColumn(format="YYYY-MM-DD HH:mm:ss")
+TRADE_COLUMN_CONFIG = {"Time Open": DATETIME_COLUMN, "Time Close": DATETIME_COLUMN}
+
+
+def get_live_table(kind, schema, columns, mutable):
+    live_tables = st.session_state.setdefault("live_tables", {})
+    key = (st.session_state.connected_account_login, kind)
+    if key not in live_tables:
+        live_tables[key] = LiveTable(schema, columns, mutable)
+    return live_tables[key]
+
+
+def build_orders_frame(orders_frame):
+    if orders_frame.empty:
         return pd.DataFrame()
-    df_orders = pd.DataFrame(list(orders), columns=orders[0]._asdict().keys())
-    relevant_cols = {
-        "ticket": "Ticket",
-        "time_setup_msc": "Time Setup",
-        "type": "Type",
-        "magic": "Magic",
-        "symbol": "Symbol",
-        "volume_current": "Volume",
-        "price_open": "Price Open",
-        "sl": "SL",
-        "tp": "TP",
-    }
-    df_orders = df_orders[list(relevant_cols.keys())].rename(columns=relevant_cols)
+    df_orders = orders_frame.reset_index().rename(columns=ORDER_COLUMNS)
     order_type_map = {
         mt5.ORDER_TYPE_BUY: "BUY",
         mt5.ORDER_TYPE_SELL: "SELL",
@@ -108,56 +150,53 @@ def get_open_orders():
     }
     df_orders["Type"] = df_orders["Type"].map(order_type_map)
     df_orders["Time Setup"] = pd.to_datetime(df_orders["Time Setup"], unit="ms")
-    df_orders["SL"] = df_orders["SL"].apply(lambda x: np.nan if x == 0.0 else x)
-    df_orders["TP"] = df_orders["TP"].apply(lambda x: np.nan if x == 0.0 else x)
+    df_orders["SL"] = zero_to_nan(df_orders["SL"])
+    df_orders["TP"] = zero_to_nan(df_orders["TP"])
     return df_orders.sort_values(by="Time Setup", ascending=False)
 
 
-def get_positions():
-    if not st.session_state.get("connected_account_login"):
-        return pd.DataFrame()
-    account_info_current = mt5.account_info()
-    if (
-        not account_info_current
-        or account_info_current.login != st.session_state.connected_account_login
-    ):
-        return pd.DataFrame()
-    positions = mt5.positions_get()
-    if positions is None or len(positions) == 0:
+def get_open_orders():
+    account_snapshot = get_account_snapshot()
+    if account_snapshot is None:
         return pd.DataFrame()
-    df_positions = pd.DataFrame(list(positions), columns=positions[0]._asdict().keys())
-    relevant_cols = {
-        "ticket": "Ticket",
-        "time_msc": "Time Open",
-        "type": "Type",
-        "magic": "Magic",
-        "symbol": "Symbol",
-        "volume": "Volume",
-        "price_open": "Price Open",
-        "sl": "SL",
-        "tp": "TP",
-        "price_current": "Price Current",
-        "profit": "Profit",
-    }
-    df_positions = df_positions[list(relevant_cols.keys())].rename(
-        columns=relevant_cols
+    orders_table = get_live_table(
+        "orders",
+        ORDER_SCHEMA,
+        ORDER_COLUMNS,
+        ["volume_current", "price_open", "sl", "tp"],
     )
+    orders_table.update(account_snapshot.orders)
+    return orders_table.view(build_orders_frame)
+
+
+def build_positions_frame(positions_frame):
+    if positions_frame.empty:
+        return pd.DataFrame()
+    df_positions = positions_frame.reset_index().rename(columns=POSITION_COLUMNS)
     position_type_map = {mt5.POSITION_TYPE_BUY: "BUY", mt5.POSITION_TYPE_SELL: "SELL"}
     df_positions["Type"] = df_positions["Type"].map(position_type_map)
     df_positions["Time Open"] = pd.to_datetime(df_positions["Time Open"], unit="ms")
-    df_positions["SL"] = df_positions["SL"].apply(lambda x: np.nan if x == 0.0 else x)
-    df_positions["TP"] = df_positions["TP"].apply(lambda x: np.nan if x == 0.0 else x)
+    df_positions["SL"] = zero_to_nan(df_positions["SL"])
+    df_positions["TP"] = zero_to_nan(df_positions["TP"])
     return df_positions.sort_values(by="Time Open", ascending=False)
 
 
-def get_history_trades_closed(start_date, end_date):
-    if not st.session_state.get("connected_account_login"):
+def get_positions():
+    account_snapshot = get_account_snapshot()
+    if account_snapshot is None:
         return pd.DataFrame()
-    account_info_current = mt5.account_info()
-    if (
-        not account_info_current
-        or account_info_current.login != st.session_state.connected_account_login
-    ):
+    positions_table = get_live_table(
+        "positions",
+        POSITION_SCHEMA,
+        POSITION_COLUMNS,
+        ["volume", "sl", "tp", "price_current", "profit"],
+    )
+    positions_table.update(account_snapshot.positions)
+    return positions_table.view(build_positions_frame)
+
+
+def get_history_trades_closed(start_date, end_date):
+    if get_account_snapshot() is None:
         return pd.DataFrame()
     if isinstance(start_date, pd.Timestamp):
         start_date = start_date.to_pydatetime()
@@ -171,167 +210,187 @@ def get_history_trades_closed(start_date, end_date):
         end_date.date() if isinstance(end_date, datetime) else end_date,
         datetime.max.time(),
     )
-    deals = mt5.history_deals_get(start_date_dt, end_date_dt)
-    if deals is None:
+    return view_result(
+        ("closed_trades", start_date_dt, end_date_dt),
+        None,
+        lambda: build_closed_trades_for_period(start_date_dt, end_date_dt),
+    )
+
+
+def build_closed_trades_for_period(start_date_dt, end_date_dt):
+    deals_df = get_all_deals_for_period(start_date_dt, end_date_dt)
+    if deals_df.empty:
+        return pd.DataFrame()
+    return build_closed_trades(deals_df)
+
+
+def shutdown_mt5():
+    st.session_state.connected_account_login = None
+    st.session_state.current_account_currency = None
+    st.session_state.deal_snapshot = None
+    st.session_state.view_results = None
+    st.session_state.live_tables = {}
+    st.session_state.kpi_accumulators = {}
+
+
+def get_deal_store_dir():
+    try:
+        return st.secrets.get("deal_store_dir", ".deal_store")
+    except Exception:
+        return ".deal_store"
+
+
+@st.cache_resource
+def get_mt5_poller():
+    return MT5Poller(
+        get_connection_pool(),
+        get_deal_store_dir(),
+        interval=POLLER_INTERVAL,
+        orders_interval=POLLER_ORDERS_INTERVAL,
+    ).start()
+
+
+def get_account_snapshot():
+    login = st.session_state.get("connected_account_login")
+    if not login:
+        return None
+    account_snapshot = get_mt5_poller().watch(login)
+    if (
+        account_snapshot.account_info is None
+        or account_snapshot.account_info.login != login
+    ):
+        return None
+    return account_snapshot
+
+
+def account_snapshot_pending():
+    login = st.session_state.get("connected_account_login")
+    if not login:
+        return False
+    return get_mt5_poller().watch(login).taken_at is None
+
+
+def show_history_sync_status():
+    account_snapshot = get_account_snapshot()
+    if account_snapshot is None or account_snapshot.history_synced_at is not None:
+        return
+    if account_snapshot.last_error:
         st.warning(
-            f"Error al obtener deals del historial para el rango {start_date_dt.date()} - {end_date_dt.date()}: {mt5.last_error()}"
+            f"Error al sincronizar el historial de deals de la cuenta {account_snapshot.login}: {account_snapshot.last_error}"
         )
-        return pd.DataFrame()
-    if len(deals) == 0:
-        return pd.DataFrame()
-    deals_df = pd.DataFrame(list(deals), columns=deals[0]._asdict().keys())
-    deals_df = deals_df[
-        (
-            deals_df["entry"].isin(
-                [mt5.DEAL_ENTRY_IN, mt5.DEAL_ENTRY_OUT, mt5.DEAL_ENTRY_INOUT]
+    else:
+        st.info(
+            "Descargando historial de deals"
+            + (
+                f" (hasta {account_snapshot.backfill_until.strftime('%Y-%m-%d')})"
+                if account_snapshot.backfill_until
+                else ""
             )
+            + "... Los datos históricos se completarán automáticamente."
         )
-        & (deals_df["position_id"] > 0)
-        & (deals_df["type"].isin([mt5.DEAL_TYPE_BUY, mt5.DEAL_TYPE_SELL]))
-    ]
-    if deals_df.empty:
-        return pd.DataFrame()
-    deals_df["time_dt"] = pd.to_datetime(deals_df["time_msc"], unit="ms")
-    deals_df = deals_df.sort_values(by=["position_id", "time_dt"])
-    trades_list = []
-    for position_id, group in deals_df.groupby("position_id"):
-        if group.empty:
-            continue
-        first_deal_of_position = group.iloc[0]
-        last_deal_of_position = group.iloc[-1]
-        trade_profit_raw_sum = group["profit"].sum()
-        trade_commission_sum = group["commission"].sum()
-        trade_swap_sum = group["swap"].sum()
-        trade_profit_net = trade_profit_raw_sum + trade_commission_sum + trade_swap_sum
-        trade_action_type = (
-            "BUY" if first_deal_of_position["type"] == mt5.DEAL_TYPE_BUY else "SELL"
-        )
-        total_volume = first_deal_of_position["volume"]
-        trades_list.append(
-            {
-                "Position ID": position_id,
-                "Symbol": first_deal_of_position["symbol"],
-                "Magic": first_deal_of_position["magic"],
-                "Time Open": first_deal_of_position["time_dt"],
-                "Price Open": first_deal_of_position["price"],
-                "Time Close": last_deal_of_position["time_dt"],
-                "Price Close": last_deal_of_position["price"],
-                "Type": trade_action_type,
-                "Volume": total_volume,
-                "Profit": trade_profit_net,
-                "Commission": trade_commission_sum,
-                "Swap": trade_swap_sum,
-                "Order Open": first_deal_of_position["order"],
-                "Profit Raw Sum": trade_profit_raw_sum,
-            }
+
+
+def get_deal_snapshot():
+    login = st.session_state.get("connected_account_login")
+    if not login:
+        return None
+    account_snapshot = get_account_snapshot()
+    if account_snapshot is None:
+        return None
+    deal_snapshot = st.session_state.get("deal_snapshot")
+    if (
+        deal_snapshot is None
+        or deal_snapshot.login != login
+        or deal_snapshot.version != account_snapshot.deals_version
+    ):
+        st.session_state.deals_version_seen = account_snapshot.deals_version
+        deal_snapshot = DealSnapshot(
+            login,
+            get_mt5_poller().deal_store(login),
+            version=account_snapshot.deals_version,
         )
-    if not trades_list:
+        with stage("deal_snapshot_load") as span:
+            deal_snapshot.load()
+            span.rows = len(deal_snapshot.deals())
+        st.session_state.deal_snapshot = deal_snapshot
+    return deal_snapshot
+
+
+def view_result(name, key, compute):
+    account_snapshot = get_account_snapshot()
+    version = (
+        None
+        if account_snapshot is None
+        else (account_snapshot.login, account_snapshot.deals_version)
+    )
+    results = st.session_state.get("view_results")
+    if results is None or results["version"] != version:
+        results = {"version": version, "entries": {}}
+        st.session_state.view_results = results
+        if account_snapshot is not None:
+            st.session_state.deals_version_seen = account_snapshot.deals_version
+    entry = results["entries"].get(name)
+    if entry is None or entry[0] != key:
+        with stage(name[0] if isinstance(name, tuple) else name) as span:
+            entry = (key, compute())
+            if isinstance(entry[1], pd.DataFrame):
+                span.rows = len(entry[1])
+        results["entries"][name] = entry
+    return entry[1]
+
+
+def get_pnl_rollups(freq="D"):
+    login = st.session_state.get("connected_account_login")
+    if not login or get_account_snapshot() is None:
         return pd.DataFrame()
-    closed_trades_df = pd.DataFrame(trades_list)
-    return closed_trades_df.sort_values(by="Time Close", ascending=False)
-
-
-def calculate_kpis(closed_trades_df, initial_account_balance_for_period=None):
-    if closed_trades_df.empty:
-        return {
-            "max_dd_percent": 0,
-            "consecutive_wins": 0,
-            "profit_factor": np.nan,
-            "consecutive_losses": 0,
-            "total_profit_period": 0,
-            "num_trades": 0,
-            "gross_profit": 0,
-            "gross_loss": 0,
-            "max_drawdown_value": 0,
-            "win_rate": 0,
-        }
-    trades_df_sorted = closed_trades_df.sort_values(by="Time Close", ascending=True)
-    current_equity_net = 0
-    peak_equity_net = 0
-    max_drawdown_net = 0
-    total_profit_calc_period_net = trades_df_sorted["Profit"].sum()
-    max_consecutive_wins = 0
-    current_wins_streak = 0
-    max_consecutive_losses = 0
-    current_losses_streak = 0
-    gross_profit_raw = 0
-    gross_loss_raw = 0
-    num_trades = len(trades_df_sorted)
-    num_wins = 0
-    for _, trade in trades_df_sorted.iterrows():
-        current_equity_net += trade["Profit"]
-        if current_equity_net > peak_equity_net:
-            peak_equity_net = current_equity_net
-        drawdown_current = peak_equity_net - current_equity_net
-        if drawdown_current > max_drawdown_net:
-            max_drawdown_net = drawdown_current
-        profit_for_stats = trade["Profit Raw Sum"]
-        if profit_for_stats > 0:
-            num_wins += 1
-            gross_profit_raw += profit_for_stats
-            current_wins_streak += 1
-            current_losses_streak = 0
-            if current_wins_streak > max_consecutive_wins:
-                max_consecutive_wins = current_wins_streak
-        elif profit_for_stats < 0:
-            gross_loss_raw += abs(profit_for_stats)
-            current_losses_streak += 1
-            current_wins_streak = 0
-            if current_losses_streak > max_consecutive_losses:
-                max_consecutive_losses = current_losses_streak
-    win_rate_calc = (num_wins / num_trades * 100) if num_trades > 0 else 0
-    max_dd_percent_calc = 0.0
-    if max_drawdown_net > 0:
-        if (
-            initial_account_balance_for_period is not None
-            and initial_account_balance_for_period > 0
-        ):
-            max_dd_percent_calc = (
-                max_drawdown_net / initial_account_balance_for_period
-            ) * 100
-        elif peak_equity_net > 0:
-            max_dd_percent_calc = (max_drawdown_net / peak_equity_net) * 100
-    profit_factor_calc = np.nan
-    if gross_loss_raw > 0:
-        profit_factor_calc = round(gross_profit_raw / gross_loss_raw, 2)
-    elif gross_profit_raw > 0:
-        profit_factor_calc = np.inf
-    return {
-        "max_dd_percent": round(max_dd_percent_calc, 2),
-        "consecutive_wins": max_consecutive_wins,
-        "profit_factor": profit_factor_calc,
-        "consecutive_losses": max_consecutive_losses,
-        "total_profit_period": round(total_profit_calc_period_net, 2),
-        "num_trades": num_trades,
-        "gross_profit": round(gross_profit_raw, 2),
-        "gross_loss": round(gross_loss_raw, 2),
-        "max_drawdown_value": round(max_drawdown_net, 2),
-        "win_rate": round(win_rate_calc, 2),
-    }
+    return view_result(
+        ("pnl_rollups", freq),
+        None,
+        lambda: get_mt5_poller().deal_store(login).load_rollups(freq),
+    )
 
 
-def shutdown_mt5():
-    if st.session_state.get("connected_account_login"):
-        try:
-            mt5.shutdown()
-        except Exception as e:
-            st.warning(f"Error al intentar desconectar de MT5: {e}")
-        finally:
-            st.session_state.connected_account_login = None
-            st.session_state.current_account_currency = None
-            st.session_state.mt5_initialized_globally = False
+def get_balance_peaks():
+    login = st.session_state.get("connected_account_login")
+    if not login or get_account_snapshot() is None:
+        return pd.DataFrame()
+    return view_result(
+        "balance_peaks",
+        None,
+        lambda: get_mt5_poller().deal_store(login).load_balance_peaks(),
+    )
+
+
+def get_track_record_ea_options():
+    login = st.session_state.get("connected_account_login")
+    track_record_ea_options = ["Balance Cuenta"]
+    if not login or get_account_snapshot() is None:
+        return track_record_ea_options
+    for magic in get_mt5_poller().deal_store(login).load_traded_magics():
+        if magic == 0:
+            track_record_ea_options.append("Trades Manuales (Magic 0)")
+        else:
+            track_record_ea_options.append(f"EA {magic}")
+    return track_record_ea_options
+
+
+def get_kpi_accumulator(magic, period_start):
+    kpi_accumulators = st.session_state.setdefault("kpi_accumulators", {})
+    key = (st.session_state.connected_account_login, magic, period_start)
+    if key not in kpi_accumulators:
+        kpi_accumulators[key] = KpiAccumulator()
+    return kpi_accumulators[key]
 
 
 # MOVED FUNCTION DEFINITION EARLIER
 def get_all_deals_for_period(start_datetime, end_datetime):
-    if not st.session_state.get("connected_account_login"):
+    snapshot = get_deal_snapshot()
+    if snapshot is None:
         return pd.DataFrame()
-    deals = mt5.history_deals_get(start_datetime, end_datetime)
-    if deals is None or len(deals) == 0:
+    df_deals = snapshot.deals(start_datetime, end_datetime)
+    if df_deals.empty:
         return pd.DataFrame()
-    df_deals = pd.DataFrame(list(deals), columns=deals[0]._asdict().keys())
-    df_deals["time_dt"] = pd.to_datetime(df_deals["time_msc"], unit="ms")
-    return df_deals.sort_values(by="time_dt", ascending=True)
+    return df_deals
 
 
 if "accounts_config" not in st.session_state:
@@ -352,90 +411,44 @@ if "auto_refresh_interval" not in st.session_state:
     st.session_state.auto_refresh_interval = 40
 if "selected_magic_number_kpi" not in st.session_state:
     st.session_state.selected_magic_number_kpi = "AGREGADO (CUENTA COMPLETA)"
-if "mt5_initialized_globally" not in st.session_state:
-    st.session_state.mt5_initialized_globally = False
 if "auto_refresh_active" not in st.session_state:
     st.session_state.auto_refresh_active = False
+if "account_refresh_interval" not in st.session_state:
+    st.session_state.account_refresh_interval = 5
+if "positions_refresh_interval" not in st.session_state:
+    st.session_state.positions_refresh_interval = 5
+if "orders_refresh_interval" not in st.session_state:
+    st.session_state.orders_refresh_interval = 10
 if "track_record_grouping" not in st.session_state:
     st.session_state.track_record_grouping = "Diario"
 if "track_record_initial_balance_input" not in st.session_state:
     st.session_state.track_record_initial_balance_input = None
 if "track_record_selected_eas" not in st.session_state:
     st.session_state.track_record_selected_eas = []
+if "track_record_max_points" not in st.session_state:
+    st.session_state.track_record_max_points = 1000
 
 
 def load_accounts_from_secrets():
     try:
-        secret_accounts = st.secrets.get("mt5_account", [])
-        secret_passwords = st.secrets.get("mt5_password", [])
-        secret_servers = st.secrets.get("mt5_server", [])
-        secret_names = st.secrets.get("mt5_name", [])
-        secret_paths = st.secrets.get("mt5_path", [])
-        if isinstance(secret_accounts, str):
-            secret_accounts = [secret_accounts]
-        if isinstance(secret_passwords, str):
-            secret_passwords = [secret_passwords]
-        if isinstance(secret_servers, str):
-            secret_servers = [secret_servers]
-        if isinstance(secret_names, str):
-            secret_names = [secret_names]
-        if isinstance(secret_paths, str):
-            global_path_from_secrets = secret_paths.strip()
-            secret_paths = [global_path_from_secrets] * len(secret_accounts)
-        elif (
-            isinstance(secret_paths, list)
-            and len(secret_paths) == 1
-            and len(secret_accounts) > 1
-        ):
-            global_path_from_secrets = secret_paths[0].strip()
-            secret_paths = [global_path_from_secrets] * len(secret_accounts)
-        if not (len(secret_accounts) == len(secret_passwords) == len(secret_servers)):
-            st.warning(
-                "Las listas 'mt5_account', 'mt5_password', 'mt5_server' en secrets deben tener la misma longitud."
-            )
-            return
-        for i in range(len(secret_accounts)):
-            try:
-                login = int(secret_accounts[i])
-                name = (
-                    secret_names[i]
-                    if i < len(secret_names) and secret_names[i]
-                    else f"Cuenta Secreta {login}"
-                )
-                current_path = ""
-                if (
-                    i < len(secret_paths)
-                    and secret_paths[i]
-                    and secret_paths[i].strip()
-                ):
-                    current_path = secret_paths[i].strip()
-                config = {
-                    "name": name,
-                    "login": login,
-                    "password": secret_passwords[i],
-                    "server": secret_servers[i],
-                    "path": current_path,
-                }
-                existing_logins = [
-                    acc["login"] for acc in st.session_state.accounts_config
-                ]
-                if login not in existing_logins:
-                    st.session_state.accounts_config.append(config)
-                else:
-                    for idx, acc_cfg in enumerate(st.session_state.accounts_config):
-                        if acc_cfg["login"] == login:
-                            st.session_state.accounts_config[idx] = config
-                            break
-            except ValueError:
-                st.error(
-                    f"Error procesando cuenta #{i+1} de secrets: Login '{secret_accounts[i]}' inválido."
-                )
-            except IndexError:
-                st.error(
-                    f"Error de consistencia en listas de secrets para cuenta #{i+1}."
-                )
+        secret_accounts, errors = accounts_from_secrets(st.secrets)
+    except ValueError as e:
+        st.warning(str(e))
+        return
     except Exception as e:
         st.error(f"Error al cargar cuentas desde secrets.toml: {e}")
+        return
+    for error in errors:
+        st.error(error)
+    for config in secret_accounts:
+        existing_logins = [acc["login"] for acc in st.session_state.accounts_config]
+        if config["login"] not in existing_logins:
+            st.session_state.accounts_config.append(config)
+        else:
+            for idx, acc_cfg in enumerate(st.session_state.accounts_config):
+                if acc_cfg["login"] == config["login"]:
+                    st.session_state.accounts_config[idx] = config
+                    break
 
 
 if not st.session_state.secrets_loaded:
@@ -462,8 +475,20 @@ with st.sidebar:
         cfg_mt5_path = st.text_input(
             "Ruta terminal64.exe (Opcional)", key="cfg_mt5_path_manual"
         )
+        cfg_host = st.text_input(
+            "Host pymt5linux (Opcional)",
+            key="cfg_host_manual",
+            placeholder="Ej: localhost",
+        )
+        cfg_port_str = st.text_input(
+            "Puerto pymt5linux (Opcional)",
+            key="cfg_port_manual",
+            placeholder="Ej: 18812",
+        )
         if st.button("💾 Guardar Configuración Manual"):
-            if cfg_account_str.isdigit():
+            if cfg_port_str and not cfg_port_str.isdigit():
+                st.error("El puerto debe ser numérico.")
+            elif cfg_account_str.isdigit():
                 cfg_account = int(cfg_account_str)
                 if cfg_name and cfg_account > 0 and cfg_password and cfg_server:
                     new_config = {
@@ -472,6 +497,8 @@ with st.sidebar:
                         "password": cfg_password,
                         "server": cfg_server,
                         "path": cfg_mt5_path,
+                        "host": cfg_host,
+                        "port": int(cfg_port_str) if cfg_port_str else None,
                     }
                     found = False
                     for i, acc in enumerate(st.session_state.accounts_config):
@@ -617,24 +644,21 @@ with st.sidebar:
         if selected_grouping != st.session_state.track_record_grouping:
             st.session_state.track_record_grouping = selected_grouping
             st.rerun()
+        max_points_input = st.number_input(
+            "Máx. puntos por serie (0 = sin reducir):",
+            min_value=0,
+            value=st.session_state.track_record_max_points,
+            step=100,
+            key="tr_max_points_input",
+            help="Reduce cada serie del gráfico con LTTB conservando su forma (picos y valles) antes de enviarla al navegador.",
+        )
+        if max_points_input != st.session_state.track_record_max_points:
+            st.session_state.track_record_max_points = max_points_input
+            st.rerun()
 
-        all_deals_for_ea_options = get_all_deals_for_period(
-            datetime(2000, 1, 1), datetime.now()
+        track_record_ea_options = view_result(
+            "track_record_ea_options", None, get_track_record_ea_options
         )
-        track_record_ea_options = ["Balance Cuenta"]
-        if not all_deals_for_ea_options.empty:
-            trading_deals_for_options = all_deals_for_ea_options[
-                all_deals_for_ea_options["type"].isin(
-                    [mt5.DEAL_TYPE_BUY, mt5.DEAL_TYPE_SELL]
-                )
-            ]
-            if not trading_deals_for_options.empty:
-                unique_magics = sorted(trading_deals_for_options["magic"].unique())
-                for magic in unique_magics:
-                    if magic == 0:
-                        track_record_ea_options.append("Trades Manuales (Magic 0)")
-                    else:
-                        track_record_ea_options.append(f"EA {magic}")
 
         if not st.session_state.track_record_selected_eas or not all(
             item in track_record_ea_options
@@ -663,13 +687,24 @@ with st.sidebar:
         value=st.session_state.auto_refresh_active,
         disabled=not st.session_state.connected_account_login,
         key="auto_refresh_cb",
+        help=(
+            f"Cuenta cada {st.session_state.account_refresh_interval}s, posiciones cada "
+            f"{st.session_state.positions_refresh_interval}s y órdenes cada "
+            f"{st.session_state.orders_refresh_interval}s. El historial se comprueba cada "
+            f"{st.session_state.auto_refresh_interval}s y solo se recalcula si hay deals nuevos."
+        ),
     )
     st.session_state.auto_refresh_active = auto_refresh
 
 
-if st.session_state.connected_account_login:
-    account_info = mt5.account_info()
-    if account_info and account_info.login == st.session_state.connected_account_login:
+def refresh_every(interval):
+    return interval if st.session_state.get("auto_refresh_active", False) else None
+
+
+def render_account_metrics():
+    account_snapshot = get_account_snapshot()
+    if account_snapshot is not None:
+        account_info = account_snapshot.account_info
         st.subheader(f"Cuenta: {account_info.name} ({account_info.login})")
         col1, col2, col3, col4 = st.columns(4)
         currency = st.session_state.current_account_currency
@@ -679,6 +714,8 @@ if st.session_state.connected_account_login:
         col4.metric("Profit Flotante", f"{account_info.profit:.2f} {currency}")
         st.session_state.current_balance_for_kpi = account_info.balance
         st.session_state.current_equity_for_track_record = account_info.equity
+    elif account_snapshot_pending():
+        st.info("Esperando la primera lectura de la cuenta desde el terminal...")
     else:
         st.warning(
             f"Desincronización de cuenta o fallo al obtener datos. Verifique la conexión con MT5."
@@ -687,16 +724,178 @@ if st.session_state.connected_account_login:
             shutdown_mt5()
             st.rerun()
 
+
+def render_trade_browser(trades_df, columns, key):
+    columns = [c for c in columns if c in trades_df.columns]
+    control_cols = st.columns([2, 1, 1, 1])
+    sort_column = control_cols[0].selectbox(
+        "Ordenar por", columns, key=f"{key}_sort_column"
+    )
+    descending = control_cols[1].toggle(
+        "Descendente", value=True, key=f"{key}_descending"
+    )
+    page_size = control_cols[2].selectbox(
+        "Filas por página", TRADE_PAGE_SIZES, index=1, key=f"{key}_page_size"
+    )
+    num_pages = max(1, -(-len(trades_df) // page_size))
+    page = min(
+        control_cols[3].number_input(
+            "Página", min_value=1, value=1, step=1, key=f"{key}_page"
+        ),
+        num_pages,
+    )
+    order = np.argsort(trades_df[sort_column].to_numpy(), kind="stable")
+    if descending:
+        order = order[::-1]
+    page_start = (page - 1) * page_size
+    page_rows = order[page_start : page_start + page_size]
+    st.dataframe(
+        trades_df.iloc[page_rows][columns],
+        column_config=TRADE_COLUMN_CONFIG,
+        use_container_width=True,
+    )
+    st.caption(
+        f"Trades {page_start + 1}-{page_start + len(page_rows)} de {len(trades_df)} "
+        f"(página {page} de {num_pages})."
+    )
+
+
+def render_ea_rolling_metrics(closed_trades_df, initial_balance, history_start):
+    st.markdown("#### Rendimiento móvil por EA")
+    metric_label = st.selectbox(
+        "Métrica", list(ROLLING_METRICS), key="ea_rolling_metric"
+    )
+    df_rolling = view_result(
+        "ea_rolling",
+        (history_start, initial_balance),
+        lambda: rolling_ea_metrics(
+            closed_trades_df, initial_balance, end=datetime.now()
+        ),
+    )
+    df_rolling = df_rolling[df_rolling["Magic"] != 0]
+    df_chart = view_result(
+        "ea_rolling_chart",
+        (history_start, initial_balance, metric_label),
+        lambda: downsample_chart(
+            pd.DataFrame(
+                {
+                    "period_start": df_rolling["date"],
+                    "value": df_rolling[ROLLING_METRICS[metric_label]].replace(
+                        [np.inf, -np.inf], np.nan
+                    ),
+                    "EA": df_rolling["Magic"].map(ea_label),
+                    "Ventana": df_rolling["window"].astype(str) + " días",
+                }
+            )
+            .dropna(subset=["value"])
+            .assign(type=lambda x: x["EA"] + " · " + x["Ventana"]),
+            ROLLING_MAX_POINTS,
+        )[0],
+    )
+    if df_chart.empty:
+        st.info("No hay suficientes trades para calcular métricas móviles.")
+        return
+    small_multiples = (
+        alt.Chart(df_chart)
+        .mark_line()
+        .encode(
+            x=alt.X("period_start:T", title=None),
+            y=alt.Y("value:Q", title=metric_label),
+            color=alt.Color("Ventana:N", legend=alt.Legend(orient="top")),
+            tooltip=[
+                alt.Tooltip("period_start:T", title="Fecha", format="%Y-%m-%d"),
+                alt.Tooltip("Ventana:N"),
+                alt.Tooltip("value:Q", title=metric_label, format=".2f"),
+            ],
+        )
+        .properties(width=220, height=140)
+        .facet(facet=alt.Facet("EA:N", title=None), columns=4)
+    )
+    with stage("ea_rolling_altair", kind="render"):
+        st.altair_chart(small_multiples)
+    st.caption(
+        "Ventanas móviles de 30 y 90 días que terminan cada día. El drawdown se mide "
+        "sobre el equity de cierre diario del EA y los porcentajes sobre el balance "
+        "de la cuenta al inicio de cada ventana."
+    )
+
+
+def render_positions():
+    st.subheader("Posiciones Abiertas")
+    with stage("positions_frame") as span:
+        df_positions = get_positions()
+        span.rows = len(df_positions)
+    if df_positions is not None and not df_positions.empty:
+        # get_positions() returns the LiveTable view, only rebuilt on new versions.
+        st.dataframe(
+            df_positions,
+            column_config={"Time Open": DATETIME_COLUMN},
+            use_container_width=True,
+            height=(len(df_positions) + 1) * 35 + 3,
+        )
+    elif df_positions is None:
+        st.error("Error al obtener posiciones abiertas.")
+    else:
+        st.info("No hay posiciones abiertas.")
+
+
+def render_orders():
+    st.subheader("Órdenes Pendientes")
+    with stage("orders_frame") as span:
+        df_orders = get_open_orders()
+        span.rows = len(df_orders)
+    if df_orders is not None and not df_orders.empty:
+        st.dataframe(
+            df_orders,
+            column_config={"Time Setup": DATETIME_COLUMN},
+            use_container_width=True,
+            height=(len(df_orders) + 1) * 35 + 3,
+        )
+    elif df_orders is None:
+        st.error("Error al obtener órdenes pendientes.")
+    else:
+        st.info("No hay órdenes pendientes abiertas.")
+
+
+def watch_new_deals():
+    account_snapshot = get_account_snapshot()
+    if (
+        account_snapshot is not None
+        and account_snapshot.deals_version != st.session_state.get("deals_version_seen")
+    ):
+        st.rerun()
+
+
+def watch_first_snapshot():
+    if not account_snapshot_pending():
+        st.rerun()
+
+
+if st.session_state.connected_account_login:
+    currency = st.session_state.current_account_currency
+    fragment(
+        render_account_metrics,
+        run_every=refresh_every(st.session_state.account_refresh_interval),
+    )()
+
     tab_names = [
         "📊 KPIs Cuenta/EA",
         "📈 Posiciones",
         "📋 Órdenes",
         "🏆 Comparativa EAs",
         "🗓️ Track Record",
+        "🌐 Portafolio",
     ]
-    tab1, tab2, tab3, tab4, tab5 = st.tabs(tab_names)
+    show_history_sync_status()
+    active_view = st.radio(
+        "Vista",
+        tab_names,
+        horizontal=True,
+        key="active_view",
+        label_visibility="collapsed",
+    )
 
-    with tab1:
+    if active_view == tab_names[0]:
         st.subheader("Key Performance Indicators (KPIs Generales)")
         if "kpi_start_date" in st.session_state and "kpi_end_date" in st.session_state:
             date_range_col, magic_selector_col = st.columns([3, 2])
@@ -767,11 +966,12 @@ if st.session_state.connected_account_login:
                     st.rerun()
                 trades_to_process_for_kpi = pd.DataFrame()
                 kpi_title_suffix = ""
+                kpi_magic = None
                 if (
                     st.session_state.selected_magic_number_kpi
                     == "AGREGADO (CUENTA COMPLETA)"
                 ):
-                    trades_to_process_for_kpi = closed_trades_df_full_period.copy()
+                    trades_to_process_for_kpi = closed_trades_df_full_period
                     kpi_title_suffix = " (Cuenta Completa)"
                 elif (
                     st.session_state.selected_magic_number_kpi
@@ -779,8 +979,9 @@ if st.session_state.connected_account_login:
                 ):
                     trades_to_process_for_kpi = closed_trades_df_full_period[
                         closed_trades_df_full_period["Magic"] == 0
-                    ].copy()
+                    ]
                     kpi_title_suffix = " (Trades Manuales - Magic 0)"
+                    kpi_magic = 0
                 else:
                     try:
                         selected_m_num = int(
@@ -788,8 +989,9 @@ if st.session_state.connected_account_login:
                         )
                         trades_to_process_for_kpi = closed_trades_df_full_period[
                             closed_trades_df_full_period["Magic"] == selected_m_num
-                        ].copy()
+                        ]
                         kpi_title_suffix = f" (EA Magic {selected_m_num})"
+                        kpi_magic = selected_m_num
                     except (ValueError, IndexError):
                         pass
                 if trades_to_process_for_kpi.empty:
@@ -811,10 +1013,16 @@ if st.session_state.connected_account_login:
                     elif closed_trades_df_full_period.empty:
                         st.info(f"No hay trades cerrados en el periodo seleccionado.")
                 else:
-                    kpis = calculate_kpis(
-                        trades_to_process_for_kpi.copy(),
-                        initial_account_balance_for_period=initial_balance_for_dd_calc_tab1,
-                    )
+                    with stage("kpis"):
+                        kpis = (
+                            get_kpi_accumulator(
+                                kpi_magic, st.session_state.kpi_start_date
+                            )
+                            .update(trades_to_process_for_kpi)
+                            .kpis(
+                                initial_account_balance_for_period=initial_balance_for_dd_calc_tab1
+                            )
+                        )
                     st.markdown(f"#### Resultados KPIs{kpi_title_suffix}")
                     if initial_balance_for_dd_calc_tab1 > 0:
                         st.caption(
@@ -850,17 +1058,6 @@ if st.session_state.connected_account_login:
                     with st.expander(
                         f"Ver Historial de Trades Cerrados del Periodo{kpi_title_suffix}"
                     ):
-                        display_df = trades_to_process_for_kpi.copy()
-                        for col_time in ["Time Open", "Time Close"]:
-                            if (
-                                col_time in display_df.columns
-                                and not pd.api.types.is_string_dtype(
-                                    display_df[col_time]
-                                )
-                            ):
-                                display_df[col_time] = display_df[col_time].dt.strftime(
-                                    "%Y-%m-%d %H:%M:%S"
-                                )
                         cols_to_show = [
                             "Time Close",
                             "Symbol",
@@ -874,54 +1071,25 @@ if st.session_state.connected_account_login:
                             "Magic",
                             "Position ID",
                         ]
-                        st.dataframe(
-                            display_df[
-                                [c for c in cols_to_show if c in display_df.columns]
-                            ],
-                            use_container_width=True,
+                        fragment(render_trade_browser)(
+                            trades_to_process_for_kpi, cols_to_show, "kpi_trades"
                         )
         else:
             st.info("Selecciona rango de fechas para KPIs en el panel lateral.")
 
-    with tab2:
-        st.subheader("Posiciones Abiertas")
-        df_positions = get_positions()
-        if df_positions is not None and not df_positions.empty:
-            df_positions_display = df_positions.copy()
-            if "Time Open" in df_positions_display.columns:
-                df_positions_display["Time Open"] = df_positions_display[
-                    "Time Open"
-                ].dt.strftime("%Y-%m-%d %H:%M:%S")
-            st.dataframe(
-                df_positions_display,
-                use_container_width=True,
-                height=(len(df_positions) + 1) * 35 + 3,
-            )
-        elif df_positions is None:
-            st.error("Error al obtener posiciones abiertas.")
-        else:
-            st.info("No hay posiciones abiertas.")
+    elif active_view == tab_names[1]:
+        fragment(
+            render_positions,
+            run_every=refresh_every(st.session_state.positions_refresh_interval),
+        )()
 
-    with tab3:
-        st.subheader("Órdenes Pendientes")
-        df_orders = get_open_orders()
-        if df_orders is not None and not df_orders.empty:
-            df_orders_display = df_orders.copy()
-            if "Time Setup" in df_orders_display.columns:
-                df_orders_display["Time Setup"] = df_orders_display[
-                    "Time Setup"
-                ].dt.strftime("%Y-%m-%d %H:%M:%S")
-            st.dataframe(
-                df_orders_display,
-                use_container_width=True,
-                height=(len(df_orders) + 1) * 35 + 3,
-            )
-        elif df_orders is None:
-            st.error("Error al obtener órdenes pendientes.")
-        else:
-            st.info("No hay órdenes pendientes abiertas.")
+    elif active_view == tab_names[2]:
+        fragment(
+            render_orders,
+            run_every=refresh_every(st.session_state.orders_refresh_interval),
+        )()
 
-    with tab4:
+    elif active_view == tab_names[3]:
         st.subheader("Comparativa de Rendimiento por EA")
         years_of_history_for_ea_tab = 5
         start_date_ea_history = datetime.now() - timedelta(
@@ -965,81 +1133,62 @@ if st.session_state.connected_account_login:
                     f"No hay trades de EAs (Magic Number > 0) en el historial de los últimos {years_of_history_for_ea_tab} años."
                 )
             else:
-                ea_kpis_list = []
-                for magic in magic_numbers:
-                    df_ea_trades = full_history_trades_tab4[
-                        full_history_trades_tab4["Magic"] == magic
-                    ].copy()
-                    if not df_ea_trades.empty:
-                        kpis_ea = calculate_kpis(
-                            df_ea_trades,
+                ea_trades_tab4 = full_history_trades_tab4[
+                    full_history_trades_tab4["Magic"] != 0
+                ]
+                df_ea_comparison = view_result(
+                    "ea_comparison",
+                    (
+                        start_date_ea_history.date(),
+                        initial_balance_for_dd_calc_tab4,
+                        currency,
+                    ),
+                    lambda: ea_comparison_table(
+                        calculate_kpis_by_group(
+                            ea_trades_tab4,
+                            "Magic",
                             initial_account_balance_for_period=initial_balance_for_dd_calc_tab4,
-                        )
-                        ea_kpis_list.append(
-                            {
-                                "EA (Magic)": magic,
-                                "Trades": kpis_ea["num_trades"],
-                                "Win Rate (%)": kpis_ea["win_rate"],
-                                "Profit Factor": kpis_ea["profit_factor"],
-                                "Max DD (%)": kpis_ea["max_dd_percent"],
-                                f"Max DD ({currency})": kpis_ea["max_drawdown_value"],
-                                "Racha Victorias": kpis_ea["consecutive_wins"],
-                                "Racha Pérdidas": kpis_ea["consecutive_losses"],
-                                f"Total Profit ({currency})": kpis_ea[
-                                    "total_profit_period"
-                                ],
-                            }
-                        )
-                if ea_kpis_list:
-                    df_ea_comparison = pd.DataFrame(ea_kpis_list)
+                        ),
+                        currency,
+                    ),
+                )
+                if not df_ea_comparison.empty:
                     st.dataframe(
-                        df_ea_comparison.set_index("EA (Magic)"),
+                        df_ea_comparison.rename_axis("EA (Magic)"),
                         use_container_width=True,
                     )
                     with st.expander("Ver trades detallados por EA (mismo periodo)"):
-                        for magic in magic_numbers:
-                            df_magic_display = full_history_trades_tab4[
-                                full_history_trades_tab4["Magic"] == magic
-                            ].copy()
-                            if not df_magic_display.empty:
-                                st.markdown(f"#### EA Magic {magic}")
-                                for col_time in ["Time Open", "Time Close"]:
-                                    if (
-                                        col_time in df_magic_display.columns
-                                        and not pd.api.types.is_string_dtype(
-                                            df_magic_display[col_time]
-                                        )
-                                    ):
-                                        df_magic_display[col_time] = df_magic_display[
-                                            col_time
-                                        ].dt.strftime("%Y-%m-%d %H:%M:%S")
-                                cols_ea_hist = [
-                                    "Time Close",
-                                    "Symbol",
-                                    "Type",
-                                    "Volume",
-                                    "Price Open",
-                                    "Price Close",
-                                    "Profit",
-                                    "Commission",
-                                    "Swap",
-                                    "Position ID",
-                                ]
-                                st.dataframe(
-                                    df_magic_display[
-                                        [
-                                            c
-                                            for c in cols_ea_hist
-                                            if c in df_magic_display.columns
-                                        ]
-                                    ],
-                                    height=200,
-                                    use_container_width=True,
-                                )
+                        magic = st.selectbox(
+                            "EA Magic", magic_numbers, key="ea_trades_magic"
+                        )
+                        df_magic_display = ea_trades_tab4[
+                            ea_trades_tab4["Magic"] == magic
+                        ]
+                        st.markdown(f"#### EA Magic {magic}")
+                        cols_ea_hist = [
+                            "Time Close",
+                            "Symbol",
+                            "Type",
+                            "Volume",
+                            "Price Open",
+                            "Price Close",
+                            "Profit",
+                            "Commission",
+                            "Swap",
+                            "Position ID",
+                        ]
+                        fragment(render_trade_browser)(
+                            df_magic_display, cols_ea_hist, "ea_trades"
+                        )
+                    render_ea_rolling_metrics(
+                        full_history_trades_tab4,
+                        initial_balance_for_dd_calc_tab4,
+                        start_date_ea_history.date(),
+                    )
                 else:
                     st.info("No se pudieron calcular KPIs para los EAs encontrados.")
 
-    with tab5:
+    elif active_view == tab_names[4]:
         st.subheader("Track Record General y Rendimiento de EAs")
         user_initial_balance_for_tr = (
             st.session_state.track_record_initial_balance_input
@@ -1055,15 +1204,16 @@ if st.session_state.connected_account_login:
             end_date_tr_all_history = datetime.now()
             start_date_tr_all_history = datetime(2000, 1, 1)
 
-            all_deals_complete_history = get_all_deals_for_period(
-                start_date_tr_all_history, end_date_tr_all_history
-            )
+            daily_rollups = get_pnl_rollups("D")
 
-            if all_deals_complete_history.empty:
+            if daily_rollups.empty:
                 first_deal_date_str = np.nan
                 st.info("No hay historial de operaciones (deals) para esta cuenta.")
             else:
-                first_deal_date = all_deals_complete_history["time_dt"].min().date()
+                summary_all_time = track_record_summary(
+                    daily_rollups, get_balance_peaks(), user_initial_balance_for_tr
+                )
+                first_deal_date = summary_all_time["first_day"].date()
                 first_deal_date_str = first_deal_date.strftime("%Y-%m-%d")
                 st.markdown(
                     f"Mostrando datos de actividad de toda la cuenta (desde {first_deal_date_str} hasta {end_date_tr_all_history.strftime('%Y-%m-%d')}), "
@@ -1071,33 +1221,9 @@ if st.session_state.connected_account_login:
                     f"Cálculos basados en un Balance Inicial de Cuenta de **{user_initial_balance_for_tr:.2f} {currency}**."
                 )
 
-                trading_deals_summary = all_deals_complete_history[
-                    all_deals_complete_history["type"].isin(
-                        [mt5.DEAL_TYPE_BUY, mt5.DEAL_TYPE_SELL]
-                    )
-                    & all_deals_complete_history["entry"].isin(
-                        [mt5.DEAL_ENTRY_IN, mt5.DEAL_ENTRY_OUT, mt5.DEAL_ENTRY_INOUT]
-                    )
-                ].copy()
-                balance_ops_summary = all_deals_complete_history[
-                    all_deals_complete_history["type"] == mt5.DEAL_TYPE_BALANCE
-                ].copy()
-                profit_all_time = 0
-                deposits_all_time = 0
-                withdrawals_all_time = 0
-                if not trading_deals_summary.empty:
-                    profit_all_time = (
-                        trading_deals_summary["profit"].sum()
-                        + trading_deals_summary["commission"].sum()
-                        + trading_deals_summary["swap"].sum()
-                    )
-                if not balance_ops_summary.empty:
-                    deposits_all_time = balance_ops_summary[
-                        balance_ops_summary["profit"] > 0
-                    ]["profit"].sum()
-                    withdrawals_all_time = balance_ops_summary[
-                        balance_ops_summary["profit"] < 0
-                    ]["profit"].sum()
+                profit_all_time = summary_all_time["profit"]
+                deposits_all_time = summary_all_time["deposits"]
+                withdrawals_all_time = summary_all_time["withdrawals"]
 
                 summary_col, chart_col = st.columns([1, 2])
                 with summary_col:
@@ -1141,9 +1267,14 @@ if st.session_state.connected_account_login:
                         start_date_tr_all_history.date(), end_date_tr_all_history.date()
                     )
                     if not all_closed_trades_ever.empty:
-                        kpis_drawdown_total = calculate_kpis(
-                            all_closed_trades_ever, user_initial_balance_for_tr
-                        )
+                        with stage("kpis"):
+                            kpis_drawdown_total = (
+                                get_kpi_accumulator(
+                                    None, start_date_tr_all_history.date()
+                                )
+                                .update(all_closed_trades_ever)
+                                .kpis(user_initial_balance_for_tr)
+                            )
                         st.metric(
                             "Drawdown % (Total Cuenta, vs Bal. Inicial)",
                             f"{kpis_drawdown_total['max_dd_percent']:.2f}%",
@@ -1158,29 +1289,7 @@ if st.session_state.connected_account_login:
                         "current_equity_for_track_record", current_acc_balance
                     )
                     st.metric("Equity Actual Real", f"{current_equity:.2f} {currency}")
-                    highest_balance_ever = user_initial_balance_for_tr
-                    temp_running_balance_for_peak = user_initial_balance_for_tr
-                    if not all_deals_complete_history.empty:
-                        all_ops_sorted_for_peak = pd.concat(
-                            [
-                                trading_deals_summary[
-                                    ["time_dt", "profit", "commission", "swap"]
-                                ].assign(
-                                    delta=lambda x: x["profit"]
-                                    + x["commission"]
-                                    + x["swap"]
-                                ),
-                                balance_ops_summary[["time_dt", "profit"]].rename(
-                                    columns={"profit": "delta"}
-                                ),
-                            ]
-                        ).sort_values("time_dt")
-                        if not all_ops_sorted_for_peak.empty:
-                            for delta_val in all_ops_sorted_for_peak["delta"]:
-                                temp_running_balance_for_peak += delta_val
-                                highest_balance_ever = max(
-                                    highest_balance_ever, temp_running_balance_for_peak
-                                )
+                    highest_balance_ever = summary_all_time["highest_balance"]
                     if current_acc_balance > highest_balance_ever:
                         highest_balance_ever = current_acc_balance
                     st.metric(
@@ -1197,12 +1306,7 @@ if st.session_state.connected_account_login:
                         "Withdrawals (Total Cuenta)",
                         f"{abs(withdrawals_all_time):.2f} {currency}",
                     )
-                    interest_costs_total = 0
-                    if not trading_deals_summary.empty:
-                        interest_costs_total = (
-                            trading_deals_summary["commission"].sum()
-                            + trading_deals_summary["swap"].sum()
-                        )
+                    interest_costs_total = summary_all_time["interest_costs"]
                     st.metric(
                         "Interest/Costs (Total Cuenta)",
                         f"{interest_costs_total:.2f} {currency}",
@@ -1239,148 +1343,32 @@ if st.session_state.connected_account_login:
                         )
                         date_format_tooltip = "%Y-%m"
 
-                    chart_periods = pd.date_range(
-                        start=actual_chart_start_date,
-                        end=end_date_tr_all_history,
-                        freq=freq_code,
-                    ).to_series()
-                    chart_periods = chart_periods.dt.tz_localize(None)
-
-                    def get_period_group(dt, freq):
-                        if freq == "D":
-                            return dt.floor("D")
-                        if freq == "W-MON":
-                            return dt.to_period("W").start_time
-                        if freq == "MS":
-                            return dt.to_period("M").start_time
-                        return dt.floor("D")
-
-                    _all_deals_for_chart = all_deals_complete_history.copy()
-                    if not _all_deals_for_chart.empty:
-                        _all_deals_for_chart.loc[:, "period_group"] = (
-                            _all_deals_for_chart["time_dt"].apply(
-                                lambda x: get_period_group(x, freq_code)
-                            )
-                        )
-
-                    _trading_deals_chart = _all_deals_for_chart[
-                        _all_deals_for_chart["type"].isin(
-                            [mt5.DEAL_TYPE_BUY, mt5.DEAL_TYPE_SELL]
-                        )
-                        & _all_deals_for_chart["entry"].isin(
-                            [
-                                mt5.DEAL_ENTRY_IN,
-                                mt5.DEAL_ENTRY_OUT,
-                                mt5.DEAL_ENTRY_INOUT,
-                            ]
-                        )
-                    ]
-                    _balance_ops_chart = _all_deals_for_chart[
-                        _all_deals_for_chart["type"] == mt5.DEAL_TYPE_BALANCE
-                    ]
-
-                    chart_data_list = []
-                    running_balance_chart = user_initial_balance_for_tr
-                    magic_numbers_in_deals_chart = (
-                        _trading_deals_chart["magic"].unique()
-                        if not _trading_deals_chart.empty
-                        else []
+                    chart_key = (
+                        end_date_tr_all_history.date(),
+                        freq_code,
+                        user_initial_balance_for_tr,
+                        tuple(selected_eas_for_tr_chart),
+                    )
+                    max_points_per_series = st.session_state.track_record_max_points
+                    df_chart = view_result(
+                        "track_record_chart",
+                        chart_key,
+                        lambda: build_track_record_chart_from_rollups(
+                            get_pnl_rollups(freq_code),
+                            actual_chart_start_date,
+                            end_date_tr_all_history,
+                            freq_code,
+                            user_initial_balance_for_tr,
+                            selected_eas_for_tr_chart,
+                        ),
+                    )
+                    df_chart, dropped_chart_points = view_result(
+                        "track_record_downsample",
+                        (chart_key, max_points_per_series),
+                        lambda: downsample_chart(df_chart, max_points_per_series),
                     )
-                    cumulative_ea_profits_chart = {
-                        magic: 0.0 for magic in magic_numbers_in_deals_chart
-                    }
-
-                    for period_start_dt in chart_periods:
-                        deals_in_this_chart_period = _trading_deals_chart[
-                            _trading_deals_chart["period_group"] == period_start_dt
-                        ]
-                        balance_ops_in_this_chart_period = _balance_ops_chart[
-                            _balance_ops_chart["period_group"] == period_start_dt
-                        ]
-                        period_profit_sum_chart = (
-                            deals_in_this_chart_period["profit"].sum()
-                            if not deals_in_this_chart_period.empty
-                            else 0
-                        )
-                        period_comm_sum_chart = (
-                            deals_in_this_chart_period["commission"].sum()
-                            if not deals_in_this_chart_period.empty
-                            else 0
-                        )
-                        period_swap_sum_chart = (
-                            deals_in_this_chart_period["swap"].sum()
-                            if not deals_in_this_chart_period.empty
-                            else 0
-                        )
-                        period_balance_op_sum_chart = (
-                            balance_ops_in_this_chart_period["profit"].sum()
-                            if not balance_ops_in_this_chart_period.empty
-                            else 0
-                        )
-                        running_balance_chart += (
-                            period_profit_sum_chart
-                            + period_comm_sum_chart
-                            + period_swap_sum_chart
-                            + period_balance_op_sum_chart
-                        )
-
-                        if "Balance Cuenta" in selected_eas_for_tr_chart:
-                            value_to_plot_balance = (
-                                (running_balance_chart - user_initial_balance_for_tr)
-                                / user_initial_balance_for_tr
-                            ) * 100
-                            chart_data_list.append(
-                                {
-                                    "period_start": period_start_dt,
-                                    "value": value_to_plot_balance,
-                                    "type": "Balance Cuenta",
-                                }
-                            )
-
-                        for magic in magic_numbers_in_deals_chart:
-                            ea_name_key = (
-                                f"EA {magic}"
-                                if magic != 0
-                                else "Trades Manuales (Magic 0)"
-                            )
-                            if ea_name_key in selected_eas_for_tr_chart:
-                                ea_deals_this_chart_period = deals_in_this_chart_period[
-                                    deals_in_this_chart_period["magic"] == magic
-                                ]
-                                period_ea_profit_chart = (
-                                    ea_deals_this_chart_period["profit"].sum()
-                                    if not ea_deals_this_chart_period.empty
-                                    else 0
-                                )
-                                period_ea_comm_chart = (
-                                    ea_deals_this_chart_period["commission"].sum()
-                                    if not ea_deals_this_chart_period.empty
-                                    else 0
-                                )
-                                period_ea_swap_chart = (
-                                    ea_deals_this_chart_period["swap"].sum()
-                                    if not ea_deals_this_chart_period.empty
-                                    else 0
-                                )
-                                cumulative_ea_profits_chart[magic] += (
-                                    period_ea_profit_chart
-                                    + period_ea_comm_chart
-                                    + period_ea_swap_chart
-                                )
-                                value_to_plot_ea = (
-                                    cumulative_ea_profits_chart[magic]
-                                    / user_initial_balance_for_tr
-                                ) * 100
-                                chart_data_list.append(
-                                    {
-                                        "period_start": period_start_dt,
-                                        "value": value_to_plot_ea,
-                                        "type": ea_name_key,
-                                    }
-                                )
 
-                    if chart_data_list:
-                        df_chart = pd.DataFrame(chart_data_list)
+                    if not df_chart.empty:
                         tooltip_value_format = ".2f"
 
                         base = alt.Chart(df_chart).encode(
@@ -1433,8 +1421,15 @@ if st.session_state.connected_account_login:
                                 title=f"Rendimiento de Toda la Cuenta ({grouping_mode})",
                             )
                         )
-                        st.altair_chart(layered_chart, use_container_width=True)
-                    elif all_deals_complete_history.empty:
+                        with stage("track_record_altair", kind="render"):
+                            st.altair_chart(layered_chart, use_container_width=True)
+                        if dropped_chart_points:
+                            st.caption(
+                                f"Gráfico reducido con LTTB a {len(df_chart)} puntos "
+                                f"(máx. {max_points_per_series} por serie): "
+                                f"{dropped_chart_points} puntos omitidos."
+                            )
+                    elif daily_rollups.empty:
                         st.info(
                             "No hay historial de operaciones (deals) para esta cuenta."
                         )
@@ -1442,15 +1437,117 @@ if st.session_state.connected_account_login:
                         st.info(
                             "No hay datos suficientes para generar el gráfico de rendimiento con la agrupación seleccionada."
                         )
+
+    elif active_view == tab_names[5]:
+        st.subheader("Portafolio Multi-Cuenta")
+        st.caption(
+            f"KPIs de trades cerrados entre {st.session_state.kpi_start_date.strftime('%Y-%m-%d')} y {st.session_state.kpi_end_date.strftime('%Y-%m-%d')}."
+        )
+        portfolio_started = time.perf_counter()
+        with stage("portfolio") as span:
+            portfolio_df = load_portfolio(
+                st.session_state.accounts_config,
+                get_connection_pool(),
+                get_mt5_poller(),
+                datetime.combine(st.session_state.kpi_start_date, datetime.min.time()),
+                datetime.combine(st.session_state.kpi_end_date, datetime.max.time()),
+            )
+            span.rows = len(portfolio_df)
+        portfolio_elapsed = time.perf_counter() - portfolio_started
+        portfolio_totals_df = portfolio_totals(portfolio_df)
+        for totals_currency, totals_row in portfolio_totals_df.iterrows():
+            st.markdown(f"#### Total {totals_currency}")
+            total_cols = st.columns(4)
+            total_cols[0].metric(
+                "Balance", f"{totals_row['Balance']:.2f} {totals_currency}"
+            )
+            total_cols[1].metric(
+                "Equidad", f"{totals_row['Equidad']:.2f} {totals_currency}"
+            )
+            total_cols[2].metric(
+                "Profit Flotante",
+                f"{totals_row['Profit Flotante']:.2f} {totals_currency}",
+            )
+            total_cols[3].metric(
+                "Exposición (lotes netos / abiertos)",
+                f"{totals_row['Lotes Netos']:.2f} / {totals_row['Lotes Abiertos']:.2f}",
+            )
+        if not portfolio_df.empty:
+            st.dataframe(portfolio_df.set_index("Login"), use_container_width=True)
+        st.caption(
+            f"{len(portfolio_df)} cuentas consultadas en paralelo en {portfolio_elapsed:.2f}s."
+        )
 else:
     st.info("👋 Bienvenido. Conecta una cuenta MT5 desde el panel lateral.")
     st.markdown("Asegúrate de que MetaTrader 5 está en ejecución y accesible.")
 
 st.markdown("---")
 st.caption(f"Última actualización: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
+footer_deal_snapshot = st.session_state.get("deal_snapshot")
+if st.session_state.get("connected_account_login") and footer_deal_snapshot:
+    st.caption(
+        f"Historial en memoria: {footer_deal_snapshot.memory_bytes() / 1024 ** 2:.1f} MB"
+    )
 
-if st.session_state.get("connected_account_login") and st.session_state.get(
-    "auto_refresh_active", False
-):
-    time.sleep(st.session_state.auto_refresh_interval)
-    st.rerun()
+with st.expander("🩺 Diagnóstico de rendimiento"):
+    process_metrics = get_metrics()
+    st.markdown("**Esta ejecución**")
+    st.dataframe(
+        run_metrics.to_frame().round(4), use_container_width=True, hide_index=True
+    )
+    for fragment_name, fragment_metrics in st.session_state.get(
+        "fragment_metrics", {}
+    ).items():
+        st.markdown(
+            f"**Última ejecución del fragmento `{fragment_name}`** ({fragment_metrics.started_at.strftime('%H:%M:%S')})"
+        )
+        st.dataframe(
+            fragment_metrics.to_frame().round(4),
+            use_container_width=True,
+            hide_index=True,
+        )
+    st.markdown(
+        f"**Acumulado del proceso desde {process_metrics.started_at.strftime('%Y-%m-%d %H:%M:%S')}** (incluye las llamadas MT5 del poller)"
+    )
+    st.dataframe(
+        process_metrics.to_frame().round(4), use_container_width=True, hide_index=True
+    )
+    mt5_calls = sum(
+        stats["count"] for stats in process_metrics.snapshot() if stats["kind"] == "mt5"
+    )
+    mt5_calls_seen = st.session_state.get("mt5_calls_seen", mt5_calls)
+    if mt5_calls_seen > mt5_calls:
+        mt5_calls_seen = 0  # métricas reiniciadas
+    st.caption(
+        f"Llamadas MT5 acumuladas: {mt5_calls} "
+        f"({mt5_calls - mt5_calls_seen} desde la ejecución anterior)"
+    )
+    st.session_state.mt5_calls_seen = mt5_calls
+    export_json_col, export_prom_col, reset_col = st.columns(3)
+    export_json_col.download_button(
+        "Exportar JSON",
+        process_metrics.to_json(),
+        file_name="mt5_dashboard_metrics.json",
+        mime="application/json",
+    )
+    export_prom_col.download_button(
+        "Exportar Prometheus",
+        process_metrics.to_prometheus(),
+        file_name="mt5_dashboard_metrics.prom",
+        mime="text/plain",
+    )
+    if reset_col.button("Reiniciar métricas"):
+        process_metrics.reset()
+        st.rerun()
+
+if st.session_state.get("connected_account_login"):
+    history_account_snapshot = get_account_snapshot()
+    if account_snapshot_pending():
+        fragment(watch_first_snapshot, run_every=0.5)()
+    elif (
+        history_account_snapshot is not None
+        and history_account_snapshot.history_synced_at is None
+    ):
+        fragment(watch_new_deals, run_every=2)()
+    elif st.session_state.get("auto_refresh_active", False):
+        fragment(watch_new_deals, run_every=st.session_state.auto_refresh_interval)()
@@ -0,0 +1,319 @@
+import argparse
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import pandas as pd
+
+from accounts import DEFAULT_SECRETS_PATH, accounts_from_secrets, load_secrets
+from analytics import (
+    build_closed_trades,
+    build_track_record_chart_from_rollups,
+    calculate_kpis,
+    calculate_kpis_by_group,
+    ea_comparison_table,
+    ea_label,
+    track_record_summary,
+)
+from connection_pool import MT5ConnectionError, MT5ConnectionPool, open_terminal
+from deal_store import ROLLUP_FREQS, DealStore
+from poller import MT5Poller
+
+REPORT_FORMATS = ("parquet", "csv", "html")
+
+
+def sync_account(account_details, pool, poller):
+    row = {
+        "Cuenta": account_details["name"],
+        "Login": account_details["login"],
+        "Error": None,
+    }
+    try:
+        pool.connect(account_details)
+    except MT5ConnectionError as e:
+        row["Error"] = str(e)
+        return row
+    snapshot = poller.poll_account(account_details["login"], sync_history=True)
+    account_info = snapshot.account_info
+    if account_info is None or account_info.login != account_details["login"]:
+        row["Error"] = f"Sin datos de cuenta: {snapshot.last_error}"
+        return row
+    if snapshot.history_synced_at is None:
+        row["Error"] = f"Historial incompleto: {snapshot.last_error}"
+        return row
+    row.update({"Moneda": account_info.currency, "Balance": account_info.balance})
+    return row
+
+
+def sync_accounts(accounts, pool, poller, max_workers=8):
+    with ThreadPoolExecutor(
+        max_workers=min(max_workers, len(accounts)), thread_name_prefix="report-sync"
+    ) as executor:
+        return list(
+            executor.map(lambda account: sync_account(account, pool, poller), accounts)
+        )
+
+
+def closed_trades_between(store, start, end):
+    deals_df = store.load(start, end)
+    return build_closed_trades(deals_df) if not deals_df.empty else pd.DataFrame()
+
+
+def period_initial_balance(balance, closed_trades_df):
+    if closed_trades_df.empty:
+        return balance
+    return balance - closed_trades_df["Profit"].sum()
+
+
+def account_report(task):
+    store = DealStore(task["store_path"])
+    currency = task["Moneda"]
+    balance = task["Balance"]
+
+    period_trades = closed_trades_between(store, task["start"], task["end"])
+    kpis = calculate_kpis(period_trades, period_initial_balance(balance, period_trades))
+    row = {key: task[key] for key in ("Cuenta", "Login", "Moneda", "Balance", "Error")}
+    row.update(
+        {
+            "Trades Periodo": kpis["num_trades"],
+            "Profit Periodo": kpis["total_profit_period"],
+            "Win Rate (%)": kpis["win_rate"],
+            "Profit Factor": kpis["profit_factor"],
+            "Max DD (%)": kpis["max_dd_percent"],
+            "Max DD (Dinero)": kpis["max_drawdown_value"],
+            "Racha Victorias": kpis["consecutive_wins"],
+            "Racha Pérdidas": kpis["consecutive_losses"],
+        }
+    )
+
+    ea_history = closed_trades_between(store, task["ea_start"], task["end"])
+    ea_comparison = pd.DataFrame()
+    if not ea_history.empty:
+        ea_trades = ea_history[ea_history["Magic"] != 0]
+        if not ea_trades.empty:
+            ea_comparison = (
+                ea_comparison_table(
+                    calculate_kpis_by_group(
+                        ea_trades,
+                        "Magic",
+                        initial_account_balance_for_period=period_initial_balance(
+                            balance, ea_history
+                        ),
+                    ),
+                    currency,
+                )
+                .rename(
+                    columns={
+                        f"Max DD ({currency})": "Max DD (Dinero)",
+                        f"Total Profit ({currency})": "Total Profit",
+                    }
+                )
+                .rename_axis("Magic")
+                .reset_index()
+            )
+            ea_comparison.insert(0, "Login", task["Login"])
+
+    daily_rollups = store.load_rollups("D")
+    track_record = pd.DataFrame()
+    if not daily_rollups.empty:
+        summary = track_record_summary(
+            daily_rollups, store.load_balance_peaks(), task["initial_balance"]
+        )
+        row.update(
+            {
+                "Primer Deal": summary["first_day"],
+                "Profit Total": summary["profit"],
+                "Depósitos": summary["deposits"],
+                "Retiros": abs(summary["withdrawals"]),
+                "Costes Totales": summary["interest_costs"],
+                "Balance Máximo": max(summary["highest_balance"], balance),
+            }
+        )
+        chart_items = ["Balance Cuenta"] + [
+            ea_label(magic)
+            for magic in sorted(
+                daily_rollups.loc[daily_rollups["deals"] > 0, "magic"].unique()
+            )
+        ]
+        track_record = pd.concat(
+            [
+                build_track_record_chart_from_rollups(
+                    store.load_rollups(freq_code),
+                    summary["first_day"],
+                    task["end"],
+                    freq_code,
+                    task["initial_balance"],
+                    chart_items,
+                ).assign(freq=freq_code)
+                for freq_code in ROLLUP_FREQS
+            ],
+            ignore_index=True,
+        )
+        track_record.insert(0, "Login", task["Login"])
+    return row, ea_comparison, track_record
+
+
+def build_reports(accounts, args):
+    pool = MT5ConnectionPool(open_terminal)
+    poller = MT5Poller(pool, args.deal_store_dir)
+    sync_rows = sync_accounts(accounts, pool, poller, args.sync_workers)
+    tasks = [
+        {
+            **row,
+            "store_path": poller.deal_store(row["Login"]).path,
+            "start": args.start,
+            "end": args.end,
+            "ea_start": args.end - timedelta(days=365 * args.ea_years),
+            "initial_balance": args.initial_balance,
+        }
+        for row in sync_rows
+        if row["Error"] is None
+    ]
+    rows = [row for row in sync_rows if row["Error"] is not None]
+    ea_tables = []
+    track_records = []
+    if tasks:
+        with ProcessPoolExecutor(max_workers=min(args.workers, len(tasks))) as executor:
+            for row, ea_comparison, track_record in executor.map(account_report, tasks):
+                rows.append(row)
+                if not ea_comparison.empty:
+                    ea_tables.append(ea_comparison)
+                if not track_record.empty:
+                    track_records.append(track_record)
+    summary = pd.DataFrame(rows).sort_values("Login", ignore_index=True)
+    return (
+        summary,
+        pd.concat(ea_tables, ignore_index=True) if ea_tables else pd.DataFrame(),
+        (
+            pd.concat(track_records, ignore_index=True)
+            if track_records
+            else pd.DataFrame()
+        ),
+    )
+
+
+def write_html(path, summary, ea_comparison, track_record, args):
+    sections = [
+        "<h1>Informe MT5 Multi-Cuenta</h1>",
+        f"<p>KPIs de trades cerrados entre {args.start:%Y-%m-%d} y {args.end:%Y-%m-%d}. "
+        f"Generado el {datetime.now():%Y-%m-%d %H:%M}.</p>",
+        summary.to_html(index=False, na_rep="", float_format="{:.2f}".format),
+    ]
+    for _, account in summary.iterrows():
+        sections.append(f"<h2>{account['Cuenta']} ({account['Login']})</h2>")
+        if pd.notna(account["Error"]):
+            sections.append(f"<p>{account['Error']}</p>")
+            continue
+        if not ea_comparison.empty:
+            account_eas = ea_comparison[ea_comparison["Login"] == account["Login"]]
+            if not account_eas.empty:
+                sections.append("<h3>Comparativa EAs</h3>")
+                sections.append(
+                    account_eas.drop(columns="Login").to_html(
+                        index=False, float_format="{:.2f}".format
+                    )
+                )
+        if not track_record.empty:
+            monthly = track_record[
+                (track_record["Login"] == account["Login"])
+                & (track_record["freq"] == "MS")
+            ]
+            if not monthly.empty:
+                sections.append("<h3>Track Record mensual (%)</h3>")
+                sections.append(
+                    monthly.assign(Periodo=monthly["period_start"].dt.strftime("%Y-%m"))
+                    .pivot(index="Periodo", columns="type", values="value")
+                    .rename_axis(columns=None)
+                    .to_html(float_format="{:.2f}".format)
+                )
+    Path(path).write_text(
+        '<!DOCTYPE html><html><head><meta charset="utf-8">'
+        "<title>Informe MT5</title></head><body>"
+        + "\n".join(sections)
+        + "</body></html>",
+        encoding="utf-8",
+    )
+
+
+def write_reports(output_dir, summary, ea_comparison, track_record, args):
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    tables = {
+        "kpis": summary,
+        "ea_comparison": ea_comparison,
+        "track_record": track_record,
+    }
+    written = []
+    for name, table in tables.items():
+        if "parquet" in args.formats:
+            written.append(output_dir / f"{name}.parquet")
+            table.to_parquet(written[-1], index=False)
+        if "csv" in args.formats:
+            written.append(output_dir / f"{name}.csv")
+            table.to_csv(written[-1], index=False)
+    if "html" in args.formats:
+        written.append(output_dir / "report.html")
+        write_html(written[-1], summary, ea_comparison, track_record, args)
+    return written
+
+
+def parse_date(value):
+    return datetime.strptime(value, "%Y-%m-%d")
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Genera informes de KPIs, comparativa de EAs y track record "
+        "para todas las cuentas configuradas, sin interfaz."
+    )
+    parser.add_argument("--secrets", default=DEFAULT_SECRETS_PATH)
+    parser.add_argument(
+        "--output", help="directorio de salida (por defecto reports/<fecha>)"
+    )
+    parser.add_argument(
+        "--formats", nargs="+", choices=REPORT_FORMATS, default=list(REPORT_FORMATS)
+    )
+    parser.add_argument("--start", type=parse_date, help="inicio del periodo de KPIs")
+    parser.add_argument("--end", type=parse_date, help="fin del periodo de KPIs")
+    parser.add_argument("--ea-years", type=float, default=5)
+    parser.add_argument("--initial-balance", type=float, default=10000.0)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--sync-workers", type=int, default=8)
+    parser.add_argument("--deal-store-dir")
+    args = parser.parse_args()
+
+    try:
+        secrets = load_secrets(args.secrets)
+        accounts, errors = accounts_from_secrets(secrets)
+    except OSError as e:
+        parser.error(f"No se pudo leer {args.secrets}: {e}")
+    except ValueError as e:
+        parser.error(str(e))
+    for error in errors:
+        print(error, file=sys.stderr)
+    if not accounts:
+        parser.error(f"No hay cuentas configuradas en {args.secrets}.")
+    args.end = (args.end or datetime.now()).replace(
+        hour=23, minute=59, second=59, microsecond=999999
+    )
+    args.start = args.start or (args.end - timedelta(days=30)).replace(
+        hour=0, minute=0, second=0, microsecond=0
+    )
+    args.deal_store_dir = args.deal_store_dir or secrets.get(
+        "deal_store_dir", ".deal_store"
+    )
+    output_dir = args.output or os.path.join("reports", f"{datetime.now():%Y-%m-%d}")
+
+    summary, ea_comparison, track_record = build_reports(accounts, args)
+    for path in write_reports(output_dir, summary, ea_comparison, track_record, args):
+        print(path)
+    failed = summary["Error"].notna().sum()
+    if failed:
+        print(f"{failed} de {len(summary)} cuentas con errores.", file=sys.stderr)
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,352 @@
+import argparse
+import json
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+BENCH_DIR = Path(__file__).resolve().parent
+sys.path.insert(0, str(BENCH_DIR.parent))
+sys.path.insert(0, str(BENCH_DIR / "fake_mt5"))
+
+import pymt5linux as fake_mt5
+from analytics import (
+    TRADE_ENTRIES,
+    TRADE_TYPES,
+    KpiAccumulator,
+    build_closed_trades,
+    build_track_record_chart_from_rollups,
+    calculate_kpis,
+    calculate_kpis_by_group,
+    downsample_chart,
+    ea_comparison_table,
+    ea_label,
+    rolling_ea_metrics,
+    track_record_summary,
+)
+from deal_store import DealSnapshot, DealStore
+
+LOGIN = 1000
+EA_TRADE_COLUMNS = [
+    "Time Close",
+    "Symbol",
+    "Type",
+    "Volume",
+    "Price Open",
+    "Price Close",
+    "Profit",
+    "Commission",
+    "Swap",
+    "Position ID",
+]
+CHART_GROUPINGS = {"daily": "D", "weekly": "W-MON", "monthly": "MS"}
+
+
+def period_starts(times, freq_code):
+    if freq_code == "W-MON":
+        return times.dt.to_period("W").dt.start_time
+    if freq_code == "MS":
+        return times.dt.to_period("M").dt.start_time
+    return times.dt.floor("D")
+
+
+# Chart built by scanning every deal, kept as the baseline the rollup-based
+# build_track_record_chart_from_rollups is measured against.
+def build_track_record_chart(
+    deals_df, start, end, freq_code, initial_balance, selected_items
+):
+    chart_periods = pd.date_range(start=start, end=end, freq=freq_code).tz_localize(
+        None
+    )
+    if deals_df.empty or len(chart_periods) == 0:
+        return pd.DataFrame(columns=["period_start", "value", "type"])
+    trading_deals = deals_df[
+        deals_df["type"].isin(TRADE_TYPES) & deals_df["entry"].isin(TRADE_ENTRIES)
+    ]
+    balance_ops = deals_df[deals_df["type"] == fake_mt5.DEAL_TYPE_BALANCE]
+    trading_net = (
+        trading_deals["profit"] + trading_deals["commission"] + trading_deals["swap"]
+    )
+    trading_periods = period_starts(trading_deals["time_dt"], freq_code)
+
+    period_delta = trading_net.groupby(trading_periods).sum().reindex(
+        chart_periods, fill_value=0.0
+    ) + balance_ops["profit"].groupby(
+        period_starts(balance_ops["time_dt"], freq_code)
+    ).sum().reindex(
+        chart_periods, fill_value=0.0
+    )
+    wide = pd.DataFrame(index=chart_periods)
+    if "Balance Cuenta" in selected_items:
+        wide["Balance Cuenta"] = (period_delta.cumsum() / initial_balance) * 100
+
+    selected_magics = [
+        magic
+        for magic in trading_deals["magic"].unique()
+        if ea_label(magic) in selected_items
+    ]
+    if selected_magics:
+        ea_selected = trading_deals["magic"].isin(selected_magics)
+        ea_cumulative = (
+            trading_net[ea_selected]
+            .groupby(
+                [trading_periods[ea_selected], trading_deals["magic"][ea_selected]]
+            )
+            .sum()
+            .unstack(fill_value=0.0)
+            .reindex(index=chart_periods, columns=selected_magics, fill_value=0.0)
+            .cumsum()
+        )
+        for magic in selected_magics:
+            wide[ea_label(magic)] = (ea_cumulative[magic] / initial_balance) * 100
+
+    if wide.columns.empty:
+        return pd.DataFrame(columns=["period_start", "value", "type"])
+    df_chart = wide.rename_axis(index="period_start", columns="type").stack()
+    return df_chart.rename("value").reset_index()[["period_start", "value", "type"]]
+
+
+def timed(func, repeat):
+    timings = []
+    result = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = func()
+        timings.append(time.perf_counter() - started)
+    return result, timings
+
+
+def ea_trade_tables(closed_trades, page_size=50):
+    tables = {}
+    for magic in sorted(m for m in closed_trades["Magic"].unique() if m != 0):
+        df_magic_display = closed_trades[closed_trades["Magic"] == magic]
+        order = np.argsort(df_magic_display["Time Close"].to_numpy(), kind="stable")
+        tables[magic] = df_magic_display.iloc[order[::-1][:page_size]][EA_TRADE_COLUMNS]
+    return tables
+
+
+def bench_size(n_deals, args, store_dir):
+    fake_mt5.configure(
+        deals=n_deals,
+        magics=args.magics,
+        symbols=args.symbols,
+        seed=args.seed,
+        years=args.years,
+    )
+    fake_mt5.dataset()
+    terminal = fake_mt5.MetaTrader5()
+    terminal.login(LOGIN)
+    results = []
+
+    def record(stage, func, repeat=args.repeat):
+        result, timings = timed(func, repeat)
+        results.append(
+            {
+                "deals": n_deals,
+                "stage": stage,
+                "rows": len(result) if isinstance(result, pd.DataFrame) else None,
+                "best_s": min(timings),
+                "median_s": statistics.median(timings),
+                "runs": timings,
+            }
+        )
+        return result
+
+    store = DealStore(str(Path(store_dir) / f"deals_{n_deals}.sqlite"))
+    record("history_backfill", lambda: store.sync(terminal), repeat=1)
+    history_calls = dict(fake_mt5.calls)
+    snapshot = DealSnapshot(LOGIN, store)
+    record("deal_snapshot_load", snapshot.load)
+
+    end = datetime.now()
+    start = end - timedelta(days=365 * 5)
+    closed_trades = record(
+        "get_history_trades_closed",
+        lambda: build_closed_trades(snapshot.deals(start, end)),
+    )
+    initial_balance = terminal.account_info().balance - closed_trades["Profit"].sum()
+    record(
+        "calculate_kpis",
+        lambda: calculate_kpis(closed_trades, initial_balance),
+    )
+    kpi_accumulator = KpiAccumulator().update(
+        closed_trades[closed_trades["Time Close"] < closed_trades["Time Close"].max()]
+    )
+    record(
+        "kpi_accumulator_fold_new",
+        lambda: kpi_accumulator.update(closed_trades).kpis(initial_balance),
+        repeat=1,
+    )
+    record(
+        "kpi_accumulator_unchanged",
+        lambda: kpi_accumulator.update(closed_trades).kpis(initial_balance),
+    )
+    ea_trades = closed_trades[closed_trades["Magic"] != 0]
+    record(
+        "tab4_ea_comparison",
+        lambda: ea_comparison_table(
+            calculate_kpis_by_group(
+                ea_trades,
+                "Magic",
+                initial_account_balance_for_period=initial_balance,
+            ),
+            "USD",
+        ),
+    )
+    record("tab4_ea_trade_tables", lambda: ea_trade_tables(closed_trades))
+    record(
+        "tab4_rolling_ea_metrics",
+        lambda: rolling_ea_metrics(closed_trades, initial_balance, end=end),
+    )
+
+    all_deals = snapshot.deals()
+    first_deal_date = all_deals["time_dt"].min().date()
+    chart_items = ["Balance Cuenta"] + [
+        ea_label(m) for m in sorted(all_deals["magic"].unique())
+    ]
+    for grouping, freq_code in CHART_GROUPINGS.items():
+        record(
+            f"tab5_chart_{grouping}",
+            lambda freq_code=freq_code: build_track_record_chart(
+                all_deals,
+                first_deal_date,
+                end,
+                freq_code,
+                fake_mt5.CONFIG["initial_deposit"],
+                chart_items,
+            ),
+        )
+    daily_chart = build_track_record_chart(
+        all_deals,
+        first_deal_date,
+        end,
+        "D",
+        fake_mt5.CONFIG["initial_deposit"],
+        chart_items,
+    )
+    record(
+        "tab5_chart_daily_lttb",
+        lambda: downsample_chart(daily_chart, args.max_points)[0],
+    )
+    record(
+        "tab5_summary_rollups",
+        lambda: track_record_summary(
+            store.load_rollups("D"),
+            store.load_balance_peaks(),
+            fake_mt5.CONFIG["initial_deposit"],
+        ),
+    )
+    for grouping, freq_code in CHART_GROUPINGS.items():
+        record(
+            f"tab5_rollup_chart_{grouping}",
+            lambda freq_code=freq_code: build_track_record_chart_from_rollups(
+                store.load_rollups(freq_code),
+                first_deal_date,
+                end,
+                freq_code,
+                fake_mt5.CONFIG["initial_deposit"],
+                chart_items,
+            ),
+        )
+    return results, history_calls
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=BENCH_DIR,
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def print_table(results, baseline=None, out=sys.stderr):
+    previous = {}
+    if baseline:
+        previous = {(r["deals"], r["stage"]): r["best_s"] for r in baseline["results"]}
+        print(
+            f"Baseline: {baseline.get('git_commit')} ({baseline.get('generated_at')})",
+            file=out,
+        )
+    print(
+        f"{'deals':>10} {'stage':<28} {'rows':>9} {'best (s)':>9} {'median (s)':>11}"
+        + (f" {'baseline (s)':>13} {'ratio':>7}" if baseline else ""),
+        file=out,
+    )
+    for r in results:
+        line = (
+            f"{r['deals']:>10} {r['stage']:<28} {r['rows'] if r['rows'] is not None else '':>9} "
+            f"{r['best_s']:>9.4f} {r['median_s']:>11.4f}"
+        )
+        old = previous.get((r["deals"], r["stage"]))
+        if baseline and old:
+            line += f" {old:>13.4f} {r['best_s'] / old:>6.2f}x"
+        print(line, file=out)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Time the dashboard data paths against the fake pymt5linux terminal."
+    )
+    parser.add_argument(
+        "sizes", nargs="*", type=int, default=[10_000, 100_000, 1_000_000]
+    )
+    parser.add_argument("--magics", type=int, default=20)
+    parser.add_argument("--symbols", type=int, default=8)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--years", type=float, default=5)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--max-points", type=int, default=1000)
+    parser.add_argument("--output", help="write the JSON report here instead of stdout")
+    parser.add_argument("--compare", help="previous JSON report to compare against")
+    args = parser.parse_args()
+
+    report = {
+        "generated_at": datetime.now().isoformat(timespec="seconds"),
+        "git_commit": git_commit(),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "pandas": pd.__version__,
+        "config": {
+            "magics": args.magics,
+            "symbols": args.symbols,
+            "seed": args.seed,
+            "years": args.years,
+            "repeat": args.repeat,
+            "max_points": args.max_points,
+        },
+        "history_calls": {},
+        "results": [],
+    }
+    with tempfile.TemporaryDirectory() as store_dir:
+        for n_deals in args.sizes:
+            results, history_calls = bench_size(n_deals, args, store_dir)
+            report["results"].extend(results)
+            report["history_calls"][str(n_deals)] = history_calls
+
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+    print_table(report["results"], baseline)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+    else:
+        json.dump(report, sys.stdout, indent=2)
+        print()
+
+
+if __name__ == "__main__":
+    main()
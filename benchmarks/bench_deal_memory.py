@@ -0,0 +1,54 @@
+import sys
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from mt5_frames import DEAL_SCHEMA, compact_deals
+
+
+def make_deals_frame(n, n_magics=60, n_symbols=25, seed=42):
+    rng = np.random.default_rng(seed)
+    time_msc = np.sort(1_500_000_000_000 + rng.integers(0, 2 * 10**11, n))
+    symbols = np.array([f"SYM{i:02d}" for i in range(n_symbols)], dtype=object)
+    return pd.DataFrame(
+        {
+            "ticket": np.arange(n, dtype=np.int64),
+            "order": np.arange(n, dtype=np.int64),
+            "time": time_msc // 1000,
+            "time_msc": time_msc,
+            "type": rng.integers(0, 2, n),
+            "entry": rng.integers(0, 2, n),
+            "magic": rng.integers(0, n_magics, n) * 1000,
+            "position_id": np.arange(n, dtype=np.int64) // 2,
+            "reason": rng.integers(0, 4, n),
+            "volume": rng.random(n),
+            "price": rng.random(n),
+            "commission": -rng.random(n),
+            "swap": rng.normal(size=n),
+            "profit": rng.normal(size=n),
+            "fee": np.zeros(n),
+            "symbol": symbols[rng.integers(0, n_symbols, n)],
+            "comment": np.where(rng.random(n) < 0.5, "", "sl"),
+            "external_id": np.full(n, "", dtype=object),
+        }
+    ).astype(DEAL_SCHEMA)
+
+
+def megabytes(df):
+    return df.memory_usage(deep=True).sum() / 1024**2
+
+
+if __name__ == "__main__":
+    sizes = [int(arg) for arg in sys.argv[1:]] or [100_000, 1_000_000]
+    print(f"{'deals':>10} {'before (MB)':>12} {'after (MB)':>11} {'ratio':>6}")
+    for n in sizes:
+        before = make_deals_frame(n)
+        before["time_dt"] = pd.to_datetime(before["time_msc"], unit="ms")
+        after = compact_deals(before.drop(columns="time_dt"))
+        print(
+            f"{n:>10} {megabytes(before):>12.1f} {megabytes(after):>11.1f} "
+            f"{megabytes(before) / megabytes(after):>5.1f}x"
+        )
@@ -0,0 +1,94 @@
+import sys
+import time
+from collections import namedtuple
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from mt5_frames import POSITION_SCHEMA, records_to_frame, zero_to_nan
+
+TradePosition = namedtuple("TradePosition", list(POSITION_SCHEMA))
+RELEVANT_COLS = [
+    "ticket",
+    "time_msc",
+    "type",
+    "magic",
+    "symbol",
+    "volume",
+    "price_open",
+    "sl",
+    "tp",
+    "price_current",
+    "profit",
+]
+
+
+def make_positions(n, seed=42):
+    rng = np.random.default_rng(seed)
+    sl = np.where(rng.random(n) < 0.3, 0.0, rng.uniform(1.0, 1.2, n))
+    tp = np.where(rng.random(n) < 0.3, 0.0, rng.uniform(1.0, 1.2, n))
+    time_msc = 1_700_000_000_000 + rng.integers(0, 10**9, n)
+    return tuple(
+        TradePosition(
+            int(i),
+            int(time_msc[i] // 1000),
+            int(time_msc[i]),
+            int(time_msc[i] // 1000),
+            int(time_msc[i]),
+            int(i % 2),
+            int(i % 60),
+            int(i),
+            0,
+            0.01,
+            1.1,
+            float(sl[i]),
+            float(tp[i]),
+            1.1,
+            0.0,
+            float(i % 97) - 48.0,
+            "EURUSD" if i % 3 else "XAUUSD",
+            "",
+            "",
+        )
+        for i in range(n)
+    )
+
+
+def build_rowwise(positions):
+    df = pd.DataFrame(list(positions), columns=positions[0]._asdict().keys())
+    df = df[RELEVANT_COLS]
+    df["sl"] = df["sl"].apply(lambda x: np.nan if x == 0.0 else x)
+    df["tp"] = df["tp"].apply(lambda x: np.nan if x == 0.0 else x)
+    return df
+
+
+def build_columnar(positions):
+    df = records_to_frame(positions, POSITION_SCHEMA, RELEVANT_COLS)
+    df["sl"] = zero_to_nan(df["sl"])
+    df["tp"] = zero_to_nan(df["tp"])
+    return df
+
+
+def best_of(func, arg, repeat=3):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func(arg)
+        timings.append(time.perf_counter() - started)
+    return min(timings)
+
+
+if __name__ == "__main__":
+    sizes = [int(arg) for arg in sys.argv[1:]] or [100_000, 1_000_000]
+    print(f"{'records':>10} {'rowwise (s)':>12} {'columnar (s)':>13} {'speedup':>8}")
+    for n in sizes:
+        positions = make_positions(n)
+        pd.testing.assert_frame_equal(
+            build_rowwise(positions), build_columnar(positions)
+        )
+        rowwise = best_of(build_rowwise, positions)
+        columnar = best_of(build_columnar, positions)
+        print(f"{n:>10} {rowwise:>12.3f} {columnar:>13.3f} {rowwise / columnar:>7.1f}x")
@@ -0,0 +1,500 @@
+import os
+import threading
+from collections import Counter, namedtuple
+from datetime import datetime, timedelta
+
+import numpy as np
+
+DEAL_TYPE_BUY = 0
+DEAL_TYPE_SELL = 1
+DEAL_TYPE_BALANCE = 2
+DEAL_ENTRY_IN = 0
+DEAL_ENTRY_OUT = 1
+DEAL_ENTRY_INOUT = 2
+DEAL_ENTRY_OUT_BY = 3
+DEAL_REASON_CLIENT = 0
+DEAL_REASON_EXPERT = 3
+POSITION_TYPE_BUY = 0
+POSITION_TYPE_SELL = 1
+ORDER_TYPE_BUY = 0
+ORDER_TYPE_SELL = 1
+ORDER_TYPE_BUY_LIMIT = 2
+ORDER_TYPE_SELL_LIMIT = 3
+ORDER_TYPE_BUY_STOP = 4
+ORDER_TYPE_SELL_STOP = 5
+ORDER_TYPE_BUY_STOP_LIMIT = 6
+ORDER_TYPE_SELL_STOP_LIMIT = 7
+ORDER_STATE_PLACED = 1
+
+TradeDeal = namedtuple(
+    "TradeDeal",
+    [
+        "ticket",
+        "order",
+        "time",
+        "time_msc",
+        "type",
+        "entry",
+        "magic",
+        "position_id",
+        "reason",
+        "volume",
+        "price",
+        "commission",
+        "swap",
+        "profit",
+        "fee",
+        "symbol",
+        "comment",
+        "external_id",
+    ],
+)
+TradePosition = namedtuple(
+    "TradePosition",
+    [
+        "ticket",
+        "time",
+        "time_msc",
+        "time_update",
+        "time_update_msc",
+        "type",
+        "magic",
+        "identifier",
+        "reason",
+        "volume",
+        "price_open",
+        "sl",
+        "tp",
+        "price_current",
+        "swap",
+        "profit",
+        "symbol",
+        "comment",
+        "external_id",
+    ],
+)
+TradeOrder = namedtuple(
+    "TradeOrder",
+    [
+        "ticket",
+        "time_setup",
+        "time_setup_msc",
+        "time_done",
+        "time_done_msc",
+        "time_expiration",
+        "type",
+        "type_time",
+        "type_filling",
+        "state",
+        "magic",
+        "position_id",
+        "position_by_id",
+        "reason",
+        "volume_initial",
+        "volume_current",
+        "price_open",
+        "sl",
+        "tp",
+        "price_current",
+        "price_stoplimit",
+        "symbol",
+        "comment",
+        "external_id",
+    ],
+)
+AccountInfo = namedtuple(
+    "AccountInfo",
+    [
+        "login",
+        "leverage",
+        "balance",
+        "credit",
+        "profit",
+        "equity",
+        "margin",
+        "margin_free",
+        "margin_level",
+        "name",
+        "server",
+        "currency",
+        "company",
+    ],
+)
+
+SYMBOL_PRICES = {
+    "EURUSD": 1.10,
+    "GBPUSD": 1.27,
+    "USDJPY": 148.0,
+    "XAUUSD": 2000.0,
+    "USDCHF": 0.88,
+    "AUDUSD": 0.66,
+    "US30": 38000.0,
+    "NAS100": 17000.0,
+}
+
+CONFIG = {
+    "deals": int(os.environ.get("FAKE_MT5_DEALS", 10_000)),
+    "magics": int(os.environ.get("FAKE_MT5_MAGICS", 10)),
+    "symbols": int(os.environ.get("FAKE_MT5_SYMBOLS", 8)),
+    "positions": int(os.environ.get("FAKE_MT5_POSITIONS", 25)),
+    "orders": int(os.environ.get("FAKE_MT5_ORDERS", 10)),
+    "years": float(os.environ.get("FAKE_MT5_YEARS", 3)),
+    "seed": int(os.environ.get("FAKE_MT5_SEED", 42)),
+    "initial_deposit": 10_000.0,
+}
+
+EPOCH = datetime(1970, 1, 1)
+
+calls = Counter()
+_lock = threading.Lock()
+_dataset = None
+
+
+def configure(**options):
+    global _dataset
+    unknown = set(options) - set(CONFIG)
+    if unknown:
+        raise TypeError(f"Unknown fake MT5 options: {sorted(unknown)}")
+    with _lock:
+        CONFIG.update(options)
+        _dataset = None
+    calls.clear()
+
+
+def symbol_names(n_symbols):
+    names = list(SYMBOL_PRICES)[:n_symbols]
+    return names + [f"SYM{i:02d}" for i in range(len(names), n_symbols)]
+
+
+def magic_numbers(n_magics):
+    return [0] + [10_000 + i for i in range(1, n_magics)]
+
+
+def _generate(config):
+    rng = np.random.default_rng(config["seed"])
+    n_deals = config["deals"]
+    n_balance = max(1, n_deals // 1000)
+    n_trades = max(0, (n_deals - n_balance) // 2)
+    n_balance = n_deals - 2 * n_trades
+    end_msc = _to_msc(datetime.now() - timedelta(hours=1))
+    start_msc = end_msc - int(config["years"] * 365 * 86_400_000)
+    symbols = np.array(symbol_names(config["symbols"]), dtype=object)
+    base_prices = np.array([SYMBOL_PRICES.get(s, 100.0) for s in symbols])
+    magics = np.array(magic_numbers(config["magics"]), dtype=np.int64)
+
+    open_msc = np.sort(rng.integers(start_msc, end_msc, n_trades))
+    close_msc = np.minimum(
+        open_msc + 1000 + rng.exponential(4 * 3_600_000, n_trades).astype(np.int64),
+        end_msc,
+    )
+    symbol_idx = rng.integers(0, len(symbols), n_trades)
+    magic = magics[rng.integers(0, len(magics), n_trades)]
+    side = rng.integers(0, 2, n_trades)
+    volume = rng.choice([0.01, 0.05, 0.1, 0.5, 1.0], n_trades)
+    price_open = base_prices[symbol_idx] * (1 + rng.normal(0, 0.02, n_trades))
+    price_close = price_open * (1 + rng.normal(0.0002, 0.002, n_trades))
+    profit = np.round(rng.normal(0.1, 1.0, n_trades) * volume * 100, 2)
+    commission = -np.round(volume * 3.5, 2)
+    swap = np.round(
+        np.where(rng.random(n_trades) < 0.3, rng.normal(0, 2, n_trades), 0.0), 2
+    )
+    reason = np.where(magic == 0, DEAL_REASON_CLIENT, DEAL_REASON_EXPERT)
+
+    balance_msc = np.concatenate(
+        [
+            [start_msc - 3_600_000],
+            np.sort(rng.integers(start_msc, end_msc, n_balance - 1)),
+        ]
+    )
+    balance_amount = np.concatenate(
+        [
+            [config["initial_deposit"]],
+            np.round(
+                rng.choice([-1.0, 1.0], n_balance - 1, p=[0.3, 0.7])
+                * rng.uniform(100, 2000, n_balance - 1),
+                2,
+            ),
+        ]
+    )
+    zeros = np.zeros(n_trades)
+    empty = np.full(n_trades, "", dtype=object)
+    events = {
+        "time_msc": np.concatenate([open_msc, close_msc, balance_msc]),
+        "type": np.concatenate([side, 1 - side, np.full(n_balance, DEAL_TYPE_BALANCE)]),
+        "entry": np.concatenate(
+            [
+                np.full(n_trades, DEAL_ENTRY_IN),
+                np.full(n_trades, DEAL_ENTRY_OUT),
+                np.full(n_balance, DEAL_ENTRY_IN),
+            ]
+        ),
+        "magic": np.concatenate([magic, magic, np.zeros(n_balance, dtype=np.int64)]),
+        "position": np.concatenate(
+            [np.arange(n_trades), np.arange(n_trades), np.full(n_balance, -1)]
+        ),
+        "reason": np.concatenate([reason, reason, np.zeros(n_balance, dtype=np.int64)]),
+        "volume": np.concatenate([volume, volume, np.zeros(n_balance)]),
+        "price": np.concatenate([price_open, price_close, np.zeros(n_balance)]),
+        "commission": np.concatenate([commission, commission, np.zeros(n_balance)]),
+        "swap": np.concatenate([zeros, swap, np.zeros(n_balance)]),
+        "profit": np.concatenate([zeros, profit, balance_amount]),
+        "symbol": np.concatenate(
+            [
+                symbols[symbol_idx],
+                symbols[symbol_idx],
+                np.full(n_balance, "", dtype=object),
+            ]
+        ),
+        "comment": np.concatenate(
+            [
+                empty,
+                np.where(
+                    rng.random(n_trades) < 0.2,
+                    "sl",
+                    np.where(rng.random(n_trades) < 0.2, "tp", ""),
+                ).astype(object),
+                np.where(balance_amount > 0, "Deposit", "Withdrawal").astype(object),
+            ]
+        ),
+    }
+    order = np.argsort(events["time_msc"], kind="stable")
+    events = {key: values[order] for key, values in events.items()}
+    tickets = np.arange(1_000_000, 1_000_000 + n_deals, dtype=np.int64)
+    open_ticket = np.zeros(n_trades, dtype=np.int64)
+    opening = events["entry"] == DEAL_ENTRY_IN
+    trade_rows = events["position"] >= 0
+    open_ticket[events["position"][opening & trade_rows]] = tickets[
+        opening & trade_rows
+    ]
+    position_id = np.where(
+        trade_rows, open_ticket[np.maximum(events["position"], 0)], 0
+    )
+    time_msc = events["time_msc"].astype(np.int64)
+
+    deals = tuple(
+        map(
+            TradeDeal._make,
+            zip(
+                tickets.tolist(),
+                tickets.tolist(),
+                (time_msc // 1000).tolist(),
+                time_msc.tolist(),
+                events["type"].tolist(),
+                events["entry"].tolist(),
+                events["magic"].tolist(),
+                position_id.tolist(),
+                events["reason"].tolist(),
+                events["volume"].tolist(),
+                events["price"].tolist(),
+                events["commission"].tolist(),
+                events["swap"].tolist(),
+                events["profit"].tolist(),
+                [0.0] * n_deals,
+                events["symbol"].tolist(),
+                events["comment"].tolist(),
+                [""] * n_deals,
+            ),
+        )
+    )
+
+    positions = []
+    for i in range(config["positions"]):
+        symbol_i = int(rng.integers(0, len(symbols)))
+        opened = int(rng.integers(end_msc - 7 * 86_400_000, end_msc))
+        price = float(base_prices[symbol_i] * (1 + rng.normal(0, 0.01)))
+        position_type = int(rng.integers(0, 2))
+        position_magic = int(magics[rng.integers(0, len(magics))])
+        positions.append(
+            TradePosition(
+                ticket=2_000_000 + i,
+                time=opened // 1000,
+                time_msc=opened,
+                time_update=opened // 1000,
+                time_update_msc=opened,
+                type=position_type,
+                magic=position_magic,
+                identifier=2_000_000 + i,
+                reason=DEAL_REASON_EXPERT if position_magic else DEAL_REASON_CLIENT,
+                volume=float(rng.choice([0.01, 0.1, 0.5])),
+                price_open=price,
+                sl=0.0 if rng.random() < 0.3 else price * 0.99,
+                tp=0.0 if rng.random() < 0.3 else price * 1.01,
+                price_current=price * (1 + rng.normal(0, 0.002)),
+                swap=0.0,
+                profit=round(float(rng.normal(0, 50)), 2),
+                symbol=str(symbols[symbol_i]),
+                comment="",
+                external_id="",
+            )
+        )
+
+    orders = []
+    for i in range(config["orders"]):
+        symbol_i = int(rng.integers(0, len(symbols)))
+        placed = int(rng.integers(end_msc - 7 * 86_400_000, end_msc))
+        price = float(base_prices[symbol_i] * (1 + rng.normal(0, 0.01)))
+        order_magic = int(magics[rng.integers(0, len(magics))])
+        orders.append(
+            TradeOrder(
+                ticket=3_000_000 + i,
+                time_setup=placed // 1000,
+                time_setup_msc=placed,
+                time_done=0,
+                time_done_msc=0,
+                time_expiration=0,
+                type=int(rng.integers(ORDER_TYPE_BUY_LIMIT, ORDER_TYPE_SELL_STOP + 1)),
+                type_time=0,
+                type_filling=0,
+                state=ORDER_STATE_PLACED,
+                magic=order_magic,
+                position_id=0,
+                position_by_id=0,
+                reason=DEAL_REASON_EXPERT if order_magic else DEAL_REASON_CLIENT,
+                volume_initial=0.1,
+                volume_current=0.1,
+                price_open=price,
+                sl=0.0 if rng.random() < 0.5 else price * 0.99,
+                tp=0.0 if rng.random() < 0.5 else price * 1.01,
+                price_current=price,
+                price_stoplimit=0.0,
+                symbol=str(symbols[symbol_i]),
+                comment="",
+                external_id="",
+            )
+        )
+
+    balance = round(
+        config["initial_deposit"]
+        + float(
+            balance_amount[1:].sum() + profit.sum() + 2 * commission.sum() + swap.sum()
+        ),
+        2,
+    )
+    return {
+        "deals": deals,
+        "deal_times": time_msc,
+        "positions": tuple(positions),
+        "orders": tuple(orders),
+        "balance": balance,
+        "floating": round(sum(p.profit for p in positions), 2),
+    }
+
+
+def dataset():
+    global _dataset
+    with _lock:
+        if _dataset is None:
+            _dataset = _generate(dict(CONFIG))
+        return _dataset
+
+
+def _to_msc(value):
+    if isinstance(value, datetime):
+        if value.tzinfo is not None:
+            return int(value.timestamp() * 1000)
+        return (value - EPOCH) // timedelta(milliseconds=1)
+    return int(value) * 1000
+
+
+class MetaTrader5:
+    """Deterministic in-memory stand-in for a pymt5linux terminal."""
+
+    def __init__(self, host="localhost", port=18812):
+        self.host = host
+        self.port = port
+        self._login = None
+        self._server = None
+
+    def initialize(self, *args, **kwargs):
+        calls["initialize"] += 1
+        return True
+
+    def login(self, login, password=None, server=None, timeout=None):
+        calls["login"] += 1
+        self._login = login
+        self._server = server
+        return True
+
+    def shutdown(self):
+        calls["shutdown"] += 1
+        self._login = None
+
+    def last_error(self):
+        return (1, "Success")
+
+    def account_info(self):
+        calls["account_info"] += 1
+        if self._login is None:
+            return None
+        data = dataset()
+        equity = round(data["balance"] + data["floating"], 2)
+        margin = round(len(data["positions"]) * 25.0, 2)
+        return AccountInfo(
+            login=self._login,
+            leverage=100,
+            balance=data["balance"],
+            credit=0.0,
+            profit=data["floating"],
+            equity=equity,
+            margin=margin,
+            margin_free=round(equity - margin, 2),
+            margin_level=round(equity / margin * 100, 2) if margin else 0.0,
+            name=f"Fake {self._login}",
+            server=self._server or "Fake-Server",
+            currency="USD",
+            company="Fake Broker",
+        )
+
+    def positions_total(self):
+        calls["positions_total"] += 1
+        return len(dataset()["positions"])
+
+    def positions_get(self, symbol=None, group=None, ticket=None):
+        calls["positions_get"] += 1
+        return dataset()["positions"]
+
+    def orders_total(self):
+        calls["orders_total"] += 1
+        return len(dataset()["orders"])
+
+    def orders_get(self, symbol=None, group=None, ticket=None):
+        calls["orders_get"] += 1
+        return dataset()["orders"]
+
+    def _deal_slice(self, date_from, date_to):
+        data = dataset()
+        times = data["deal_times"]
+        lo = np.searchsorted(times, _to_msc(date_from), "left")
+        hi = np.searchsorted(times, _to_msc(date_to), "right")
+        return data["deals"][lo:hi]
+
+    def history_deals_total(self, date_from, date_to):
+        calls["history_deals_total"] += 1
+        return len(self._deal_slice(date_from, date_to))
+
+    def history_deals_get(
+        self, date_from=None, date_to=None, group=None, ticket=None, position=None
+    ):
+        calls["history_deals_get"] += 1
+        if ticket is not None or position is not None:
+            return tuple(
+                d
+                for d in dataset()["deals"]
+                if (ticket is None or d.ticket == ticket)
+                and (position is None or d.position_id == position)
+            )
+        return self._deal_slice(date_from, date_to)
+
+
+_default_terminal = MetaTrader5()
+initialize = _default_terminal.initialize
+login = _default_terminal.login
+shutdown = _default_terminal.shutdown
+last_error = _default_terminal.last_error
+account_info = _default_terminal.account_info
+positions_total = _default_terminal.positions_total
+positions_get = _default_terminal.positions_get
+orders_total = _default_terminal.orders_total
+orders_get = _default_terminal.orders_get
+history_deals_total = _default_terminal.history_deals_total
+history_deals_get = _default_terminal.history_deals_get
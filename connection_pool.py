@@ -0,0 +1,155 @@
+import threading
+
+import pymt5linux as mt5
+
+
+class MT5ConnectionError(Exception):
+    pass
+
+
+def open_terminal(account_details):
+    host = (account_details.get("host") or "").strip()
+    if host:
+        return mt5.MetaTrader5(
+            host=host, port=int(account_details.get("port") or 18812)
+        )
+    return mt5
+
+
+def endpoint_key(account_details):
+    return (
+        (account_details.get("host") or "").strip(),
+        int(account_details.get("port") or 0),
+    )
+
+
+class MT5Connection:
+    """One account's session on a (possibly shared) terminal.
+
+    A failed open() only shuts the terminal down when shares_terminal() says no
+    other pooled account uses it; otherwise the error is kept in last_error and
+    the terminal stays up for the other logins. A successful open() keeps the
+    account_info it read under the lock, so callers don't have to read it again
+    after another login may have taken a shared terminal.
+
+    terminal_session records which pooled login last opened the terminal; when
+    it is another one, open() logs in without asking account_info first.
+    """
+
+    def __init__(
+        self,
+        account_details,
+        terminal,
+        lock,
+        shares_terminal=None,
+        terminal_session=None,
+    ):
+        self.account_details = dict(account_details)
+        self.login = account_details["login"]
+        self.terminal = terminal
+        self.lock = lock
+        self.shares_terminal = shares_terminal or (lambda: False)
+        self.terminal_session = (
+            {"login": None} if terminal_session is None else terminal_session
+        )
+        self.last_error = None
+        self.account_info = None
+
+    def is_logged_in(self):
+        account_info = self.terminal.account_info()
+        if account_info is None or account_info.login != self.login:
+            return False
+        self.account_info = account_info
+        return True
+
+    def open(self):
+        with self.lock:
+            if (
+                self.terminal_session["login"] in (None, self.login)
+                and self.is_logged_in()
+            ):
+                self.terminal_session["login"] = self.login
+                return self
+            self.terminal_session["login"] = None
+            init_params = {}
+            mt5_path = self.account_details.get("path", None)
+            if mt5_path and mt5_path.strip():
+                init_params["path"] = mt5_path
+            if not self.terminal.initialize(**init_params):
+                self.last_error = self.terminal.last_error()
+                raise MT5ConnectionError(
+                    f"initialize() falló para {self.login}, error code = {self.last_error}"
+                )
+            authorized = self.terminal.login(
+                self.login,
+                password=self.account_details["password"],
+                server=self.account_details["server"],
+            )
+            if not authorized:
+                self.last_error = self.terminal.last_error()
+                if not self.shares_terminal():
+                    self.terminal.shutdown()
+                raise MT5ConnectionError(
+                    f"Fallo al conectar a la cuenta #{self.login}, error code = {self.last_error}"
+                )
+            if not self.is_logged_in():
+                self.last_error = self.terminal.last_error()
+                raise MT5ConnectionError(
+                    f"Fallo al obtener información de la cuenta {self.login} después del login, error code = {self.last_error}"
+                )
+            self.terminal_session["login"] = self.login
+            self.last_error = None
+            return self
+
+
+class MT5ConnectionPool:
+    """Warm MT5 connections keyed by login.
+
+    Each distinct host/port endpoint gets its own terminal client, lock and
+    terminal session; accounts configured without an endpoint share the
+    default terminal.
+    """
+
+    def __init__(self, terminal_factory):
+        self.terminal_factory = terminal_factory
+        self._lock = threading.Lock()
+        self._terminals = {}
+        self._connections = {}
+
+    def _terminal(self, account_details):
+        key = endpoint_key(account_details)
+        if key not in self._terminals:
+            self._terminals[key] = (
+                self.terminal_factory(account_details),
+                threading.RLock(),
+                {"login": None},
+            )
+        return self._terminals[key]
+
+    def _shares_terminal(self, login, terminal):
+        with self._lock:
+            return any(
+                connection.terminal is terminal
+                for other_login, connection in self._connections.items()
+                if other_login != login
+            )
+
+    def connect(self, account_details):
+        login = account_details["login"]
+        with self._lock:
+            connection = self._connections.get(login)
+            if connection is None or connection.account_details != account_details:
+                terminal, lock, terminal_session = self._terminal(account_details)
+                connection = MT5Connection(
+                    account_details,
+                    terminal,
+                    lock,
+                    shares_terminal=lambda: self._shares_terminal(login, terminal),
+                    terminal_session=terminal_session,
+                )
+                self._connections[login] = connection
+        return connection.open()
+
+    def get(self, login):
+        with self._lock:
+            return self._connections.get(login)
@@ -0,0 +1,368 @@
+import os
+import sqlite3
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from operator import attrgetter
+
+import numpy as np
+import pandas as pd
+
+import pymt5linux as mt5
+from mt5_frames import compact_deals
+
+HISTORY_START = datetime(2000, 1, 1)
+SYNC_OVERLAP = timedelta(days=1)
+EPOCH = datetime(1970, 1, 1)
+
+DEAL_COLUMNS = {
+    "ticket": "INTEGER PRIMARY KEY",
+    "order": "INTEGER",
+    "time": "INTEGER",
+    "time_msc": "INTEGER NOT NULL",
+    "type": "INTEGER",
+    "entry": "INTEGER",
+    "magic": "INTEGER",
+    "position_id": "INTEGER",
+    "reason": "INTEGER",
+    "volume": "REAL",
+    "price": "REAL",
+    "commission": "REAL",
+    "swap": "REAL",
+    "profit": "REAL",
+    "fee": "REAL",
+    "symbol": "TEXT",
+    "comment": "TEXT",
+    "external_id": "TEXT",
+}
+
+_QUOTED_COLUMNS = ", ".join(f'"{col}"' for col in DEAL_COLUMNS)
+
+MS_PER_DAY = 86_400_000
+ROLLUP_FREQS = ("D", "W-MON", "MS")
+ROLLUP_COLUMNS = {
+    "trade_profit": "REAL",
+    "commission": "REAL",
+    "swap": "REAL",
+    "deposits": "REAL",
+    "withdrawals": "REAL",
+    "trades": "INTEGER",
+    "deals": "INTEGER",
+}
+
+_TRADE_TYPES = f"({mt5.DEAL_TYPE_BUY}, {mt5.DEAL_TYPE_SELL})"
+_IS_TRADE = (
+    f"type IN {_TRADE_TYPES} AND entry IN "
+    f"({mt5.DEAL_ENTRY_IN}, {mt5.DEAL_ENTRY_OUT}, {mt5.DEAL_ENTRY_INOUT})"
+)
+_IS_CLOSE = (
+    f"type IN {_TRADE_TYPES} AND entry IN "
+    f"({mt5.DEAL_ENTRY_OUT}, {mt5.DEAL_ENTRY_INOUT}, {mt5.DEAL_ENTRY_OUT_BY})"
+)
+_IS_BALANCE = f"type = {mt5.DEAL_TYPE_BALANCE}"
+_ROLLUP_NAMES = ", ".join(ROLLUP_COLUMNS)
+
+_DAILY_ROLLUP_SQL = f"""
+INSERT INTO pnl_rollups (freq, period, magic, {_ROLLUP_NAMES})
+SELECT 'D', time_msc / {MS_PER_DAY}, CASE WHEN {_IS_BALANCE} THEN 0 ELSE magic END,
+    TOTAL(CASE WHEN {_IS_TRADE} THEN profit END),
+    TOTAL(CASE WHEN {_IS_TRADE} THEN commission END),
+    TOTAL(CASE WHEN {_IS_TRADE} THEN swap END),
+    TOTAL(CASE WHEN {_IS_BALANCE} AND profit > 0 THEN profit END),
+    TOTAL(CASE WHEN {_IS_BALANCE} AND profit < 0 THEN profit END),
+    SUM({_IS_CLOSE}),
+    SUM(type IN {_TRADE_TYPES})
+FROM deals
+WHERE time_msc >= ? AND (type IN {_TRADE_TYPES} OR {_IS_BALANCE})
+GROUP BY 2, 3
+"""
+
+_PERIOD_ROLLUP_SQL = f"""
+INSERT INTO pnl_rollups (freq, period, magic, {_ROLLUP_NAMES})
+SELECT ?, {{period}}, magic, TOTAL(trade_profit), TOTAL(commission), TOTAL(swap),
+    TOTAL(deposits), TOTAL(withdrawals), SUM(trades), SUM(deals)
+FROM pnl_rollups
+WHERE freq = 'D' AND period >= ?
+GROUP BY 2, 3
+"""
+
+_PERIOD_EXPRESSIONS = {
+    "W-MON": "period - (period + 3) % 7",
+    "MS": "CAST(julianday(date(period * 86400, 'unixepoch', 'start of month')) - 2440587.5 AS INTEGER)",
+}
+
+_BALANCE_PEAKS_SQL = f"""
+INSERT INTO balance_peaks (day, peak_offset)
+SELECT day, MAX(running) FROM (
+    SELECT time_msc / {MS_PER_DAY} AS day,
+        SUM(CASE WHEN {_IS_BALANCE} THEN profit ELSE profit + commission + swap END)
+            OVER (PARTITION BY time_msc / {MS_PER_DAY} ORDER BY time_msc, ticket) AS running
+    FROM deals
+    WHERE time_msc >= ? AND (({_IS_TRADE}) OR {_IS_BALANCE})
+)
+GROUP BY day
+"""
+
+
+def to_msc(value):
+    return int(pd.Timestamp(value).value // 1_000_000)
+
+
+def add_months(value, months):
+    years, month_index = divmod(value.month - 1 + months, 12)
+    return datetime(value.year + years, month_index + 1, 1)
+
+
+def find_first_deal_month(terminal, date_from, date_to):
+    total = terminal.history_deals_total(date_from, date_to)
+    if total is None:
+        return date_from
+    if total == 0:
+        return None
+    base = datetime(date_from.year, date_from.month, 1)
+    lo = 0
+    hi = (date_to.year - base.year) * 12 + date_to.month - base.month
+    while lo < hi:
+        mid = (lo + hi) // 2
+        if terminal.history_deals_total(date_from, add_months(base, mid + 1)):
+            hi = mid
+        else:
+            lo = mid + 1
+    return max(add_months(base, lo), date_from)
+
+
+def period_start_day(day, freq):
+    if freq == "W-MON":
+        return day - (day + 3) % 7
+    if freq == "MS":
+        start = EPOCH + timedelta(days=day)
+        return (datetime(start.year, start.month, 1) - EPOCH).days
+    return day
+
+
+def history_windows(date_from, date_to, window_months=3):
+    window_start = date_from
+    while window_start < date_to:
+        window_end = min(add_months(window_start, window_months), date_to)
+        yield window_start, window_end
+        window_start = window_end
+
+
+def iter_history_deals(terminal, date_from, date_to, window_months=3, max_workers=1):
+    windows = list(history_windows(date_from, date_to, window_months))
+    if len(windows) > 1:
+        first_month = find_first_deal_month(terminal, date_from, date_to)
+        if first_month is None:
+            return
+        windows = list(history_windows(first_month, date_to, window_months))
+
+    def fetch(window):
+        return window[1], terminal.history_deals_get(*window)
+
+    if max_workers > 1:
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            yield from executor.map(fetch, windows)
+    else:
+        yield from map(fetch, windows)
+
+
+class DealStore:
+    """Deal history of a single login persisted in SQLite.
+
+    The first sync backfills the whole history in month windows starting at
+    the first month with deals; later syncs walk the same windows starting at
+    the stored (time_msc, ticket) watermark. Daily, weekly and monthly
+    P&L rollups per magic are kept next to the deals and only the periods
+    touched by a sync are recomputed.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        column_defs = ", ".join(
+            f'"{col}" {sql_type}' for col, sql_type in DEAL_COLUMNS.items()
+        )
+        with self._connect() as conn:
+            conn.execute(f"CREATE TABLE IF NOT EXISTS deals ({column_defs})")
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_deals_time_msc ON deals (time_msc, ticket)"
+            )
+            rollup_defs = ", ".join(
+                f"{col} {sql_type}" for col, sql_type in ROLLUP_COLUMNS.items()
+            )
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS pnl_rollups (freq TEXT NOT NULL, "
+                f"period INTEGER NOT NULL, magic INTEGER NOT NULL, {rollup_defs}, "
+                "PRIMARY KEY (freq, period, magic))"
+            )
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS balance_peaks "
+                "(day INTEGER PRIMARY KEY, peak_offset REAL)"
+            )
+            needs_rollups = conn.execute(
+                "SELECT EXISTS (SELECT 1 FROM deals) "
+                "AND NOT EXISTS (SELECT 1 FROM pnl_rollups)"
+            ).fetchone()[0]
+        if needs_rollups:
+            self.refresh_rollups(0)
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=30)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def watermark(self):
+        with self._connect() as conn:
+            return conn.execute(
+                "SELECT time_msc, ticket FROM deals ORDER BY time_msc DESC, ticket DESC LIMIT 1"
+            ).fetchone()
+
+    def _insert(self, deals):
+        if len(deals) == 0:
+            return 0
+        placeholders = ", ".join("?" for _ in DEAL_COLUMNS)
+        with self._connect() as conn:
+            before = conn.total_changes
+            conn.executemany(
+                f"INSERT OR IGNORE INTO deals ({_QUOTED_COLUMNS}) VALUES ({placeholders})",
+                map(attrgetter(*DEAL_COLUMNS), deals),
+            )
+            inserted = conn.total_changes - before
+            if inserted:
+                first_day = min(deal.time_msc for deal in deals) // MS_PER_DAY
+                self._refresh_rollups(conn, first_day)
+            return inserted
+
+    def _refresh_rollups(self, conn, first_day):
+        conn.execute(
+            "DELETE FROM pnl_rollups WHERE freq = 'D' AND period >= ?", (first_day,)
+        )
+        conn.execute(_DAILY_ROLLUP_SQL, (first_day * MS_PER_DAY,))
+        for freq in ROLLUP_FREQS[1:]:
+            period_start = period_start_day(first_day, freq)
+            conn.execute(
+                "DELETE FROM pnl_rollups WHERE freq = ? AND period >= ?",
+                (freq, period_start),
+            )
+            conn.execute(
+                _PERIOD_ROLLUP_SQL.format(period=_PERIOD_EXPRESSIONS[freq]),
+                (freq, period_start),
+            )
+        conn.execute("DELETE FROM balance_peaks WHERE day >= ?", (first_day,))
+        conn.execute(_BALANCE_PEAKS_SQL, (first_day * MS_PER_DAY,))
+
+    def refresh_rollups(self, first_day=0):
+        with self._connect() as conn:
+            self._refresh_rollups(conn, first_day)
+
+    def sync_chunks(self, terminal, window_months=3, max_workers=1):
+        last = self.watermark()
+        date_to = datetime.now() + SYNC_OVERLAP
+        if last is None:
+            date_from = HISTORY_START
+        else:
+            date_from = EPOCH + timedelta(milliseconds=last[0]) - SYNC_OVERLAP
+        for window_end, deals in iter_history_deals(
+            terminal, date_from, date_to, window_months, max_workers
+        ):
+            if deals is None:
+                yield window_end, None
+                return
+            with self._lock:
+                inserted = self._insert(deals)
+            yield window_end, inserted
+
+    def sync(self, terminal):
+        total = 0
+        for _, inserted in self.sync_chunks(terminal):
+            if inserted is None:
+                return None
+            total += inserted
+        return total
+
+    def load(self, start=None, end=None):
+        conditions = []
+        params = []
+        if start is not None:
+            conditions.append("time_msc >= ?")
+            params.append(to_msc(start))
+        if end is not None:
+            conditions.append("time_msc <= ?")
+            params.append(to_msc(end))
+        query = f"SELECT {_QUOTED_COLUMNS} FROM deals"
+        if conditions:
+            query += " WHERE " + " AND ".join(conditions)
+        query += " ORDER BY time_msc, ticket"
+        with self._connect() as conn:
+            df_deals = pd.read_sql_query(query, conn, params=params)
+        return compact_deals(df_deals)
+
+    def load_rollups(self, freq="D"):
+        with self._connect() as conn:
+            rollups = pd.read_sql_query(
+                f"SELECT period, magic, {_ROLLUP_NAMES} FROM pnl_rollups "
+                "WHERE freq = ? ORDER BY period, magic",
+                conn,
+                params=(freq,),
+            )
+        rollups["period"] = pd.to_datetime(rollups["period"], unit="D")
+        return rollups
+
+    def load_traded_magics(self):
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT DISTINCT magic FROM pnl_rollups "
+                "WHERE freq = 'D' AND deals > 0 ORDER BY magic"
+            ).fetchall()
+        return [magic for (magic,) in rows]
+
+    def load_balance_peaks(self):
+        with self._connect() as conn:
+            peaks = pd.read_sql_query(
+                "SELECT day, peak_offset FROM balance_peaks ORDER BY day", conn
+            )
+        peaks["day"] = pd.to_datetime(peaks["day"], unit="D")
+        return peaks
+
+
+class DealSnapshot:
+    """One load of a login's stored deals, reused until its version changes."""
+
+    def __init__(self, login, store, version=None):
+        self.login = login
+        self.store = store
+        self.version = version
+        self._deals = None
+
+    def load(self):
+        self._deals = self.store.load()
+        return self._deals
+
+    def deals(self, start=None, end=None):
+        if self._deals is None:
+            self.load()
+        times = self._deals["time_dt"].to_numpy()
+        lo = (
+            0
+            if start is None
+            else np.searchsorted(times, pd.Timestamp(start).to_datetime64(), "left")
+        )
+        hi = (
+            len(times)
+            if end is None
+            else np.searchsorted(times, pd.Timestamp(end).to_datetime64(), "right")
+        )
+        return self._deals.iloc[lo:hi]
+
+    def memory_bytes(self):
+        if self._deals is None:
+            return 0
+        return int(self._deals.memory_usage(deep=True).sum())
@@ -0,0 +1,174 @@
+import json
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+import pandas as pd
+
+METRIC_COLUMNS = [
+    "kind",
+    "name",
+    "count",
+    "errors",
+    "total_s",
+    "mean_s",
+    "max_s",
+    "last_s",
+    "rows",
+]
+
+
+def payload_rows(result):
+    if result is None:
+        return 0
+    if isinstance(result, (str, bytes)) or hasattr(result, "_fields"):
+        return 1
+    try:
+        return len(result)
+    except TypeError:
+        return 1
+
+
+class Span:
+    def __init__(self):
+        self.rows = None
+
+
+class Metrics:
+    """Count, duration and payload rows per (kind, name), safe across threads.
+
+    Every record is also forwarded to the parent registry, so a per-run
+    registry can feed the process-wide totals; a tag prefixes the kind it is
+    forwarded under, keeping e.g. fragment reruns apart from full runs.
+    """
+
+    def __init__(self, parent=None, tag=None):
+        self.parent = parent
+        self.tag = tag
+        self.started_at = datetime.now()
+        self._lock = threading.Lock()
+        self._stats = {}
+
+    def record(self, kind, name, seconds, rows=None, error=False):
+        with self._lock:
+            stats = self._stats.get((kind, name))
+            if stats is None:
+                stats = self._stats[(kind, name)] = {
+                    "count": 0,
+                    "errors": 0,
+                    "total_s": 0.0,
+                    "max_s": 0.0,
+                    "last_s": 0.0,
+                    "rows": 0,
+                }
+            stats["count"] += 1
+            stats["errors"] += int(error)
+            stats["total_s"] += seconds
+            stats["max_s"] = max(stats["max_s"], seconds)
+            stats["last_s"] = seconds
+            stats["rows"] += rows or 0
+        if self.parent is not None:
+            self.parent.record(
+                kind if self.tag is None else f"{self.tag}:{kind}",
+                name,
+                seconds,
+                rows,
+                error,
+            )
+
+    @contextmanager
+    def timer(self, kind, name):
+        span = Span()
+        started = time.perf_counter()
+        error = False
+        try:
+            yield span
+        except Exception:
+            error = True
+            raise
+        finally:
+            self.record(kind, name, time.perf_counter() - started, span.rows, error)
+
+    def reset(self):
+        with self._lock:
+            self._stats.clear()
+            self.started_at = datetime.now()
+
+    def snapshot(self):
+        with self._lock:
+            items = [(key, dict(stats)) for key, stats in self._stats.items()]
+        return [
+            {
+                "kind": kind,
+                "name": name,
+                **stats,
+                "mean_s": stats["total_s"] / stats["count"],
+            }
+            for (kind, name), stats in sorted(items)
+        ]
+
+    def to_frame(self):
+        return pd.DataFrame(self.snapshot(), columns=METRIC_COLUMNS).sort_values(
+            "total_s", ascending=False
+        )
+
+    def to_json(self):
+        return json.dumps(
+            {
+                "started_at": self.started_at.isoformat(timespec="seconds"),
+                "generated_at": datetime.now().isoformat(timespec="seconds"),
+                "metrics": self.snapshot(),
+            },
+            indent=2,
+        )
+
+    def to_prometheus(self, namespace="mt5_dashboard"):
+        series = [
+            ("calls_total", "counter", "Number of timed calls.", "count"),
+            ("errors_total", "counter", "Number of timed calls that raised.", "errors"),
+            (
+                "duration_seconds_total",
+                "counter",
+                "Total time spent in timed calls.",
+                "total_s",
+            ),
+            (
+                "duration_seconds_max",
+                "gauge",
+                "Slowest single timed call.",
+                "max_s",
+            ),
+            ("rows_total", "counter", "Payload rows returned or produced.", "rows"),
+        ]
+        snapshot = self.snapshot()
+        lines = []
+        for suffix, metric_type, help_text, field in series:
+            metric = f"{namespace}_{suffix}"
+            lines.append(f"# HELP {metric} {help_text}")
+            lines.append(f"# TYPE {metric} {metric_type}")
+            for stats in snapshot:
+                labels = f'kind="{stats["kind"]}",name="{stats["name"]}"'
+                lines.append(f"{metric}{{{labels}}} {stats[field]}")
+        return "\n".join(lines) + "\n"
+
+
+class InstrumentedTerminal:
+    """Proxy that times every method call made on an MT5 terminal."""
+
+    def __init__(self, terminal, metrics):
+        self._terminal = terminal
+        self._metrics = metrics
+
+    def __getattr__(self, name):
+        attr = getattr(self._terminal, name)
+        if not callable(attr):
+            return attr
+
+        def call(*args, **kwargs):
+            with self._metrics.timer("mt5", name) as span:
+                result = attr(*args, **kwargs)
+                span.rows = payload_rows(result)
+            return result
+
+        return call
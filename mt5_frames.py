@@ -0,0 +1,179 @@
+from operator import itemgetter
+
+import numpy as np
+import pandas as pd
+
+DEAL_SCHEMA = {
+    "ticket": np.int64,
+    "order": np.int64,
+    "time": np.int64,
+    "time_msc": np.int64,
+    "type": np.int64,
+    "entry": np.int64,
+    "magic": np.int64,
+    "position_id": np.int64,
+    "reason": np.int64,
+    "volume": np.float64,
+    "price": np.float64,
+    "commission": np.float64,
+    "swap": np.float64,
+    "profit": np.float64,
+    "fee": np.float64,
+    "symbol": object,
+    "comment": object,
+    "external_id": object,
+}
+
+POSITION_SCHEMA = {
+    "ticket": np.int64,
+    "time": np.int64,
+    "time_msc": np.int64,
+    "time_update": np.int64,
+    "time_update_msc": np.int64,
+    "type": np.int64,
+    "magic": np.int64,
+    "identifier": np.int64,
+    "reason": np.int64,
+    "volume": np.float64,
+    "price_open": np.float64,
+    "sl": np.float64,
+    "tp": np.float64,
+    "price_current": np.float64,
+    "swap": np.float64,
+    "profit": np.float64,
+    "symbol": object,
+    "comment": object,
+    "external_id": object,
+}
+
+ORDER_SCHEMA = {
+    "ticket": np.int64,
+    "time_setup": np.int64,
+    "time_setup_msc": np.int64,
+    "time_done": np.int64,
+    "time_done_msc": np.int64,
+    "time_expiration": np.int64,
+    "type": np.int64,
+    "type_time": np.int64,
+    "type_filling": np.int64,
+    "state": np.int64,
+    "magic": np.int64,
+    "position_id": np.int64,
+    "position_by_id": np.int64,
+    "reason": np.int64,
+    "volume_initial": np.float64,
+    "volume_current": np.float64,
+    "price_open": np.float64,
+    "sl": np.float64,
+    "tp": np.float64,
+    "price_current": np.float64,
+    "price_stoplimit": np.float64,
+    "symbol": object,
+    "comment": object,
+    "external_id": object,
+}
+
+
+COMPACT_DEAL_DTYPES = {
+    "type": np.int8,
+    "entry": np.int8,
+    "reason": np.int8,
+    "symbol": "category",
+    "comment": "category",
+    "external_id": "category",
+}
+
+
+def records_to_frame(records, schema, columns=None):
+    columns = list(schema) if columns is None else list(columns)
+    if records is None or len(records) == 0:
+        return pd.DataFrame({col: np.array([], dtype=schema[col]) for col in columns})
+    fields = records[0]._fields
+    return pd.DataFrame(
+        {
+            col: np.fromiter(
+                map(itemgetter(fields.index(col)), records),
+                dtype=schema[col],
+                count=len(records),
+            )
+            for col in columns
+        },
+        copy=False,
+    )
+
+
+def zero_to_nan(series):
+    return series.mask(series.to_numpy() == 0.0)
+
+
+def compact_deals(df_deals):
+    df_deals = df_deals.astype(
+        {col: dtype for col, dtype in COMPACT_DEAL_DTYPES.items() if col in df_deals}
+    )
+    df_deals["magic"] = pd.to_numeric(df_deals["magic"], downcast="integer")
+    df_deals.insert(
+        df_deals.columns.get_loc("time"),
+        "time_dt",
+        pd.to_datetime(df_deals["time_msc"], unit="ms"),
+    )
+    return df_deals.drop(columns=["time", "time_msc"])
+
+
+class LiveTable:
+    """Ticket-indexed frame of live MT5 records patched between polls.
+
+    Tickets already in the frame only get their mutable columns refreshed;
+    full records are converted only for tickets that appear. version is
+    bumped only when the content actually changes.
+    """
+
+    def __init__(self, schema, columns, mutable):
+        self.schema = schema
+        self.columns = ["ticket"] + [col for col in columns if col != "ticket"]
+        self.mutable = list(mutable)
+        self.frame = None
+        self.version = 0
+        self._records = None
+        self._view = None
+        self._view_version = None
+
+    def _convert(self, records):
+        return records_to_frame(records, self.schema, self.columns).set_index("ticket")
+
+    def update(self, records):
+        records = tuple(records or ())
+        if self.frame is not None and records is self._records:
+            return False
+        self._records = records
+        if self.frame is None:
+            self.frame = self._convert(records)
+            self.version += 1
+            return True
+        current = records_to_frame(
+            records, self.schema, ["ticket"] + self.mutable
+        ).set_index("ticket")
+        is_new = ~current.index.isin(self.frame.index)
+        frame = self.frame[self.frame.index.isin(current.index)]
+        if is_new.any():
+            frame = pd.concat(
+                [
+                    frame,
+                    self._convert(
+                        [record for record, new in zip(records, is_new) if new]
+                    ),
+                ]
+            )
+        frame = frame.reindex(current.index).assign(
+            **{col: current[col] for col in self.mutable}
+        )
+        if frame.equals(self.frame):
+            return False
+        self.frame = frame
+        self.version += 1
+        return True
+
+    def view(self, build):
+        if self._view_version != self.version:
+            self._view = build(self.frame)
+            self._view_version = self.version
+        return self._view
@@ -0,0 +1,243 @@
+import os
+import threading
+import time
+from collections import namedtuple
+from datetime import datetime
+
+from connection_pool import MT5ConnectionError
+from deal_store import DealStore
+
+AccountSnapshot = namedtuple(
+    "AccountSnapshot",
+    [
+        "login",
+        "taken_at",
+        "account_info",
+        "positions",
+        "orders",
+        "deals_version",
+        "history_synced_at",
+        "backfill_until",
+        "last_error",
+    ],
+)
+
+
+def pending_snapshot(login):
+    return AccountSnapshot(
+        login=login,
+        taken_at=None,
+        account_info=None,
+        positions=(),
+        orders=(),
+        deals_version=0,
+        history_synced_at=None,
+        backfill_until=None,
+        last_error=None,
+    )
+
+
+class MT5Poller:
+    """Single background reader of the MT5 bridge shared by every session.
+
+    Sessions register the logins they display with watch() and read the latest
+    AccountSnapshot; only the poller talks to the pooled terminals. Until the
+    first poll of a login, watch() returns a pending snapshot (taken_at None).
+
+    The terminal lock is held per history window, not for a whole sync, and
+    each poll_once() tick gives an account at most sync_budget seconds of
+    history sync before moving on; an unfinished sync resumes on the next
+    tick, so a long backfill doesn't stall live polling of any account.
+    """
+
+    def __init__(
+        self,
+        pool,
+        deal_store_dir,
+        interval=2.0,
+        history_interval=10.0,
+        orders_interval=10.0,
+        idle_timeout=300.0,
+        sync_budget=None,
+    ):
+        self.pool = pool
+        self.deal_store_dir = deal_store_dir
+        self.interval = interval
+        self.history_interval = history_interval
+        self.orders_interval = orders_interval
+        self.idle_timeout = idle_timeout
+        self.sync_budget = interval if sync_budget is None else sync_budget
+        self._lock = threading.Lock()
+        self._snapshots = {}
+        self._stores = {}
+        self._syncs = {}
+        self._last_seen = {}
+        self._orders_fetched_at = {}
+        self._stop = threading.Event()
+        self._wake = threading.Event()
+        self._thread = threading.Thread(
+            target=self._run, name="mt5-poller", daemon=True
+        )
+
+    def start(self):
+        if not self._thread.is_alive():
+            self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self._wake.set()
+
+    def deal_store(self, login):
+        with self._lock:
+            if login not in self._stores:
+                self._stores[login] = DealStore(
+                    os.path.join(self.deal_store_dir, f"deals_{login}.sqlite")
+                )
+            return self._stores[login]
+
+    def watch(self, login):
+        with self._lock:
+            self._last_seen[login] = time.monotonic()
+            snapshot = self._snapshots.get(login)
+            if snapshot is None:
+                snapshot = self._snapshots[login] = pending_snapshot(login)
+                self._wake.set()
+        return snapshot
+
+    def snapshot(self, login):
+        with self._lock:
+            return self._snapshots.get(login)
+
+    def _publish(self, snapshot):
+        with self._lock:
+            self._snapshots[snapshot.login] = snapshot
+        return snapshot
+
+    def _fetch_positions(self, terminal, previous):
+        if terminal.positions_total() == 0:
+            return ()
+        positions = tuple(terminal.positions_get() or ())
+        if previous is not None and positions == previous.positions:
+            return previous.positions
+        return positions
+
+    def _fetch_orders(self, terminal, login, previous):
+        total = terminal.orders_total()
+        if total == 0:
+            return ()
+        now = time.monotonic()
+        if (
+            previous is not None
+            and total == len(previous.orders)
+            and now - self._orders_fetched_at.get(login, float("-inf"))
+            < self.orders_interval
+        ):
+            return previous.orders
+        self._orders_fetched_at[login] = now
+        orders = tuple(terminal.orders_get() or ())
+        if previous is not None and orders == previous.orders:
+            return previous.orders
+        return orders
+
+    def poll_account(self, login, sync_history=False, sync_budget=None):
+        previous = self.snapshot(login)
+        snapshot = AccountSnapshot(
+            login=login,
+            taken_at=datetime.now(),
+            account_info=None,
+            positions=(),
+            orders=(),
+            deals_version=previous.deals_version if previous else 0,
+            history_synced_at=previous.history_synced_at if previous else None,
+            backfill_until=previous.backfill_until if previous else None,
+            last_error=None,
+        )
+        connection = self.pool.get(login)
+        try:
+            if connection is None:
+                raise MT5ConnectionError(
+                    f"Sin conexión registrada para la cuenta {login}"
+                )
+            with connection.lock:
+                # open() already read account_info under the lock to check the login.
+                terminal = connection.open().terminal
+                snapshot = snapshot._replace(
+                    account_info=connection.account_info,
+                    positions=self._fetch_positions(terminal, previous),
+                    orders=self._fetch_orders(terminal, login, previous),
+                )
+            if not sync_history:
+                return self._publish(snapshot)
+            return self._sync_history(connection, snapshot, sync_budget)
+        except MT5ConnectionError as e:
+            return self._publish(snapshot._replace(last_error=str(e)))
+
+    def _sync_history(self, connection, snapshot, budget):
+        login = snapshot.login
+        with self._lock:
+            chunks = self._syncs.pop(login, None)
+        if chunks is None:
+            chunks = self.deal_store(login).sync_chunks(connection.terminal)
+        started = time.monotonic()
+        backfilling = snapshot.history_synced_at is None
+        while True:
+            with connection.lock:
+                # Another login may have taken a shared terminal between windows.
+                connection.open()
+                chunk = next(chunks, None)
+            if chunk is None:
+                break
+            window_end, new_deals = chunk
+            if new_deals is None:
+                return self._publish(
+                    snapshot._replace(last_error=connection.terminal.last_error())
+                )
+            if new_deals:
+                snapshot = snapshot._replace(deals_version=snapshot.deals_version + 1)
+            if backfilling:
+                snapshot = self._publish(snapshot._replace(backfill_until=window_end))
+            if budget is not None and time.monotonic() - started >= budget:
+                with self._lock:
+                    self._syncs[login] = chunks
+                return self._publish(snapshot)
+        return self._publish(
+            snapshot._replace(history_synced_at=datetime.now(), backfill_until=None)
+        )
+
+    def poll_once(self):
+        now = time.monotonic()
+        with self._lock:
+            for login, seen in list(self._last_seen.items()):
+                if now - seen > self.idle_timeout:
+                    del self._last_seen[login]
+                    self._snapshots.pop(login, None)
+                    self._syncs.pop(login, None)
+                    self._orders_fetched_at.pop(login, None)
+            logins = list(self._last_seen)
+        for login in logins:
+            with self._lock:
+                previous = self._snapshots.get(login)
+                syncing = login in self._syncs
+            sync_history = (
+                syncing
+                or previous is None
+                or previous.history_synced_at is None
+                or (datetime.now() - previous.history_synced_at).total_seconds()
+                >= self.history_interval
+            )
+            try:
+                self.poll_account(
+                    login, sync_history=sync_history, sync_budget=self.sync_budget
+                )
+            except Exception as e:
+                if previous is not None:
+                    with self._lock:
+                        self._snapshots[login] = previous._replace(last_error=str(e))
+
+    def _run(self):
+        while not self._stop.is_set():
+            self._wake.wait(self.interval)
+            self._wake.clear()
+            if not self._stop.is_set():
+                self.poll_once()
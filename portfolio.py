@@ -0,0 +1,96 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+
+import pymt5linux as mt5
+from analytics import build_closed_trades, calculate_kpis, empty_kpis
+from connection_pool import MT5ConnectionError
+
+TOTAL_COLUMNS = [
+    "Balance",
+    "Equidad",
+    "Profit Flotante",
+    "Posiciones",
+    "Lotes Abiertos",
+    "Lotes Netos",
+    "Profit Periodo",
+]
+
+
+def account_overview(account_details, pool, poller, start, end):
+    row = {
+        "Cuenta": account_details["name"],
+        "Login": account_details["login"],
+        "Estado": None,
+        "Error": None,
+    }
+    try:
+        pool.connect(account_details)
+    except MT5ConnectionError as e:
+        row["Error"] = str(e)
+        return row
+    snapshot = poller.watch(account_details["login"])
+    if snapshot.taken_at is None:
+        row["Estado"] = "Esperando la primera lectura del terminal"
+        return row
+    account_info = snapshot.account_info
+    if account_info is None or account_info.login != account_details["login"]:
+        row["Error"] = f"Sin datos de cuenta: {snapshot.last_error}"
+        return row
+    buy_volume = sum(
+        p.volume for p in snapshot.positions if p.type == mt5.POSITION_TYPE_BUY
+    )
+    sell_volume = sum(
+        p.volume for p in snapshot.positions if p.type == mt5.POSITION_TYPE_SELL
+    )
+    if snapshot.history_synced_at is None:
+        row["Estado"] = (
+            f"Sincronizando historial (hasta {snapshot.backfill_until:%Y-%m-%d})"
+            if snapshot.backfill_until is not None
+            else "Sincronizando historial"
+        )
+        kpis = dict.fromkeys(empty_kpis())
+    else:
+        deals_df = poller.deal_store(account_details["login"]).load(start, end)
+        kpis = calculate_kpis(
+            build_closed_trades(deals_df) if not deals_df.empty else pd.DataFrame()
+        )
+    row.update(
+        {
+            "Moneda": account_info.currency,
+            "Balance": account_info.balance,
+            "Equidad": account_info.equity,
+            "Profit Flotante": account_info.profit,
+            "Posiciones": len(snapshot.positions),
+            "Lotes Abiertos": buy_volume + sell_volume,
+            "Lotes Netos": buy_volume - sell_volume,
+            "Trades Periodo": kpis["num_trades"],
+            "Profit Periodo": kpis["total_profit_period"],
+            "Win Rate (%)": kpis["win_rate"],
+            "Profit Factor": kpis["profit_factor"],
+            "Max DD (Dinero)": kpis["max_drawdown_value"],
+        }
+    )
+    return row
+
+
+def load_portfolio(accounts, pool, poller, start, end, max_workers=8):
+    if not accounts:
+        return pd.DataFrame()
+    with ThreadPoolExecutor(
+        max_workers=min(max_workers, len(accounts)), thread_name_prefix="portfolio"
+    ) as executor:
+        rows = list(
+            executor.map(
+                lambda account: account_overview(account, pool, poller, start, end),
+                accounts,
+            )
+        )
+    return pd.DataFrame(rows)
+
+
+def portfolio_totals(portfolio_df):
+    if portfolio_df.empty or "Moneda" not in portfolio_df:
+        return pd.DataFrame(columns=TOTAL_COLUMNS)
+    ok = portfolio_df[portfolio_df["Error"].isna() & portfolio_df["Moneda"].notna()]
+    return ok.groupby("Moneda")[TOTAL_COLUMNS].sum()
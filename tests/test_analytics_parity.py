@@ -0,0 +1,413 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import pymt5linux as mt5
+from analytics import (
+    KpiAccumulator,
+    build_closed_trades,
+    calculate_kpis,
+    calculate_kpis_by_group,
+)
+from mt5_frames import DEAL_SCHEMA, compact_deals, records_to_frame
+
+DAY_MSC = 86_400_000
+START_MSC = 1_700_000_000_000
+
+
+def baseline_closed_trades(deals):
+    # get_history_trades_closed before vectorization, minus the MT5 session checks.
+    if len(deals) == 0:
+        return pd.DataFrame()
+    deals_df = pd.DataFrame(list(deals), columns=deals[0]._asdict().keys())
+    deals_df = deals_df[
+        (
+            deals_df["entry"].isin(
+                [mt5.DEAL_ENTRY_IN, mt5.DEAL_ENTRY_OUT, mt5.DEAL_ENTRY_INOUT]
+            )
+        )
+        & (deals_df["position_id"] > 0)
+        & (deals_df["type"].isin([mt5.DEAL_TYPE_BUY, mt5.DEAL_TYPE_SELL]))
+    ]
+    if deals_df.empty:
+        return pd.DataFrame()
+    deals_df["time_dt"] = pd.to_datetime(deals_df["time_msc"], unit="ms")
+    deals_df = deals_df.sort_values(by=["position_id", "time_dt"])
+    trades_list = []
+    for position_id, group in deals_df.groupby("position_id"):
+        if group.empty:
+            continue
+        first_deal_of_position = group.iloc[0]
+        last_deal_of_position = group.iloc[-1]
+        trade_profit_raw_sum = group["profit"].sum()
+        trade_commission_sum = group["commission"].sum()
+        trade_swap_sum = group["swap"].sum()
+        trade_profit_net = trade_profit_raw_sum + trade_commission_sum + trade_swap_sum
+        trade_action_type = (
+            "BUY" if first_deal_of_position["type"] == mt5.DEAL_TYPE_BUY else "SELL"
+        )
+        total_volume = first_deal_of_position["volume"]
+        trades_list.append(
+            {
+                "Position ID": position_id,
+                "Symbol": first_deal_of_position["symbol"],
+                "Magic": first_deal_of_position["magic"],
+                "Time Open": first_deal_of_position["time_dt"],
+                "Price Open": first_deal_of_position["price"],
+                "Time Close": last_deal_of_position["time_dt"],
+                "Price Close": last_deal_of_position["price"],
+                "Type": trade_action_type,
+                "Volume": total_volume,
+                "Profit": trade_profit_net,
+                "Commission": trade_commission_sum,
+                "Swap": trade_swap_sum,
+                "Order Open": first_deal_of_position["order"],
+                "Profit Raw Sum": trade_profit_raw_sum,
+            }
+        )
+    if not trades_list:
+        return pd.DataFrame()
+    closed_trades_df = pd.DataFrame(trades_list)
+    return closed_trades_df.sort_values(by="Time Close", ascending=False)
+
+
+def deal(ticket, position_id, time_msc, deal_type, entry, magic=0, **fields):
+    values = {
+        "ticket": ticket,
+        "order": ticket,
+        "time": time_msc // 1000,
+        "time_msc": time_msc,
+        "type": deal_type,
+        "entry": entry,
+        "magic": magic,
+        "position_id": position_id,
+        "reason": mt5.DEAL_REASON_EXPERT if magic else mt5.DEAL_REASON_CLIENT,
+        "volume": 0.1,
+        "price": 1.1,
+        "commission": -0.35,
+        "swap": 0.0,
+        "profit": 0.0,
+        "fee": 0.0,
+        "symbol": "EURUSD",
+        "comment": "",
+        "external_id": "",
+    }
+    values.update(fields)
+    return mt5.TradeDeal(**values)
+
+
+def edge_case_deals():
+    buy, sell = mt5.DEAL_TYPE_BUY, mt5.DEAL_TYPE_SELL
+    entry_in, entry_out = mt5.DEAL_ENTRY_IN, mt5.DEAL_ENTRY_OUT
+    t = START_MSC
+    return [
+        deal(1, 0, t, mt5.DEAL_TYPE_BALANCE, entry_in, profit=10_000.0),
+        # Partial closes: one entry, two exits at different prices.
+        deal(2, 2, t + 1_000, buy, entry_in, 10_001, volume=1.0, price=1.10),
+        deal(3, 2, t + 60_000, sell, entry_out, 10_001, volume=0.4, profit=12.5),
+        deal(
+            4,
+            2,
+            t + 120_000,
+            sell,
+            entry_out,
+            10_001,
+            volume=0.6,
+            profit=-3.25,
+            swap=-0.8,
+        ),
+        # Scaled-in manual trade (magic 0) with two entries and one exit.
+        deal(5, 5, t + 2_000, sell, entry_in, volume=0.2, symbol="XAUUSD"),
+        deal(6, 5, t + DAY_MSC, sell, entry_in, volume=0.3, symbol="XAUUSD"),
+        deal(
+            7,
+            5,
+            t + 2 * DAY_MSC,
+            buy,
+            entry_out,
+            volume=0.5,
+            profit=-40.0,
+            symbol="XAUUSD",
+        ),
+        # Reversal through an INOUT deal, then the reversed part is closed.
+        deal(8, 8, t + 3_000, buy, entry_in, 10_002, volume=0.1),
+        deal(
+            9, 8, t + 90_000, sell, mt5.DEAL_ENTRY_INOUT, 10_002, volume=0.2, profit=4.0
+        ),
+        deal(10, 8, t + 150_000, buy, entry_out, 10_002, volume=0.1, profit=1.0),
+        # Break-even trade and a close-by deal, which is not a trade deal.
+        deal(11, 11, t + 4_000, buy, entry_in, 10_003),
+        deal(12, 11, t + 5_000, sell, entry_out, 10_003, commission=0.0),
+        deal(13, 13, t + 6_000, buy, entry_in, 10_003),
+        deal(14, 13, t + 7_000, sell, mt5.DEAL_ENTRY_OUT_BY, 10_003, profit=2.0),
+        # Position still open: its only deal is the entry.
+        deal(15, 15, t + 3 * DAY_MSC, buy, entry_in, 10_001),
+    ]
+
+
+def vectorized_closed_trades(deals):
+    return build_closed_trades(compact_deals(records_to_frame(deals, DEAL_SCHEMA)))
+
+
+def assert_same_trades(deals):
+    expected = baseline_closed_trades(deals).reset_index(drop=True)
+    result = vectorized_closed_trades(deals).reset_index(drop=True)
+    pd.testing.assert_frame_equal(
+        result.astype({"Symbol": object}), expected, check_dtype=False
+    )
+
+
+@pytest.fixture
+def fake_deals():
+    config = dict(mt5.CONFIG)
+    mt5.configure(deals=4_000, magics=6, years=1, seed=7)
+    yield mt5.dataset()["deals"]
+    mt5.configure(**config)
+
+
+def test_edge_cases_match_baseline():
+    deals = edge_case_deals()
+    assert_same_trades(deals)
+    trades = vectorized_closed_trades(deals).set_index("Position ID")
+    assert sorted(trades.index) == [2, 5, 8, 11, 13, 15]
+    assert trades.loc[2, "Profit Raw Sum"] == pytest.approx(9.25)
+    assert trades.loc[2, "Volume"] == 1.0
+    assert trades.loc[5, "Magic"] == 0
+
+
+def test_fake_mt5_history_matches_baseline(fake_deals):
+    assert_same_trades(fake_deals)
+
+
+def test_mixed_history_matches_baseline(fake_deals):
+    assert_same_trades(list(fake_deals) + edge_case_deals())
+
+
+def test_no_trade_deals():
+    deals = edge_case_deals()[:1]
+    assert baseline_closed_trades(deals).empty
+    assert vectorized_closed_trades(deals).empty
+
+
+def baseline_calculate_kpis(closed_trades_df, initial_account_balance_for_period=None):
+    # calculate_kpis before vectorization.
+    if closed_trades_df.empty:
+        return {
+            "max_dd_percent": 0,
+            "consecutive_wins": 0,
+            "profit_factor": np.nan,
+            "consecutive_losses": 0,
+            "total_profit_period": 0,
+            "num_trades": 0,
+            "gross_profit": 0,
+            "gross_loss": 0,
+            "max_drawdown_value": 0,
+            "win_rate": 0,
+        }
+    trades_df_sorted = closed_trades_df.sort_values(by="Time Close", ascending=True)
+    current_equity_net = 0
+    peak_equity_net = 0
+    max_drawdown_net = 0
+    total_profit_calc_period_net = trades_df_sorted["Profit"].sum()
+    max_consecutive_wins = 0
+    current_wins_streak = 0
+    max_consecutive_losses = 0
+    current_losses_streak = 0
+    gross_profit_raw = 0
+    gross_loss_raw = 0
+    num_trades = len(trades_df_sorted)
+    num_wins = 0
+    for _, trade in trades_df_sorted.iterrows():
+        current_equity_net += trade["Profit"]
+        if current_equity_net > peak_equity_net:
+            peak_equity_net = current_equity_net
+        drawdown_current = peak_equity_net - current_equity_net
+        if drawdown_current > max_drawdown_net:
+            max_drawdown_net = drawdown_current
+        profit_for_stats = trade["Profit Raw Sum"]
+        if profit_for_stats > 0:
+            num_wins += 1
+            gross_profit_raw += profit_for_stats
+            current_wins_streak += 1
+            current_losses_streak = 0
+            if current_wins_streak > max_consecutive_wins:
+                max_consecutive_wins = current_wins_streak
+        elif profit_for_stats < 0:
+            gross_loss_raw += abs(profit_for_stats)
+            current_losses_streak += 1
+            current_wins_streak = 0
+            if current_losses_streak > max_consecutive_losses:
+                max_consecutive_losses = current_losses_streak
+    win_rate_calc = (num_wins / num_trades * 100) if num_trades > 0 else 0
+    max_dd_percent_calc = 0.0
+    if max_drawdown_net > 0:
+        if (
+            initial_account_balance_for_period is not None
+            and initial_account_balance_for_period > 0
+        ):
+            max_dd_percent_calc = (
+                max_drawdown_net / initial_account_balance_for_period
+            ) * 100
+        elif peak_equity_net > 0:
+            max_dd_percent_calc = (max_drawdown_net / peak_equity_net) * 100
+    profit_factor_calc = np.nan
+    if gross_loss_raw > 0:
+        profit_factor_calc = round(gross_profit_raw / gross_loss_raw, 2)
+    elif gross_profit_raw > 0:
+        profit_factor_calc = np.inf
+    return {
+        "max_dd_percent": round(max_dd_percent_calc, 2),
+        "consecutive_wins": max_consecutive_wins,
+        "profit_factor": profit_factor_calc,
+        "consecutive_losses": max_consecutive_losses,
+        "total_profit_period": round(total_profit_calc_period_net, 2),
+        "num_trades": num_trades,
+        "gross_profit": round(gross_profit_raw, 2),
+        "gross_loss": round(gross_loss_raw, 2),
+        "max_drawdown_value": round(max_drawdown_net, 2),
+        "win_rate": round(win_rate_calc, 2),
+    }
+
+
+def trades_from_profits(profit_raw, commission=-0.35):
+    profit_raw = np.asarray(profit_raw, dtype=float)
+    close_times = pd.Timestamp("2024-01-01") + pd.to_timedelta(
+        np.arange(len(profit_raw)), unit="h"
+    )
+    # Unsorted input: both implementations have to order by Time Close.
+    order = np.random.default_rng(len(profit_raw)).permutation(len(profit_raw))
+    return pd.DataFrame(
+        {
+            "Time Close": close_times[order],
+            "Profit": profit_raw[order] + commission,
+            "Profit Raw Sum": profit_raw[order],
+        }
+    )
+
+
+KPI_CASES = {
+    "empty": [],
+    "single_win": [25.0],
+    "all_win": [10.0, 5.5, 0.01, 120.0],
+    "all_loss": [-10.0, -5.5, -0.01, -120.0],
+    "zero_profit": [0.0, 0.0, 0.0],
+    "zeros_between_streaks": [
+        12.0,
+        0.0,
+        8.0,
+        -3.0,
+        0.0,
+        -4.0,
+        -1.0,
+        0.0,
+        0.0,
+        30.0,
+        -60.0,
+        2.0,
+        0.0,
+    ],
+    "drawdown_below_start": [-50.0, 20.0, -80.0, 10.0, 5.0],
+}
+
+
+def assert_same_kpis(closed_trades_df, initial_balance):
+    expected = baseline_calculate_kpis(closed_trades_df, initial_balance)
+    result = calculate_kpis(closed_trades_df, initial_balance)
+    assert result.keys() == expected.keys()
+    for key, value in expected.items():
+        assert result[key] == pytest.approx(value, nan_ok=True), key
+
+
+@pytest.mark.parametrize("initial_balance", [None, 5_000.0, 0.0])
+@pytest.mark.parametrize("case", KPI_CASES)
+def test_calculate_kpis_matches_baseline(case, initial_balance):
+    assert_same_kpis(trades_from_profits(KPI_CASES[case]), initial_balance)
+
+
+@pytest.mark.parametrize("initial_balance", [None, 10_000.0])
+def test_calculate_kpis_on_fake_history_matches_baseline(fake_deals, initial_balance):
+    closed_trades_df = vectorized_closed_trades(fake_deals)
+    assert_same_kpis(closed_trades_df, initial_balance)
+    for magic in closed_trades_df["Magic"].unique():
+        assert_same_kpis(
+            closed_trades_df[closed_trades_df["Magic"] == magic], initial_balance
+        )
+
+
+def test_calculate_kpis_streaks_and_drawdown():
+    kpis = calculate_kpis(
+        trades_from_profits(KPI_CASES["zeros_between_streaks"], commission=0.0), 1_000.0
+    )
+    assert kpis["consecutive_wins"] == 2
+    assert kpis["consecutive_losses"] == 3
+    assert kpis["max_drawdown_value"] == 60.0
+    assert kpis["max_dd_percent"] == 6.0
+    kpis = calculate_kpis(
+        trades_from_profits(KPI_CASES["zeros_between_streaks"], commission=0.0)
+    )
+    assert kpis["max_dd_percent"] == round(60.0 / 42.0 * 100, 2)
+
+
+@pytest.mark.parametrize("group_keys", ["Magic", ["Magic", "Symbol"]])
+@pytest.mark.parametrize("initial_balance", [None, 10_000.0])
+def test_calculate_kpis_by_group_matches_per_group(
+    fake_deals, group_keys, initial_balance
+):
+    closed_trades_df = vectorized_closed_trades(list(fake_deals) + edge_case_deals())
+    by_group = calculate_kpis_by_group(closed_trades_df, group_keys, initial_balance)
+    keys = [group_keys] if isinstance(group_keys, str) else group_keys
+    groups = closed_trades_df.groupby(keys)
+    assert len(by_group) == groups.ngroups
+    for key, group_df in groups:
+        expected = calculate_kpis(group_df, initial_balance)
+        result = by_group.loc[key if len(keys) > 1 else key[0]]
+        for name, value in expected.items():
+            assert result[name] == pytest.approx(value, nan_ok=True), (key, name)
+
+
+def test_calculate_kpis_by_group_on_empty_trades():
+    result = calculate_kpis_by_group(pd.DataFrame(), "Magic")
+    assert result.empty
+    assert result.index.names == ["Magic"]
+
+
+def assert_accumulator_matches(accumulator, closed_trades_df, initial_balance):
+    expected = calculate_kpis(closed_trades_df, initial_balance)
+    result = accumulator.kpis(initial_balance)
+    assert result.keys() == expected.keys()
+    for key, value in expected.items():
+        assert result[key] == pytest.approx(value, nan_ok=True), key
+
+
+def test_kpi_accumulator_folds_new_trades_incrementally(fake_deals):
+    closed_trades_df = vectorized_closed_trades(fake_deals)
+    close_times = closed_trades_df["Time Close"].sort_values().unique()
+    accumulator = KpiAccumulator()
+    for cutoff in close_times[:: max(1, len(close_times) // 12)].tolist() + [
+        close_times[-1]
+    ]:
+        seen = closed_trades_df[closed_trades_df["Time Close"] <= cutoff]
+        accumulator.update(seen)
+        assert_accumulator_matches(accumulator, seen, 10_000.0)
+    assert accumulator.rebuilds == 0
+    assert accumulator.num_trades == len(closed_trades_df)
+
+
+def test_kpi_accumulator_rebuilds_on_revised_trade(fake_deals):
+    closed_trades_df = vectorized_closed_trades(fake_deals)
+    accumulator = KpiAccumulator().update(closed_trades_df)
+    revised = closed_trades_df.copy()
+    old_trade = revised.index[len(revised) // 2]
+    revised.loc[old_trade, ["Profit", "Profit Raw Sum"]] += 1_000.0
+    accumulator.update(revised)
+    assert accumulator.rebuilds == 1
+    assert_accumulator_matches(accumulator, revised, 10_000.0)
+    assert accumulator.kpis()["total_profit_period"] == pytest.approx(
+        round(closed_trades_df["Profit"].sum() + 1_000.0, 2)
+    )
+
+    accumulator.update(revised)
+    assert accumulator.rebuilds == 1
+    accumulator.update(revised.drop(index=old_trade))
+    assert accumulator.rebuilds == 2
+    assert_accumulator_matches(accumulator, revised.drop(index=old_trade), None)
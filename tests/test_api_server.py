@@ -0,0 +1,65 @@
+import json
+import tempfile
+
+from tornado.testing import AsyncHTTPTestCase
+
+from api_server import SnapshotApi, make_app
+from connection_pool import MT5ConnectionPool, open_terminal
+from poller import MT5Poller
+
+ACCOUNT = {
+    "name": "Cuenta API",
+    "login": 7001,
+    "password": "secret",
+    "server": "Fake-Server",
+    "path": "",
+    "host": "",
+    "port": None,
+}
+
+
+class SnapshotApiTest(AsyncHTTPTestCase):
+    def get_app(self):
+        self.store_dir = tempfile.TemporaryDirectory()
+        self.pool = MT5ConnectionPool(open_terminal)
+        self.poller = MT5Poller(self.pool, self.store_dir.name)
+        self.pool.connect(ACCOUNT)
+        self.poller.watch(ACCOUNT["login"])
+        self.poller.poll_account(ACCOUNT["login"])
+        return make_app(SnapshotApi([ACCOUNT], self.poller))
+
+    def tearDown(self):
+        super().tearDown()
+        self.store_dir.cleanup()
+
+    def get_json(self, path):
+        response = self.fetch(path)
+        return response, json.loads(response.body)
+
+    def test_history_endpoints_wait_for_first_sync(self):
+        login = ACCOUNT["login"]
+        response, body = self.get_json(f"/api/accounts/{login}")
+        assert response.code == 200
+        assert body["history_synced"] is False
+        for path in ("kpis", "track-record"):
+            response, body = self.get_json(f"/api/accounts/{login}/{path}")
+            assert response.code == 503
+            assert body["error"].startswith("Sincronizando historial")
+
+        self.poller.poll_account(login, sync_history=True)
+        response, body = self.get_json(f"/api/accounts/{login}")
+        assert body["history_synced"] is True
+        assert "X-History-Synced-At" in response.headers
+        response, body = self.get_json(f"/api/accounts/{login}/kpis")
+        assert response.code == 200
+        assert body["account"]["num_trades"] > 0
+        response, body = self.get_json(f"/api/accounts/{login}/track-record?freq=MS")
+        assert response.code == 200
+        assert "Balance Cuenta" in body["series"]
+
+        etag = response.headers["Etag"]
+        response = self.fetch(
+            f"/api/accounts/{login}/track-record?freq=MS",
+            headers={"If-None-Match": etag},
+        )
+        assert response.code == 304
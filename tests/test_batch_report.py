@@ -0,0 +1,88 @@
+import sys
+from datetime import datetime, timedelta
+
+import pandas as pd
+import pytest
+
+import pymt5linux as mt5
+from analytics import build_closed_trades
+from batch_report import main
+from deal_store import DealStore
+
+SECRETS = """
+mt5_account = ["8001", "8002"]
+mt5_password = ["secret", "secret"]
+mt5_server = ["Fake-Server", "Fake-Server"]
+mt5_name = ["Cuenta Uno", "Cuenta Dos"]
+deal_store_dir = "{store_dir}"
+"""
+
+
+@pytest.fixture
+def history():
+    config = dict(mt5.CONFIG)
+    mt5.configure(deals=2_000, magics=3, years=2, seed=17)
+    yield mt5.dataset()["deals"]
+    mt5.configure(**config)
+
+
+def run_batch_report(monkeypatch, *args):
+    monkeypatch.setattr(sys, "argv", ["batch_report.py", *args])
+    return main()
+
+
+def test_writes_parquet_csv_and_html_reports(tmp_path, monkeypatch, history):
+    store_dir = tmp_path / "store"
+    secrets = tmp_path / "secrets.toml"
+    secrets.write_text(SECRETS.format(store_dir=store_dir.as_posix()))
+    output = tmp_path / "reports"
+    end = datetime.now()
+    start = end - timedelta(days=180)
+
+    assert (
+        run_batch_report(
+            monkeypatch,
+            "--secrets",
+            str(secrets),
+            "--output",
+            str(output),
+            "--start",
+            f"{start:%Y-%m-%d}",
+            "--end",
+            f"{end:%Y-%m-%d}",
+            "--workers",
+            "2",
+        )
+        == 0
+    )
+
+    for name in ("kpis", "ea_comparison", "track_record"):
+        table = pd.read_parquet(output / f"{name}.parquet")
+        csv_table = pd.read_csv(output / f"{name}.csv")
+        assert not table.empty
+        assert list(csv_table.columns) == list(table.columns)
+        assert csv_table["Login"].tolist() == table["Login"].tolist()
+
+    kpis = pd.read_parquet(output / "kpis.parquet")
+    assert kpis["Login"].tolist() == [8001, 8002]
+    assert kpis["Error"].isna().all()
+    deals_df = DealStore(str(store_dir / "deals_8001.sqlite")).load()
+    assert len(deals_df) == len(history)
+    closed = build_closed_trades(deals_df)
+    period_start = datetime.combine(start.date(), datetime.min.time())
+    period_end = datetime.combine(end.date(), datetime.max.time())
+    expected_trades = closed["Time Close"].between(period_start, period_end).sum()
+    assert (kpis["Trades Periodo"] == expected_trades).all()
+
+    ea_comparison = pd.read_parquet(output / "ea_comparison.parquet")
+    assert set(ea_comparison["Login"]) == {8001, 8002}
+    assert 0 not in set(ea_comparison["Magic"])
+
+    track_record = pd.read_parquet(output / "track_record.parquet")
+    assert set(track_record["freq"]) == {"D", "W-MON", "MS"}
+    assert "Balance Cuenta" in set(track_record["type"])
+
+    html = (output / "report.html").read_text(encoding="utf-8")
+    for text in ("Cuenta Uno (8001)", "Cuenta Dos (8002)", "Comparativa EAs"):
+        assert text in html
+    assert html.count("Track Record mensual") == 2
@@ -0,0 +1,83 @@
+import pytest
+
+import pymt5linux as mt5
+from connection_pool import MT5ConnectionError, MT5ConnectionPool
+
+
+class RejectingTerminal(mt5.MetaTrader5):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.shutdowns = 0
+
+    def login(self, login, password=None, server=None, timeout=None):
+        if password == "wrong":
+            return False
+        return super().login(login, password=password, server=server)
+
+    def shutdown(self):
+        self.shutdowns += 1
+        super().shutdown()
+
+
+def account(login, password="secret", host=""):
+    return {
+        "name": f"Cuenta {login}",
+        "login": login,
+        "password": password,
+        "server": "Fake-Server",
+        "path": "",
+        "host": host,
+        "port": 18812 if host else None,
+    }
+
+
+@pytest.fixture
+def pool():
+    return MT5ConnectionPool(lambda account_details: RejectingTerminal())
+
+
+def test_failed_login_keeps_shared_terminal_up(pool):
+    connection = pool.connect(account(1001))
+    with pytest.raises(MT5ConnectionError):
+        pool.connect(account(1002, password="wrong"))
+    failed = pool.get(1002)
+    assert failed.terminal is connection.terminal
+    assert failed.last_error is not None
+    assert connection.terminal.shutdowns == 0
+    assert connection.last_error is None
+
+
+def test_failed_login_shuts_down_exclusive_terminal(pool):
+    pool.connect(account(1001))
+    with pytest.raises(MT5ConnectionError):
+        pool.connect(account(1002, password="wrong", host="10.0.0.2"))
+    failed = pool.get(1002)
+    assert failed.terminal is not pool.get(1001).terminal
+    assert failed.terminal.shutdowns == 1
+    assert pool.get(1001).terminal.shutdowns == 0
+
+
+def test_open_keeps_account_info_read_under_the_lock(pool):
+    first = pool.connect(account(1001))
+    second = pool.connect(account(1002))
+    assert second.terminal is first.terminal
+    assert second.account_info.login == 1002
+    # 1002 now owns the shared terminal; reconnecting 1001 logs it back in.
+    assert pool.connect(account(1001)).account_info.login == 1001
+    assert first.terminal.account_info().login == 1001
+
+
+def test_switching_logins_reads_account_info_once_per_open(pool):
+    first = pool.connect(account(1001))
+    second = pool.connect(account(1002))
+    mt5.calls.clear()
+    for _ in range(5):
+        assert first.open().account_info.login == 1001
+        assert second.open().account_info.login == 1002
+    assert mt5.calls["login"] == 10
+    assert mt5.calls["account_info"] == 10
+
+    mt5.calls.clear()
+    second.open()
+    assert mt5.calls["login"] == 0
+    assert mt5.calls["account_info"] == 1
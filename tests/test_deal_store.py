@@ -0,0 +1,130 @@
+import sqlite3
+
+import pandas as pd
+import pytest
+
+import pymt5linux as mt5
+from deal_store import MS_PER_DAY, ROLLUP_FREQS, SYNC_OVERLAP, DealStore
+
+
+class PartialTerminal(mt5.MetaTrader5):
+    """Fake terminal whose history ends at visible_until (time_msc)."""
+
+    def __init__(self, visible_until=None):
+        super().__init__()
+        self.visible_until = visible_until
+
+    def _deal_slice(self, date_from, date_to):
+        deals = super()._deal_slice(date_from, date_to)
+        if self.visible_until is None:
+            return deals
+        return tuple(deal for deal in deals if deal.time_msc <= self.visible_until)
+
+
+@pytest.fixture
+def deals():
+    config = dict(mt5.CONFIG)
+    mt5.configure(deals=3_000, magics=5, years=2, seed=11)
+    yield mt5.dataset()["deals"]
+    mt5.configure(**config)
+
+
+def assert_same_store(store, expected):
+    pd.testing.assert_frame_equal(store.load(), expected.load())
+    for freq in ROLLUP_FREQS:
+        pd.testing.assert_frame_equal(
+            store.load_rollups(freq), expected.load_rollups(freq)
+        )
+    pd.testing.assert_frame_equal(
+        store.load_balance_peaks(), expected.load_balance_peaks()
+    )
+
+
+def test_two_stage_sync_matches_full_sync(tmp_path, deals):
+    full = DealStore(str(tmp_path / "full.sqlite"))
+    assert full.sync(PartialTerminal()) == len(deals)
+
+    # Cut mid-day so the second sync re-reads the overlap day.
+    cutoff = deals[len(deals) // 2].time_msc + MS_PER_DAY // 3
+    staged = DealStore(str(tmp_path / "staged.sqlite"))
+    first = staged.sync(PartialTerminal(visible_until=cutoff))
+    last_seen = max(
+        (deal for deal in deals if deal.time_msc <= cutoff),
+        key=lambda deal: (deal.time_msc, deal.ticket),
+    )
+    assert first == sum(deal.time_msc <= cutoff for deal in deals)
+    assert staged.watermark() == (last_seen.time_msc, last_seen.ticket)
+
+    assert staged.sync(PartialTerminal()) == len(deals) - first
+    assert_same_store(staged, full)
+    assert staged.watermark() == (deals[-1].time_msc, deals[-1].ticket)
+
+
+def test_resync_ignores_overlapping_deals(tmp_path, deals):
+    store = DealStore(str(tmp_path / "deals.sqlite"))
+    terminal = PartialTerminal()
+    store.sync(terminal)
+    watermark = store.watermark()
+    mt5.calls.clear()
+    assert store.sync(terminal) == 0
+    assert mt5.calls["history_deals_get"] >= 1
+    assert store.watermark() == watermark
+    assert len(store.load()) == len(deals)
+
+
+def test_catch_up_after_long_gap_reads_history_in_windows(tmp_path, deals):
+    full = DealStore(str(tmp_path / "full.sqlite"))
+    full.sync(PartialTerminal())
+    staged = DealStore(str(tmp_path / "staged.sqlite"))
+    staged.sync(PartialTerminal(visible_until=deals[len(deals) // 4].time_msc))
+
+    mt5.calls.clear()
+    chunks = staged.sync_chunks(PartialTerminal(), window_months=3)
+    for _, inserted in chunks:
+        assert inserted is not None
+        # The store lock is only held while a chunk is inserted.
+        assert staged._lock.acquire(blocking=False)
+        staged._lock.release()
+    # About 18 months of missing history in 3-month windows.
+    assert mt5.calls["history_deals_get"] >= 6
+    assert_same_store(staged, full)
+
+
+def test_rollups_refresh_from_first_touched_day(tmp_path, deals):
+    full = DealStore(str(tmp_path / "full.sqlite"))
+    full.sync(PartialTerminal())
+    store = DealStore(str(tmp_path / "deals.sqlite"))
+    cutoff = deals[-200].time_msc
+    store.sync(PartialTerminal(visible_until=cutoff))
+
+    # Mark a daily rollup before the catch-up's first day and the balance
+    # peaks from the cutoff day on: only rows from the first day the catch-up
+    # re-reads are recomputed.
+    first_day = (cutoff - SYNC_OVERLAP // pd.Timedelta(milliseconds=1)) // MS_PER_DAY
+    with sqlite3.connect(store.path) as conn:
+        untouched_day = conn.execute(
+            "SELECT MAX(period) FROM pnl_rollups WHERE freq = 'D' AND period < ?",
+            (first_day,),
+        ).fetchone()[0]
+        conn.execute(
+            "UPDATE pnl_rollups SET trades = -1 WHERE freq = 'D' AND period = ?",
+            (untouched_day,),
+        )
+        conn.execute(
+            "UPDATE balance_peaks SET peak_offset = -1 WHERE day >= ?",
+            (cutoff // MS_PER_DAY,),
+        )
+
+    assert store.sync(PartialTerminal()) == 199
+    daily = store.load_rollups("D")
+    marked = daily["period"] == pd.Timestamp(untouched_day, unit="D")
+    assert marked.any() and (daily.loc[marked, "trades"] == -1).all()
+    expected = full.load_rollups("D")
+    pd.testing.assert_frame_equal(
+        daily[~marked].reset_index(drop=True),
+        expected[~marked].reset_index(drop=True),
+    )
+    pd.testing.assert_frame_equal(store.load_balance_peaks(), full.load_balance_peaks())
+
+    store.refresh_rollups(0)
+    assert_same_store(store, full)
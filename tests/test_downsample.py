@@ -0,0 +1,76 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from analytics import downsample_chart, lttb_indices, lttb_indices_many
+
+
+def reference_lttb(x, y, max_points):
+    # Per-series loop that lttb_indices_many replaced.
+    n_points = len(x)
+    if max_points < 3 or n_points <= max_points:
+        return np.arange(n_points)
+    bucket_size = (n_points - 2) / (max_points - 2)
+    bucket_edges = (np.arange(max_points - 1) * bucket_size).astype(np.int64) + 1
+    bucket_edges[-1] = n_points - 1
+    selected = np.empty(max_points, dtype=np.int64)
+    selected[0] = 0
+    selected[-1] = n_points - 1
+    anchor = 0
+    for bucket in range(max_points - 2):
+        start, end = bucket_edges[bucket], bucket_edges[bucket + 1]
+        next_end = (
+            bucket_edges[bucket + 2] if bucket + 2 < len(bucket_edges) else n_points
+        )
+        next_x = x[end:next_end].mean()
+        next_y = y[end:next_end].mean()
+        areas = np.abs(
+            (x[anchor] - next_x) * (y[start:end] - y[anchor])
+            - (x[anchor] - x[start:end]) * (next_y - y[anchor])
+        )
+        anchor = start + int(np.argmax(areas))
+        selected[bucket + 1] = anchor
+    return selected
+
+
+def random_series(rng, n_points):
+    x = np.sort(rng.integers(1.6e18, 1.7e18, n_points)).astype(np.float64)
+    return x, np.cumsum(rng.normal(size=n_points))
+
+
+@pytest.mark.parametrize("max_points", [0, 2, 3, 10, 300, 1000])
+def test_batched_lttb_matches_per_series_loop(max_points):
+    rng = np.random.default_rng(max_points)
+    series = [random_series(rng, n) for n in [1, 2, 5, 299, 1000, 1001, 1826, 4000]]
+    xs, ys = zip(*series)
+    for (x, y), indices in zip(series, lttb_indices_many(xs, ys, max_points)):
+        np.testing.assert_array_equal(indices, reference_lttb(x, y, max_points))
+
+
+def test_lttb_keeps_flat_series_and_extremes():
+    x = np.arange(500, dtype=np.float64)
+    y = np.zeros(500)
+    y[123] = 10.0
+    y[321] = -10.0
+    indices = lttb_indices(x, y, 20)
+    assert len(indices) == 20
+    assert {0, 123, 321, 499} <= set(indices)
+
+
+def test_downsample_chart_caps_every_series():
+    rng = np.random.default_rng(1)
+    days = pd.date_range("2020-01-01", periods=1500, freq="D")
+    df_chart = pd.concat(
+        [
+            pd.DataFrame(
+                {"period_start": days, "value": rng.normal(size=len(days)), "type": t}
+            )
+            for t in ["Balance Cuenta", "EA 10001"]
+        ]
+        + [pd.DataFrame({"period_start": days[:50], "value": 0.0, "type": "EA 10002"})],
+        ignore_index=True,
+    )
+    downsampled, dropped = downsample_chart(df_chart, 400)
+    sizes = downsampled.groupby("type", sort=False).size()
+    assert sizes.to_dict() == {"Balance Cuenta": 400, "EA 10001": 400, "EA 10002": 50}
+    assert dropped == len(df_chart) - len(downsampled)
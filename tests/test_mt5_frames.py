@@ -0,0 +1,90 @@
+import pandas as pd
+import pytest
+
+import pymt5linux as mt5
+from mt5_frames import POSITION_SCHEMA, LiveTable, records_to_frame
+
+COLUMNS = ["ticket", "time_msc", "type", "symbol", "volume", "price_current", "profit"]
+MUTABLE = ["volume", "price_current", "profit"]
+
+
+@pytest.fixture
+def positions():
+    config = dict(mt5.CONFIG)
+    mt5.configure(deals=500, positions=6, seed=5)
+    yield mt5.dataset()["positions"]
+    mt5.configure(**config)
+
+
+def expected_frame(records):
+    return records_to_frame(records, POSITION_SCHEMA, COLUMNS).set_index("ticket")
+
+
+def assert_matches(table, records):
+    pd.testing.assert_frame_equal(table.frame, expected_frame(records))
+
+
+def live_table(records):
+    table = LiveTable(POSITION_SCHEMA, COLUMNS, MUTABLE)
+    assert table.update(records)
+    assert table.version == 1
+    return table
+
+
+def test_same_records_keep_the_version(positions):
+    table = live_table(positions)
+    assert not table.update(positions)
+    assert not table.update(tuple(positions))
+    assert not table.update(list(positions))
+    assert table.version == 1
+    assert_matches(table, positions)
+
+
+def test_added_and_removed_tickets(positions):
+    table = live_table(positions[:4])
+    assert table.update(positions)
+    assert table.version == 2
+    assert_matches(table, positions)
+
+    remaining = positions[1:3] + positions[5:]
+    assert table.update(remaining)
+    assert table.version == 3
+    assert_matches(table, remaining)
+
+
+def test_patched_tickets_refresh_mutable_columns(positions):
+    table = live_table(positions)
+    patched = list(positions)
+    patched[2] = patched[2]._replace(
+        price_current=patched[2].price_current + 0.001, profit=123.45
+    )
+    patched[4] = patched[4]._replace(volume=patched[4].volume * 2)
+    assert table.update(patched)
+    assert table.version == 2
+    assert_matches(table, patched)
+    assert table.frame.loc[patched[2].ticket, "profit"] == 123.45
+
+
+def test_view_is_rebuilt_only_on_new_versions(positions):
+    table = live_table(positions)
+    builds = []
+
+    def build(frame):
+        builds.append(table.version)
+        return frame.reset_index()
+
+    first = table.view(build)
+    table.update(positions)
+    assert table.view(build) is first
+    table.update(positions[1:])
+    assert len(table.view(build)) == len(positions) - 1
+    assert builds == [1, 2]
+
+
+def test_empty_records(positions):
+    table = live_table(())
+    assert table.frame.empty
+    assert table.update(positions)
+    assert table.update(None)
+    assert table.frame.empty
+    assert table.version == 3
@@ -0,0 +1,94 @@
+import threading
+import time
+
+import pytest
+
+import pymt5linux as mt5
+from connection_pool import MT5ConnectionPool
+from poller import MT5Poller
+
+
+class SlowHistoryTerminal(mt5.MetaTrader5):
+    def history_deals_get(self, *args, **kwargs):
+        time.sleep(0.05)
+        return super().history_deals_get(*args, **kwargs)
+
+
+def account(login):
+    return {
+        "name": f"Cuenta {login}",
+        "login": login,
+        "password": "secret",
+        "server": "Fake-Server",
+        "path": "",
+        "host": "",
+        "port": None,
+    }
+
+
+@pytest.fixture
+def history():
+    config = dict(mt5.CONFIG)
+    mt5.configure(deals=2_000, magics=3, years=5, seed=3)
+    yield mt5.dataset()["deals"]
+    mt5.configure(**config)
+
+
+@pytest.fixture
+def pool():
+    return MT5ConnectionPool(lambda account_details: SlowHistoryTerminal())
+
+
+def test_watch_returns_pending_snapshot_without_calling_the_terminal(tmp_path, pool):
+    poller = MT5Poller(pool, str(tmp_path))
+    pool.connect(account(3001))
+    mt5.calls.clear()
+    snapshot = poller.watch(3001)
+    assert snapshot.taken_at is None
+    assert snapshot.account_info is None
+    assert sum(mt5.calls.values()) == 0
+    assert poller.watch(3001) is snapshot
+
+    poller.poll_once()
+    snapshot = poller.watch(3001)
+    assert snapshot.taken_at is not None
+    assert snapshot.account_info.login == 3001
+
+
+def test_backfill_resumes_across_ticks(tmp_path, pool, history):
+    poller = MT5Poller(pool, str(tmp_path), sync_budget=0.0)
+    pool.connect(account(3001))
+    poller.watch(3001)
+    poller.poll_once()
+    snapshot = poller.snapshot(3001)
+    assert snapshot.history_synced_at is None
+    assert snapshot.backfill_until is not None
+    assert snapshot.account_info.login == 3001
+
+    ticks = 1
+    while poller.snapshot(3001).history_synced_at is None:
+        poller.poll_once()
+        ticks += 1
+    assert ticks > 2
+    assert len(poller.deal_store(3001).load()) == len(history)
+    assert poller.snapshot(3001).backfill_until is None
+
+
+def test_backfill_releases_terminal_lock_between_windows(tmp_path, pool, history):
+    poller = MT5Poller(pool, str(tmp_path))
+    pool.connect(account(3001))
+    backfill = threading.Thread(
+        target=poller.poll_account, args=(3001,), kwargs={"sync_history": True}
+    )
+    started = time.perf_counter()
+    backfill.start()
+    time.sleep(0.1)
+    connect_started = time.perf_counter()
+    # Same endpoint, so the second account shares the terminal and its lock.
+    pool.connect(account(3002))
+    connect_elapsed = time.perf_counter() - connect_started
+    backfill.join()
+    backfill_elapsed = time.perf_counter() - started
+    assert backfill_elapsed > 0.5
+    assert connect_elapsed < 0.25
+    assert len(poller.deal_store(3001).load()) == len(history)
@@ -0,0 +1,56 @@
+from datetime import datetime, timedelta
+
+import pandas as pd
+
+import pymt5linux as mt5
+from connection_pool import MT5ConnectionPool, open_terminal
+from poller import MT5Poller
+from portfolio import account_overview, portfolio_totals
+
+ACCOUNT = {
+    "name": "Cuenta Demo",
+    "login": 5001,
+    "password": "secret",
+    "server": "Fake-Server",
+    "path": "",
+    "host": "",
+    "port": None,
+}
+
+
+def test_overview_reports_history_sync_until_backfilled(tmp_path):
+    pool = MT5ConnectionPool(open_terminal)
+    poller = MT5Poller(pool, str(tmp_path))
+    end = datetime.now()
+    start = end - timedelta(days=365)
+
+    row = account_overview(ACCOUNT, pool, poller, start, end)
+    assert row["Estado"] == "Esperando la primera lectura del terminal"
+    assert row["Error"] is None
+    assert portfolio_totals(pd.DataFrame([row])).empty
+
+    poller.poll_account(ACCOUNT["login"])
+    row = account_overview(ACCOUNT, pool, poller, start, end)
+    assert row["Estado"].startswith("Sincronizando historial")
+    assert row["Error"] is None
+    assert row["Balance"] == mt5.dataset()["balance"]
+    assert row["Trades Periodo"] is None
+    assert not portfolio_totals(pd.DataFrame([row])).empty
+
+    poller.poll_account(ACCOUNT["login"], sync_history=True)
+    row = account_overview(ACCOUNT, pool, poller, start, end)
+    assert row["Estado"] is None
+    assert row["Trades Periodo"] > 0
+
+
+def test_totals_without_usable_rows_are_empty():
+    assert portfolio_totals(pd.DataFrame()).empty
+    errors = pd.DataFrame(
+        [
+            {"Cuenta": "A", "Login": 1, "Estado": None, "Error": "sin terminal"},
+            {"Cuenta": "B", "Login": 2, "Estado": None, "Error": "login falló"},
+        ]
+    )
+    totals = portfolio_totals(errors)
+    assert totals.empty
+    assert "Balance" in totals.columns
@@ -0,0 +1,75 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from analytics import rolling_ea_metrics
+
+END = pd.Timestamp("2024-12-31 18:00")
+
+
+def closed_trades(n_magics, years, trades_per_magic, seed=0):
+    rng = np.random.default_rng(seed)
+    start = END - pd.Timedelta(days=365 * years)
+    span_s = int((END - start).total_seconds())
+    magics = np.repeat(np.arange(n_magics) + 10_000, trades_per_magic)
+    profit_raw = np.round(rng.normal(0.5, 20.0, len(magics)), 2)
+    profit_raw[rng.random(len(magics)) < 0.05] = 0.0
+    return pd.DataFrame(
+        {
+            "Magic": magics,
+            "Time Close": start
+            + pd.to_timedelta(rng.integers(0, span_s, len(magics)), unit="s"),
+            "Profit": profit_raw - 0.7,
+            "Profit Raw Sum": profit_raw,
+        }
+    ).sort_values("Time Close", ascending=False)
+
+
+def brute_force_window(trades, magic, day, window, initial_balance):
+    day_end = day + pd.Timedelta(days=1)
+    window_start = day_end - pd.Timedelta(days=window)
+    own = trades[trades["Magic"] == magic]
+    in_window = own[(own["Time Close"] >= window_start) & (own["Time Close"] < day_end)]
+    equity = np.array(
+        [
+            own.loc[
+                own["Time Close"] < day_end - pd.Timedelta(days=back), "Profit"
+            ].sum()
+            for back in range(window, -1, -1)
+        ]
+    )
+    base = (
+        initial_balance
+        + trades.loc[trades["Time Close"] < window_start, "Profit"].sum()
+    )
+    return {
+        "trades": len(in_window),
+        "profit": in_window["Profit"].sum(),
+        "max_drawdown_value": (np.maximum.accumulate(equity) - equity).max(),
+        "return_percent": in_window["Profit"].sum() / base * 100,
+    }
+
+
+@pytest.mark.parametrize("n_magics", [59, 64])
+def test_many_magics_over_five_years(n_magics):
+    trades = closed_trades(n_magics, years=5, trades_per_magic=40)
+    rolling = rolling_ea_metrics(trades, 10_000.0, end=END)
+
+    assert set(rolling["Magic"]) == set(trades["Magic"])
+    last_day = rolling[rolling["date"] == END.normalize()]
+    assert len(last_day) == 2 * n_magics
+    totals = rolling[rolling["window"] == 30].groupby("Magic")["trades"].sum() / 30
+    # Every trade falls in exactly 30 daily 30-day windows unless it closed in
+    # the last 29 days, so each magic's total stays close to its trade count.
+    assert (totals > 40 * 0.9).all()
+
+    rng = np.random.default_rng(n_magics)
+    sample = rolling.iloc[rng.choice(len(rolling), 40, replace=False)]
+    last_magic = rolling[rolling["Magic"] == trades["Magic"].max()]
+    sample = pd.concat([sample, last_magic.tail(2)])
+    for _, row in sample.iterrows():
+        expected = brute_force_window(
+            trades, row["Magic"], row["date"], row["window"], 10_000.0
+        )
+        for key, value in expected.items():
+            assert row[key] == pytest.approx(value, abs=1e-6), key